@@ -1,13 +1,52 @@
 from django.contrib import admin
 # Importamos las clases que creamos en models.py
-from .models import Producto, ReporteProduccion, LoteAves, ReporteDiarioAves
+from .models import (
+    Producto, ReporteProduccion, LoteAves, ReporteDiarioAves,
+    TrabajoExportacion, MovimientoStock,
+)
+from .inventario import registrar_movimientos
 
 # Registramos las clases para que aparezcan en el panel
 # Puedes personalizar cómo se ven, pero por ahora usaremos la forma básica
-admin.site.register(Producto)
 admin.site.register(ReporteProduccion)
 admin.site.register(LoteAves)
 admin.site.register(ReporteDiarioAves)
+admin.site.register(TrabajoExportacion)
+
+# Las tablas derivadas (ResumenDiario*, SnapshotStock) y el registro de CambioCatalogo no
+# se registran: se calculan solas y editarlas a mano dejaría mal el dashboard, los saldos
+# históricos o el cursor de sincronización de la PWA. Registrarlas de solo lectura tampoco
+# sirve: el admin exige permiso de borrado sobre ellas para borrar un lote o un producto.
+
+
+@admin.register(Producto)
+class ProductoAdmin(admin.ModelAdmin):
+    """
+    El stock no se edita aquí: es la suma de los movimientos. Para corregirlo se
+    agrega un AJUSTE en Movimientos de stock.
+    """
+    list_display = ('nombre', 'categoria', 'stock_actual')
+    readonly_fields = ('stock_actual',)
+
+
+@admin.register(MovimientoStock)
+class MovimientoStockAdmin(admin.ModelAdmin):
+    """
+    Los movimientos solo se agregan (despachos y ajustes); nunca se editan ni borran,
+    para que el stock siempre sea la suma del libro.
+    """
+    list_display = ('fecha', 'producto', 'tipo', 'cantidad', 'nota')
+    list_filter = ('tipo', 'producto')
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            registrar_movimientos([obj])
+
+    def has_change_permission(self, request, obj=None):
+        return obj is None
+
+    def has_delete_permission(self, request, obj=None):
+        return False
 # PERSONALIZACIÓN DEL ADMIN
 admin.site.site_header = "Panel de Control - Algas Biotech" # Texto en la barra azul superior
 admin.site.site_title = "Admin AlgasBio" # Texto en la pestaña del navegador
@@ -0,0 +1,285 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+
+from .models import (
+    LoteAves, ReporteDiarioAves, ReporteProduccion,
+    ResumenDiarioLote, ResumenDiarioProduccion,
+)
+
+
+# ==========================================
+# AGREGADOS DE GRANJA (Una sola consulta agrupada)
+# ==========================================
+
+def rendimiento_por_dieta(fecha_limite):
+    """
+    Calcula la tasa de postura de cada dieta (ALGAS / CONTROL) en UNA sola consulta.
+
+    Lee la tabla pre-calculada ResumenDiarioLote (una fila por lote y día),
+    agrupa por 'tipo_dieta' y suma:
+      - total_huevos: huevos recolectados en el periodo
+      - aves_dias: cantidad_aves_inicial del lote por cada día reportado
+      - dias_reportados: cantidad de reportes
+
+    Devuelve un diccionario con una entrada por dieta (aunque no tenga datos).
+    """
+    filas = (
+        ResumenDiarioLote.objects
+        .filter(lote__activo=True, fecha__gte=fecha_limite)
+        .values('lote__tipo_dieta')
+        .annotate(
+            total_huevos=Sum('huevos_recolectados'),
+            aves_dias=Sum(F('lote__cantidad_aves_inicial') * F('cantidad_reportes')),
+            dias_reportados=Sum('cantidad_reportes'),
+        )
+        .order_by()  # Quitamos cualquier orden por defecto para no romper el GROUP BY
+    )
+
+    resultado = {
+        dieta: {'tasa': 0, 'total_huevos': 0, 'aves_dias': 0, 'dias_reportados': 0}
+        for dieta, _ in LoteAves.DIETAS
+    }
+
+    for fila in filas:
+        total_huevos = fila['total_huevos'] or 0
+        aves_dias = fila['aves_dias'] or 0
+        # El cálculo es: Total Huevos del periodo / (Aves * Días) -> en porcentaje
+        tasa = round((total_huevos / aves_dias) * 100, 2) if aves_dias > 0 else 0
+
+        resultado[fila['lote__tipo_dieta']] = {
+            'tasa': tasa,
+            'total_huevos': total_huevos,
+            'aves_dias': aves_dias,
+            'dias_reportados': fila['dias_reportados'],
+        }
+
+    return resultado
+
+
+# ==========================================
+# AGREGADOS DE PRODUCCIÓN (Desde el resumen diario)
+# ==========================================
+
+def produccion_por_producto(fecha_limite):
+    """
+    Kilos producidos por cada producto después de 'fecha_limite', en UNA consulta
+    sobre ResumenDiarioProduccion (una fila por producto y día) en vez de recorrer
+    todos los ReporteProduccion del periodo.
+
+    Devuelve {producto_id: total_kilos}; los productos sin producción no aparecen.
+    """
+    return dict(
+        ResumenDiarioProduccion.objects
+        .filter(fecha__gt=fecha_limite)
+        .values('producto_id')
+        .annotate(total=Sum('total_kilos'))
+        .order_by()
+        .values_list('producto_id', 'total')
+    )
+
+
+# ==========================================
+# RESÚMENES DIARIOS (Actualización incremental y reconstrucción)
+# ==========================================
+
+def _como_fecha(modelo, campo, valor):
+    """Las APIs reciben la fecha como texto o datetime; la normalizamos a date."""
+    return modelo._meta.get_field(campo).to_python(valor)
+
+
+def _acumular(modelo, filtro, incrementos):
+    """
+    Suma 'incrementos' a la fila del resumen con un UPDATE atómico (F()).
+    Si la fila del día todavía no existe la creamos; si otro proceso la creó
+    al mismo tiempo, reintentamos el UPDATE.
+    """
+    cambios = {campo: F(campo) + valor for campo, valor in incrementos.items()}
+    if modelo.objects.filter(**filtro).update(**cambios):
+        return
+    try:
+        with transaction.atomic():
+            modelo.objects.create(**filtro, **incrementos)
+    except IntegrityError:
+        modelo.objects.filter(**filtro).update(**cambios)
+
+
+def acumular_reporte_produccion(reporte):
+    """Suma un ReporteProduccion recién creado a su resumen del día."""
+    acumular_reportes_produccion([reporte])
+
+
+def acumular_reportes_produccion(reportes):
+    """Suma varios ReporteProduccion: un solo UPDATE por cada (día, producto)."""
+    grupos = defaultdict(lambda: {'total_kilos': Decimal('0'), 'cantidad_reportes': 0})
+    for reporte in reportes:
+        clave = (_como_fecha(ReporteProduccion, 'fecha_registro', reporte.fecha_registro), reporte.producto_id)
+        grupos[clave]['total_kilos'] += Decimal(str(reporte.cantidad_producida))
+        grupos[clave]['cantidad_reportes'] += 1
+
+    for (fecha, producto_id), incrementos in grupos.items():
+        _acumular(ResumenDiarioProduccion, {'fecha': fecha, 'producto_id': producto_id}, incrementos)
+
+
+def acumular_reporte_aves(reporte):
+    """Suma un ReporteDiarioAves recién creado a su resumen del día."""
+    acumular_reportes_aves([reporte])
+
+
+def acumular_reportes_aves(reportes):
+    """Suma varios ReporteDiarioAves: un solo UPDATE por cada (día, lote)."""
+    grupos = defaultdict(lambda: {
+        'huevos_recolectados': 0,
+        'huevos_rotos': 0,
+        'alimento_consumido_kg': Decimal('0'),
+        'mortalidad': 0,
+        'cantidad_reportes': 0,
+    })
+    for reporte in reportes:
+        clave = (_como_fecha(ReporteDiarioAves, 'fecha_reporte', reporte.fecha_reporte), reporte.lote_id)
+        grupo = grupos[clave]
+        grupo['huevos_recolectados'] += reporte.huevos_recolectados
+        grupo['huevos_rotos'] += reporte.huevos_rotos
+        grupo['alimento_consumido_kg'] += Decimal(str(reporte.alimento_consumido_kg))
+        grupo['mortalidad'] += reporte.mortalidad
+        grupo['cantidad_reportes'] += 1
+
+    for (fecha, lote_id), incrementos in grupos.items():
+        _acumular(ResumenDiarioLote, {'fecha': fecha, 'lote_id': lote_id}, incrementos)
+
+
+def _resumenes_produccion(**filtro):
+    """Filas de ResumenDiarioProduccion (sin guardar) calculadas desde los reportes crudos."""
+    filas = (
+        ReporteProduccion.objects
+        .filter(**filtro)
+        .values('fecha_registro', 'producto_id')
+        .annotate(total=Sum('cantidad_producida'), reportes=Count('id'))
+        .order_by()
+    )
+    return [
+        ResumenDiarioProduccion(
+            fecha=f['fecha_registro'],
+            producto_id=f['producto_id'],
+            total_kilos=f['total'],
+            cantidad_reportes=f['reportes'],
+        )
+        for f in filas.iterator()
+    ]
+
+
+def _resumenes_lote(**filtro):
+    """Filas de ResumenDiarioLote (sin guardar) calculadas desde los reportes crudos."""
+    filas = (
+        ReporteDiarioAves.objects
+        .filter(**filtro)
+        .values('fecha_reporte', 'lote_id')
+        .annotate(
+            huevos=Sum('huevos_recolectados'),
+            rotos=Sum('huevos_rotos'),
+            alimento=Sum('alimento_consumido_kg'),
+            muertes=Sum('mortalidad'),
+            reportes=Count('id'),
+        )
+        .order_by()
+    )
+    return [
+        ResumenDiarioLote(
+            fecha=f['fecha_reporte'],
+            lote_id=f['lote_id'],
+            huevos_recolectados=f['huevos'],
+            huevos_rotos=f['rotos'],
+            alimento_consumido_kg=f['alimento'],
+            mortalidad=f['muertes'],
+            cantidad_reportes=f['reportes'],
+        )
+        for f in filas.iterator()
+    ]
+
+
+@transaction.atomic
+def reconstruir_resumenes():
+    """
+    Borra y vuelve a calcular ambas tablas de resumen desde los reportes crudos.
+    Devuelve cuántas filas se crearon de cada tipo.
+    """
+    ResumenDiarioProduccion.objects.all().delete()
+    ResumenDiarioLote.objects.all().delete()
+    filas_prod = ResumenDiarioProduccion.objects.bulk_create(_resumenes_produccion(), batch_size=500)
+    filas_lote = ResumenDiarioLote.objects.bulk_create(_resumenes_lote(), batch_size=500)
+    return len(filas_prod), len(filas_lote)
+
+
+# --- Reportes guardados o borrados uno a uno (admin, shell) ---
+#
+# La ingesta usa bulk_create y suma con acumular_reportes_*; esos caminos no
+# disparan señales. Un reporte creado, editado o borrado con save()/delete()
+# (el admin de Django, por ejemplo) recalcula desde los reportes crudos las filas
+# del resumen que toca: la de antes de editarlo y la de después.
+
+# Modelo de reporte -> (campo de fecha, campo del producto o lote)
+CLAVES_RESUMEN = {
+    ReporteProduccion: ('fecha_registro', 'producto_id'),
+    ReporteDiarioAves: ('fecha_reporte', 'lote_id'),
+}
+
+
+@transaction.atomic
+def recalcular_resumen_produccion(fecha, producto_id):
+    """Vuelve a calcular la fila del resumen de ese día y producto (o la borra si ya no hay reportes)."""
+    ResumenDiarioProduccion.objects.filter(fecha=fecha, producto_id=producto_id).delete()
+    ResumenDiarioProduccion.objects.bulk_create(
+        _resumenes_produccion(fecha_registro=fecha, producto_id=producto_id)
+    )
+
+
+@transaction.atomic
+def recalcular_resumen_lote(fecha, lote_id):
+    """Vuelve a calcular la fila del resumen de ese día y lote (o la borra si ya no hay reportes)."""
+    ResumenDiarioLote.objects.filter(fecha=fecha, lote_id=lote_id).delete()
+    ResumenDiarioLote.objects.bulk_create(
+        _resumenes_lote(fecha_reporte=fecha, lote_id=lote_id)
+    )
+
+
+def _clave_resumen(modelo, reporte):
+    campo_fecha, campo_padre = CLAVES_RESUMEN[modelo]
+    return _como_fecha(modelo, campo_fecha, getattr(reporte, campo_fecha)), getattr(reporte, campo_padre)
+
+
+def _recalcular(modelo, fecha, padre_id):
+    if modelo is ReporteProduccion:
+        recalcular_resumen_produccion(fecha, padre_id)
+    else:
+        recalcular_resumen_lote(fecha, padre_id)
+
+
+def reporte_por_guardar(sender, instance, raw=False, **kwargs):
+    """pre_save: recuerda a qué día y producto/lote pertenecía el reporte antes de editarlo."""
+    if raw or instance._state.adding:
+        return
+    instance._clave_resumen_anterior = (
+        sender.objects.filter(pk=instance.pk).values_list(*CLAVES_RESUMEN[sender]).first()
+    )
+
+
+def reporte_guardado(sender, instance, raw=False, **kwargs):
+    """post_save: recalcula el resumen del reporte (y el de su día o producto/lote anterior si cambió)."""
+    if raw:
+        return
+    claves = {_clave_resumen(sender, instance)}
+    anterior = getattr(instance, '_clave_resumen_anterior', None)
+    if anterior:
+        claves.add(anterior)
+    for fecha, padre_id in claves:
+        _recalcular(sender, fecha, padre_id)
+
+
+def reporte_borrado(sender, instance, origin=None, **kwargs):
+    """post_delete: recalcula el resumen del día, salvo que se esté borrando el producto o lote entero."""
+    # Borrando un Producto o LoteAves sus resúmenes caen en cascada junto con los reportes
+    if origin is not None and getattr(origin, 'model', type(origin)) is not sender:
+        return
+    _recalcular(sender, *_clave_resumen(sender, instance))
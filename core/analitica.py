@@ -0,0 +1,165 @@
+from datetime import timedelta
+
+from django.core.paginator import Paginator
+from django.db.models import F, OuterRef, Subquery, Sum, Window
+from django.db.models.functions import Coalesce, RowNumber, Trunc
+from django.utils import timezone
+
+from .exportar import _leer_fecha, _leer_id
+from .models import LoteAves, ResumenDiarioLote
+
+
+# ==========================================
+# CURVAS DE POSTURA POR LOTE (Series de tiempo calculadas en la base de datos)
+# ==========================================
+
+# Granularidades de la más fina a la más gruesa: (nombre en la URL, kind de Trunc, días aprox. por punto)
+GRANULARIDADES = [
+    ('dia', 'day', 1),
+    ('semana', 'week', 7),
+    ('mes', 'month', 30),
+]
+
+DIAS_POR_DEFECTO = 90
+MAX_PUNTOS_POR_DEFECTO = 120
+LOTES_POR_PAGINA = 10
+MAX_LOTES_POR_PAGINA = 50
+
+
+def _elegir_granularidad(desde, hasta, pedida, max_puntos):
+    """
+    Devuelve (nombre, kind) de la granularidad a usar.
+    Si la pedida deja más de 'max_puntos' puntos por lote, pasamos a la
+    siguiente más gruesa (submuestreo); 'mes' es el último escalón.
+    """
+    nombres = [nombre for nombre, _, _ in GRANULARIDADES]
+    if pedida not in nombres:
+        raise ValueError(f"Granularidad inválida: {pedida} (use {', '.join(nombres)})")
+
+    dias = (hasta - desde).days + 1
+    for nombre, kind, dias_por_punto in GRANULARIDADES[nombres.index(pedida):]:
+        if dias / dias_por_punto <= max_puntos or nombre == 'mes':
+            return nombre, kind
+
+
+def _porcentaje(parte, total):
+    return round(float(parte) * 100 / float(total), 2) if total else None
+
+
+def _punto(fila, aves_iniciales):
+    """Arma un punto de la serie con los totales del periodo que trae la consulta."""
+    huevos = fila['huevos'] or 0
+    alimento = fila['alimento'] or 0
+    return {
+        'periodo': fila['periodo'].isoformat(),
+        'dias_reportados': fila['dias'],
+        'huevos': huevos,
+        # Mismo cálculo que el dashboard: huevos / (aves iniciales * días reportados)
+        'tasa_postura': _porcentaje(huevos, aves_iniciales * fila['dias']),
+        'alimento_kg': float(alimento),
+        # Conversión alimenticia: kilos de alimento por docena de huevos
+        'kg_por_docena': round(float(alimento) * 12 / huevos, 3) if huevos else None,
+        'mortalidad': fila['muertes'],
+        'mortalidad_acumulada': fila['mortalidad_acumulada'],
+        'mortalidad_acumulada_pct': _porcentaje(fila['mortalidad_acumulada'], aves_iniciales),
+        'huevos_rotos': fila['rotos'],
+        'proporcion_rotos': _porcentaje(fila['rotos'], huevos),
+    }
+
+
+def series_por_periodo(lote_ids, desde, hasta, kind):
+    """
+    Una fila por (lote, periodo) en UNA consulta sobre ResumenDiarioLote:
+      - Trunc agrupa cada día en su semana/mes.
+      - Funciones de ventana suman el periodo y acumulan la mortalidad del lote.
+      - Nos quedamos con la última fila de cada periodo (ROW_NUMBER() = 1).
+    La mortalidad anterior a 'desde' se suma con una subconsulta para que el
+    acumulado no arranque en cero a mitad de la vida del lote.
+    """
+    por_periodo = {'partition_by': [F('lote_id'), F('periodo')]}
+    mortalidad_previa = (
+        ResumenDiarioLote.objects
+        .filter(lote_id=OuterRef('lote_id'), fecha__lt=desde)
+        .values('lote_id')
+        .annotate(total=Sum('mortalidad'))
+        .values('total')
+    )
+    return (
+        ResumenDiarioLote.objects
+        .filter(lote_id__in=lote_ids, fecha__gte=desde, fecha__lte=hasta)
+        .annotate(periodo=Trunc('fecha', kind))
+        .annotate(
+            huevos=Window(Sum('huevos_recolectados'), **por_periodo),
+            rotos=Window(Sum('huevos_rotos'), **por_periodo),
+            alimento=Window(Sum('alimento_consumido_kg'), **por_periodo),
+            muertes=Window(Sum('mortalidad'), **por_periodo),
+            dias=Window(Sum('cantidad_reportes'), **por_periodo),
+            mortalidad_acumulada=Window(
+                Sum('mortalidad'), partition_by=[F('lote_id')], order_by=F('fecha').asc(),
+            ) + Coalesce(Subquery(mortalidad_previa), 0),
+            fila=Window(RowNumber(), order_by=F('fecha').desc(), **por_periodo),
+        )
+        .filter(fila=1)
+        .order_by('lote_id', 'periodo')
+        .values('lote_id', 'periodo', 'huevos', 'rotos', 'alimento', 'muertes', 'dias', 'mortalidad_acumulada')
+    )
+
+
+def curvas_de_postura(params):
+    """
+    Series por lote para la API de analítica. Parámetros de la URL (todos opcionales):
+      ?desde=&hasta=         rango (por defecto los últimos 90 días)
+      ?lote=ID | ?dieta=     un lote puntual o solo una dieta (por defecto los lotes activos)
+      ?granularidad=         dia | semana | mes (por defecto dia)
+      ?max_puntos=           tope de puntos por lote: si se supera se agrupa más grueso
+      ?pagina=&por_pagina=   paginación por lotes
+    Lanza ValueError si algún parámetro es inválido.
+    """
+    hasta = _leer_fecha(params, 'hasta') or timezone.localdate()
+    desde = _leer_fecha(params, 'desde') or hasta - timedelta(days=DIAS_POR_DEFECTO - 1)
+    if desde > hasta:
+        raise ValueError("'desde' no puede ser posterior a 'hasta'")
+
+    max_puntos = _leer_id(params, 'max_puntos') or MAX_PUNTOS_POR_DEFECTO
+    pedida = params.get('granularidad') or 'dia'
+    granularidad, kind = _elegir_granularidad(desde, hasta, pedida, max_puntos)
+
+    lotes = LoteAves.objects.order_by('id')
+    lote_id = _leer_id(params, 'lote')
+    if lote_id:
+        lotes = lotes.filter(id=lote_id)
+    else:
+        lotes = lotes.filter(activo=True)
+    dieta = params.get('dieta')
+    if dieta:
+        if dieta not in dict(LoteAves.DIETAS):
+            raise ValueError(f"Dieta inválida: {dieta}")
+        lotes = lotes.filter(tipo_dieta=dieta)
+
+    por_pagina = min(_leer_id(params, 'por_pagina') or LOTES_POR_PAGINA, MAX_LOTES_POR_PAGINA)
+    pagina = Paginator(lotes, por_pagina).get_page(_leer_id(params, 'pagina') or 1)
+
+    series = {lote.id: [] for lote in pagina}
+    aves = {lote.id: lote.cantidad_aves_inicial for lote in pagina}
+    for fila in series_por_periodo(list(series), desde, hasta, kind):
+        series[fila['lote_id']].append(_punto(fila, aves[fila['lote_id']]))
+
+    return {
+        'desde': desde.isoformat(),
+        'hasta': hasta.isoformat(),
+        'granularidad': granularidad,
+        'submuestreado': granularidad != pedida,
+        'pagina': pagina.number,
+        'paginas': pagina.paginator.num_pages,
+        'total_lotes': pagina.paginator.count,
+        'lotes': [
+            {
+                'id': lote.id,
+                'nombre': lote.nombre,
+                'tipo_dieta': lote.tipo_dieta,
+                'aves_iniciales': lote.cantidad_aves_inicial,
+                'serie': series[lote.id],
+            }
+            for lote in pagina
+        ],
+    }
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        # Conecta las señales de la caché del dashboard, del catálogo de la PWA y los PRAGMAs de SQLite
+        from . import signals  # noqa: F401
@@ -0,0 +1,42 @@
+import hashlib
+import os
+import threading
+
+from django.conf import settings
+
+
+# ==========================================
+# ARCHIVOS DE LA PWA EN MEMORIA (sw.js y manifest.json se sirven desde la raíz)
+# ==========================================
+
+RUTA_SERVICE_WORKER = os.path.join(settings.BASE_DIR, 'static', 'js', 'sw.js')
+RUTA_MANIFEST = os.path.join(settings.BASE_DIR, 'static', 'manifest.json')
+
+# ruta -> (mtime, contenido, hash md5 del contenido)
+_archivos = {}
+_candado = threading.Lock()
+
+
+def leer_en_memoria(ruta):
+    """
+    (contenido en bytes, hash md5) de un archivo. Solo vuelve a leer el disco
+    si cambió su fecha de modificación: cada pedido cuesta un os.stat().
+    Lanza FileNotFoundError si el archivo no existe.
+    """
+    mtime = os.stat(ruta).st_mtime_ns
+    guardado = _archivos.get(ruta)
+    if guardado is None or guardado[0] != mtime:
+        with _candado:
+            with open(ruta, 'rb') as archivo:
+                contenido = archivo.read()
+            guardado = (mtime, contenido, hashlib.md5(contenido).hexdigest())
+            _archivos[ruta] = guardado
+    return guardado[1], guardado[2]
+
+
+def etag_archivo(ruta):
+    """ETag para @condition: None si el archivo no existe (la vista responde 404)."""
+    try:
+        return leer_en_memoria(ruta)[1]
+    except FileNotFoundError:
+        return None
@@ -0,0 +1,106 @@
+import hashlib
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .models import MovimientoStock, ReporteDiarioAves, ReporteProduccion
+
+
+# ==========================================
+# CACHÉ DEL DASHBOARD (Invalidada por señales al escribir datos)
+# ==========================================
+
+CLAVE_VERSION = 'dashboard:version'
+CLAVE_ACIERTOS = 'dashboard:aciertos'
+CLAVE_FALLOS = 'dashboard:fallos'
+
+
+def _version():
+    # add() no pisa un valor existente: todos los procesos comparten la misma versión.
+    # Si se perdió, arrancamos desde la hora actual para no chocar con versiones viejas.
+    cache.add(CLAVE_VERSION, time.time_ns(), timeout=None)
+    return cache.get(CLAVE_VERSION)
+
+
+def _contar(clave):
+    cache.add(clave, 0, timeout=None)
+    try:
+        cache.incr(clave)
+    except ValueError:
+        # La clave expiró o se borró entre add() e incr()
+        cache.set(clave, 1, timeout=None)
+
+
+def obtener_datos_dashboard(dias, calcular):
+    """
+    Devuelve los datos del dashboard para 'dias' desde la caché o los calcula con 'calcular(dias)'.
+    La clave incluye la fecha de hoy (el periodo "últimos N días" se corre cada día)
+    y la versión, que sube cada vez que cambian reportes, productos o lotes.
+    """
+    clave = f"dashboard:{_version()}:{timezone.localdate().isoformat()}:{dias}"
+    datos = cache.get(clave)
+    if datos is not None:
+        _contar(CLAVE_ACIERTOS)
+        return datos
+
+    _contar(CLAVE_FALLOS)
+    datos = calcular(dias)
+    cache.set(clave, datos, timeout=getattr(settings, 'DASHBOARD_CACHE_SEGUNDOS', 300))
+    return datos
+
+
+def invalidar_dashboard(**kwargs):
+    """
+    Sube la versión: todas las entradas anteriores quedan huérfanas y expiran solas.
+    Acepta **kwargs para poder conectarse directamente a las señales de Django.
+    """
+    try:
+        cache.incr(CLAVE_VERSION)
+    except ValueError:
+        cache.set(CLAVE_VERSION, time.time_ns(), timeout=None)
+
+
+def estadisticas_cache():
+    aciertos = cache.get(CLAVE_ACIERTOS, 0)
+    fallos = cache.get(CLAVE_FALLOS, 0)
+    total = aciertos + fallos
+    return {
+        'aciertos': aciertos,
+        'fallos': fallos,
+        'tasa_aciertos': round(aciertos / total * 100, 2) if total else 0,
+        'version': cache.get(CLAVE_VERSION),
+    }
+
+
+def invalidar_dashboard_al_confirmar(**kwargs):
+    """
+    Invalida cuando la transacción se confirma: si invalidáramos antes, otro request
+    podría recalcular con los datos viejos y guardarlos con la versión nueva.
+    """
+    transaction.on_commit(invalidar_dashboard)
+
+
+def marca_datos_dashboard(dias):
+    """
+    (etag, last_modified) de los datos del dashboard para 'dias'.
+
+    Se arma con el último reporte de cada tabla (por id: una búsqueda por clave
+    primaria, sin recorrer la tabla) y la versión de la caché, que también sube
+    con borrados y cambios de productos o lotes. Como el periodo "últimos N días"
+    se corre cada día, Last-Modified nunca es anterior a la medianoche de hoy.
+    """
+    ultimos = [
+        modelo.objects.order_by('-id').values_list('id', 'created_at').first()
+        for modelo in (ReporteProduccion, ReporteDiarioAves, MovimientoStock)
+    ]
+    hoy = timezone.localdate()
+    contenido = f"{_version()}:{hoy.isoformat()}:{dias}:{ultimos}"
+    etag = hashlib.sha256(contenido.encode('utf-8')).hexdigest()[:32]
+
+    medianoche = timezone.make_aware(datetime.combine(hoy, datetime.min.time()))
+    last_modified = max([medianoche] + [ultimo[1] for ultimo in ultimos if ultimo])
+    return etag, last_modified
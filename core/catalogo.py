@@ -0,0 +1,123 @@
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Max
+
+from .models import CambioCatalogo, LoteAves, Producto
+
+
+# ==========================================
+# SINCRONIZACIÓN INCREMENTAL DEL CATÁLOGO (Productos y lotes para la PWA)
+# ==========================================
+
+# Sube si cambia la forma de la respuesta: app.js descarta su copia local y pide todo
+VERSION_PROTOCOLO = 1
+
+
+def registrar_cambio(modelo, objeto_id, borrado=False):
+    """
+    Deja un solo registro por objeto con un id nuevo (= nuevo cursor), recién
+    cuando se confirma la transacción que cambió el objeto.
+
+    El celular avanza su cursor hasta el id más alto que vio. Si el id se tomara
+    dentro de la transacción del cambio (la del hilo escritor puede ser larga),
+    otra transacción podría confirmar antes un id mayor y el celular saltaría el
+    menor para siempre. Por eso el registro va en on_commit, en una transacción
+    corta y con los escritores en fila (ver _guardar_cambio).
+    """
+    transaction.on_commit(lambda: _guardar_cambio(modelo, objeto_id, borrado))
+
+
+def _guardar_cambio(modelo, objeto_id, borrado):
+    """
+    En PostgreSQL tomamos un candado EXCLUSIVE de la tabla (las lecturas siguen
+    libres): así los ids se confirman en el mismo orden en que se asignan.
+    SQLite ya deja un solo escritor a la vez.
+    Si otro proceso registró el mismo objeto a la vez, reintentamos una vez.
+    """
+    for intento in range(2):
+        try:
+            with transaction.atomic():
+                if connection.vendor == 'postgresql':
+                    with connection.cursor() as cursor:
+                        cursor.execute(f'LOCK TABLE {CambioCatalogo._meta.db_table} IN EXCLUSIVE MODE')
+                CambioCatalogo.objects.filter(modelo=modelo, objeto_id=objeto_id).delete()
+                CambioCatalogo.objects.create(modelo=modelo, objeto_id=objeto_id, borrado=borrado)
+            return
+        except IntegrityError:
+            if intento:
+                raise
+
+
+def _producto(p):
+    return {'id': p.id, 'nombre': p.nombre, 'categoria': p.categoria}
+
+
+def _lote(lote):
+    return {'id': lote.id, 'nombre': lote.nombre, 'dieta': lote.get_tipo_dieta_display()}
+
+
+def _consultas(cursor, ultimo):
+    """(completo, productos, lotes, consulta de cambios o None) sin ejecutar nada todavía."""
+    completo = cursor <= 0 or cursor > ultimo
+    if completo:
+        return True, Producto.objects.order_by('id'), LoteAves.objects.filter(activo=True).order_by('id'), None
+    # id <= ultimo: lo que llegue mientras respondemos sale en la próxima sincronización
+    cambios = CambioCatalogo.objects.filter(id__gt=cursor, id__lte=ultimo).values_list('modelo', 'objeto_id')
+    return False, None, None, cambios
+
+
+def _ids_cambiados(filas):
+    ids = {'PRODUCTO': set(), 'LOTE': set()}
+    for modelo, objeto_id in filas:
+        ids[modelo].add(objeto_id)
+    return ids
+
+
+def _respuesta(ultimo, completo, productos, lotes, ids=None):
+    if ids is None:
+        borrados = {'productos': [], 'lotes': []}
+    else:
+        borrados = {
+            'productos': sorted(ids['PRODUCTO'] - {p.id for p in productos}),
+            'lotes': sorted(ids['LOTE'] - {lote.id for lote in lotes}),
+        }
+    return {
+        'version': VERSION_PROTOCOLO,
+        'cursor': ultimo,
+        'completo': completo,
+        'productos': [_producto(p) for p in productos],
+        'lotes': [_lote(lote) for lote in lotes],
+        'borrados': borrados,
+    }
+
+
+def cambios_desde(cursor):
+    """
+    Productos y lotes activos cambiados después de 'cursor', más los ids que el
+    celular debe borrar (eliminados o lotes desactivados).
+
+    Con cursor 0, o uno mayor que el último cambio (la base se reinstaló), se
+    manda el catálogo completo y 'completo': True para que el celular reemplace
+    todo lo que tiene.
+    """
+    ultimo = CambioCatalogo.objects.aggregate(ultimo=Max('id'))['ultimo'] or 0
+    completo, productos, lotes, cambios = _consultas(cursor, ultimo)
+    if completo:
+        return _respuesta(ultimo, completo, list(productos), list(lotes))
+
+    ids = _ids_cambiados(cambios)
+    productos = list(Producto.objects.filter(id__in=ids['PRODUCTO']).order_by('id'))
+    lotes = list(LoteAves.objects.filter(id__in=ids['LOTE'], activo=True).order_by('id'))
+    return _respuesta(ultimo, completo, productos, lotes, ids)
+
+
+async def cambios_desde_async(cursor):
+    """cambios_desde con el ORM async (vistas ASGI): las mismas consultas, sin ocupar un hilo."""
+    ultimo = (await CambioCatalogo.objects.aaggregate(ultimo=Max('id')))['ultimo'] or 0
+    completo, productos, lotes, cambios = _consultas(cursor, ultimo)
+    if completo:
+        return _respuesta(ultimo, completo, [p async for p in productos], [lote async for lote in lotes])
+
+    ids = _ids_cambiados([fila async for fila in cambios])
+    productos = [p async for p in Producto.objects.filter(id__in=ids['PRODUCTO']).order_by('id')]
+    lotes = [lote async for lote in LoteAves.objects.filter(id__in=ids['LOTE'], activo=True).order_by('id')]
+    return _respuesta(ultimo, completo, productos, lotes, ids)
@@ -0,0 +1,27 @@
+from django.conf import settings
+
+
+# ==========================================
+# AJUSTES POR CONEXIÓN A LA BASE DE DATOS
+# ==========================================
+
+def configurar_sqlite(sender, connection, **kwargs):
+    """
+    Aplica settings.SQLITE_PRAGMAS a cada conexión SQLite nueva (con CONN_MAX_AGE
+    es una vez por conexión persistente, no por request).
+
+    WAL deja leer mientras otro worker escribe, y busy_timeout hace que una
+    escritura espere su turno en vez de fallar con "database is locked"
+    cuando llega una ráfaga de sincronizaciones offline.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = dict(getattr(settings, 'SQLITE_PRAGMAS', {}))
+    if getattr(settings, 'SQLITE_SIN_WAL', False):
+        # Opción explícita para dejar el archivo en su journal original (ver settings)
+        pragmas.pop('journal_mode', None)
+        pragmas.pop('synchronous', None)
+    with connection.cursor() as cursor:
+        for nombre, valor in pragmas.items():
+            cursor.execute(f'PRAGMA {nombre} = {valor}')
+
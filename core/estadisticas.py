@@ -0,0 +1,260 @@
+import math
+
+import numpy as np
+
+from django.db.models import Count, F, Sum
+
+from .exportar import _leer_fecha, _leer_id
+from .models import LoteAves, ResumenDiarioLote
+
+
+# ==========================================
+# ESTADÍSTICA DEL ENSAYO ALGAS vs CONTROL (NumPy, sin bucles por fila)
+# ==========================================
+
+VENTANA_POR_DEFECTO = 7
+MAX_VENTANA = 90
+CONFIANZA = 0.95
+
+
+def _periodo(desde, hasta):
+    filas = ResumenDiarioLote.objects.all()
+    if desde:
+        filas = filas.filter(fecha__gte=desde)
+    if hasta:
+        filas = filas.filter(fecha__lte=hasta)
+    return filas
+
+
+def _columnas(filas, nombres):
+    """Filas (tuplas) -> {nombre: valores de esa columna}, listo para np.array."""
+    valores = list(zip(*filas)) or [()] * len(nombres)
+    return dict(zip(nombres, valores))
+
+
+def cargar_lotes(desde=None, hasta=None):
+    """
+    Totales de cada lote en el periodo como columnas NumPy:
+    es_algas, huevos, aves_dias y dias (días con reporte).
+
+    La base de datos suma el historial diario (ResumenDiarioLote, una fila por
+    lote y día) agrupando solo por lote_id, sin JOIN: traer años de filas a
+    Python para sumarlas tarda más que todo el cálculo. Los datos del lote
+    (dieta, aves) se cruzan después en NumPy.
+    aves_dias = aves iniciales * reportes, igual que el dashboard.
+    """
+    filas = (
+        _periodo(desde, hasta)
+        .values('lote_id')
+        .annotate(huevos=Sum('huevos_recolectados'), reportes=Sum('cantidad_reportes'), dias=Count('id'))
+        .order_by()
+        .values_list('lote_id', 'huevos', 'reportes', 'dias')
+    )
+    columnas = _columnas(filas, ['lote_id', 'huevos', 'reportes', 'dias'])
+    datos_lote = dict(
+        (lote_id, (dieta == 'ALGAS', aves))
+        for lote_id, dieta, aves in LoteAves.objects.values_list('id', 'tipo_dieta', 'cantidad_aves_inicial')
+    )
+    es_algas, aves = _columnas([datos_lote[i] for i in columnas['lote_id']], ['es_algas', 'aves']).values()
+    return {
+        'es_algas': np.array(es_algas, dtype=bool),
+        'huevos': np.array(columnas['huevos'], dtype=np.float64),
+        'aves_dias': np.array(aves, dtype=np.float64) * np.array(columnas['reportes'], dtype=np.float64),
+        'dias': np.array(columnas['dias'], dtype=np.int64),
+    }
+
+
+def cargar_diario(desde=None, hasta=None):
+    """Totales por dieta y día (UNA consulta agrupada) para los promedios móviles."""
+    filas = (
+        _periodo(desde, hasta)
+        .values('lote__tipo_dieta', 'fecha')
+        .annotate(
+            huevos=Sum('huevos_recolectados'),
+            aves_dias=Sum(F('lote__cantidad_aves_inicial') * F('cantidad_reportes')),
+        )
+        .order_by()
+        .values_list('lote__tipo_dieta', 'fecha', 'huevos', 'aves_dias')
+    )
+    columnas = _columnas(filas, ['dieta', 'fecha', 'huevos', 'aves_dias'])
+    return {
+        'es_algas': np.array(columnas['dieta'], dtype=object) == 'ALGAS',
+        'dia': np.array(columnas['fecha'], dtype='datetime64[D]'),
+        'huevos': np.array(columnas['huevos'], dtype=np.float64),
+        'aves_dias': np.array(columnas['aves_dias'], dtype=np.float64),
+    }
+
+
+# --- Distribución t de Student (sin SciPy) ---
+
+def _beta_incompleta(a, b, x):
+    """Beta incompleta regularizada I_x(a, b) por fracción continua (Lentz)."""
+    if x <= 0:
+        return 0.0
+    if x >= 1:
+        return 1.0
+    if x > (a + 1) / (a + b + 2):
+        return 1.0 - _beta_incompleta(b, a, 1 - x)
+
+    frente = math.exp(math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) + a * math.log(x) + b * math.log(1 - x)) / a
+    minimo = 1e-300
+    c, d = 1.0, 1.0 - (a + b) * x / (a + 1)
+    d = 1.0 / (d if abs(d) > minimo else minimo)
+    resultado = d
+    for m in range(1, 300):
+        for numerador in (
+            m * (b - m) * x / ((a + 2 * m - 1) * (a + 2 * m)),
+            -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 2 * m + 1)),
+        ):
+            d = 1.0 + numerador * d
+            d = 1.0 / (d if abs(d) > minimo else minimo)
+            c = 1.0 + numerador / c
+            c = c if abs(c) > minimo else minimo
+            resultado *= c * d
+        if abs(c * d - 1.0) < 1e-12:
+            break
+    return frente * resultado
+
+
+def cola_t(t, gl):
+    """P(T > t) para una t de Student con 'gl' grados de libertad (t >= 0)."""
+    return 0.5 * _beta_incompleta(gl / 2, 0.5, gl / (gl + t * t))
+
+
+def valor_critico_t(gl, confianza=CONFIANZA):
+    """t tal que P(|T| > t) = 1 - confianza (bisección sobre cola_t)."""
+    objetivo = (1 - confianza) / 2
+    bajo, alto = 0.0, 1000.0
+    for _ in range(100):
+        medio = (bajo + alto) / 2
+        if cola_t(medio, gl) > objetivo:
+            bajo = medio
+        else:
+            alto = medio
+    return (bajo + alto) / 2
+
+
+# --- Cálculos vectorizados ---
+
+def tasas_por_lote(lotes):
+    """
+    Tasa de postura de cada lote en el periodo (huevos / aves_dias), vectorizada.
+    La unidad del ensayo es el lote: los días de un mismo lote no son independientes.
+    """
+    validos = lotes['aves_dias'] > 0
+    return lotes['huevos'][validos] / lotes['aves_dias'][validos] * 100, lotes['es_algas'][validos]
+
+
+def resumen_dieta(tasas, lotes, mascara):
+    """Media, varianza e intervalo de confianza de las tasas de los lotes de una dieta."""
+    n = len(tasas)
+    huevos = lotes['huevos'][mascara].sum()
+    aves_dias = lotes['aves_dias'][mascara].sum()
+    resumen = {
+        'lotes': n,
+        'dias_lote': int(lotes['dias'][mascara].sum()),
+        'tasa_global': round(float(huevos / aves_dias * 100), 2) if aves_dias else 0,
+        'media': None,
+        'varianza': None,
+        'desviacion': None,
+        'ic': None,
+    }
+    if n == 0:
+        return resumen
+    media = float(tasas.mean())
+    resumen['media'] = round(media, 2)
+    if n > 1:
+        varianza = float(tasas.var(ddof=1))
+        margen = valor_critico_t(n - 1) * math.sqrt(varianza / n)
+        resumen.update(
+            varianza=round(varianza, 4),
+            desviacion=round(math.sqrt(varianza), 4),
+            ic=[round(media - margen, 2), round(media + margen, 2)],
+        )
+    return resumen
+
+
+def prueba_welch(algas, control):
+    """t de Welch (varianzas distintas) entre las tasas por lote de ambas dietas."""
+    na, nc = len(algas), len(control)
+    if na < 2 or nc < 2:
+        return None
+    va, vc = algas.var(ddof=1) / na, control.var(ddof=1) / nc
+    error = math.sqrt(va + vc)
+    if error == 0:
+        return None
+    diferencia = float(algas.mean() - control.mean())
+    t = diferencia / error
+    gl = (va + vc) ** 2 / (va ** 2 / (na - 1) + vc ** 2 / (nc - 1))
+    p = min(2 * cola_t(abs(t), gl), 1.0)
+    return {
+        'diferencia': round(diferencia, 2),
+        't': round(float(t), 4),
+        'grados_libertad': round(float(gl), 2),
+        'p_valor': round(p, 6),
+        'significativa': p < 1 - CONFIANZA,
+    }
+
+
+def promedios_moviles(diario, ventana=VENTANA_POR_DEFECTO):
+    """
+    Tasa diaria de cada dieta promediada en una ventana móvil de 'ventana' días
+    (suma de huevos / suma de aves_dias dentro de la ventana, con np.convolve).
+    """
+    if len(diario['dia']) == 0:
+        return {'fechas': [], **{dieta: [] for dieta, _ in LoteAves.DIETAS}}
+
+    primero = diario['dia'].min()
+    indice = (diario['dia'] - primero).astype(np.int64)
+    total_dias = int(indice.max()) + 1
+    nucleo = np.ones(ventana)
+
+    series = {'fechas': np.datetime_as_string(primero + np.arange(total_dias)).tolist()}
+    for dieta, mascara in (('ALGAS', diario['es_algas']), ('CONTROL', ~diario['es_algas'])):
+        huevos = np.bincount(indice[mascara], weights=diario['huevos'][mascara], minlength=total_dias)
+        aves_dias = np.bincount(indice[mascara], weights=diario['aves_dias'][mascara], minlength=total_dias)
+        huevos = np.convolve(huevos, nucleo)[:total_dias]
+        aves_dias = np.convolve(aves_dias, nucleo)[:total_dias]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            tasa = np.round(huevos / aves_dias * 100, 2)
+        series[dieta] = [None if math.isnan(v) else v for v in tasa.tolist()]
+    return series
+
+
+def analizar_ensayo(desde=None, hasta=None, ventana=VENTANA_POR_DEFECTO):
+    """Todo el análisis ALGAS vs CONTROL listo para JSON (dos consultas agrupadas)."""
+    lotes = cargar_lotes(desde, hasta)
+    tasas, es_algas = tasas_por_lote(lotes)
+
+    dietas = {
+        'ALGAS': resumen_dieta(tasas[es_algas], lotes, lotes['es_algas']),
+        'CONTROL': resumen_dieta(tasas[~es_algas], lotes, ~lotes['es_algas']),
+    }
+    prueba = prueba_welch(tasas[es_algas], tasas[~es_algas])
+
+    if prueba is None or not prueba['significativa']:
+        ganador = None  # Sin diferencia demostrable entre dietas
+    else:
+        ganador = 'ALGAS' if prueba['diferencia'] > 0 else 'CONTROL'
+
+    return {
+        'dietas': dietas,
+        'prueba': prueba,
+        'ganador': ganador,
+        'confianza': CONFIANZA,
+        'ventana': ventana,
+        'promedio_movil': promedios_moviles(cargar_diario(desde, hasta), ventana),
+    }
+
+
+def analisis_por_parametros(params):
+    """
+    analizar_ensayo con los parámetros de la URL: ?desde=&hasta=&ventana=
+    Lanza ValueError si alguno es inválido.
+    """
+    desde = _leer_fecha(params, 'desde')
+    hasta = _leer_fecha(params, 'hasta')
+    if desde and hasta and desde > hasta:
+        raise ValueError("'desde' no puede ser posterior a 'hasta'")
+    ventana = min(_leer_id(params, 'ventana') or VENTANA_POR_DEFECTO, MAX_VENTANA)
+    return analizar_ensayo(desde, hasta, ventana)
@@ -0,0 +1,50 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+
+# ==========================================
+# ARCHIVOS ESTÁTICOS BAJO ASGI (WhiteNoise sin cortar la cadena async)
+# ==========================================
+#
+# El middleware de WhiteNoise 6.6 solo es sync: bajo ASGI Django tiene que
+# adaptar la cadena con async_to_sync/sync_to_async y las vistas async (ingesta,
+# catálogo) terminan corriendo en un hilo, que es justo lo que queríamos evitar.
+# Esta versión declara las dos modalidades: bajo WSGI se comporta igual que
+# WhiteNoise y bajo ASGI sigue la cadena con await.
+
+TAMANO_TROZO = 64 * 1024
+
+
+class WhiteNoiseAsyncMiddleware(WhiteNoiseMiddleware):
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            # En DEBUG busca el archivo en disco en cada request: fuera del event loop
+            static_file = await sync_to_async(self.find_file, thread_sensitive=False)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            response = self.serve(static_file, request)
+            if response.file_to_stream is not None:
+                # Con un iterador sync Django leería el archivo entero en memoria antes de enviarlo
+                response.streaming_content = _leer_por_trozos(response.file_to_stream)
+            return response
+        return await self.get_response(request)
+
+
+async def _leer_por_trozos(archivo, tamano=TAMANO_TROZO):
+    leer = sync_to_async(archivo.read, thread_sensitive=False)
+    while trozo := await leer(tamano):
+        yield trozo
@@ -0,0 +1,308 @@
+import csv
+import tempfile
+import zlib
+
+from django.db.models import Max
+from django.db.models.functions import Length
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils.dateparse import parse_date
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Font, PatternFill
+from openpyxl.utils import get_column_letter
+
+from .models import LoteAves, Producto, ReporteDiarioAves, ReporteProduccion
+
+
+# ==========================================
+# FILTROS COMUNES (?desde=YYYY-MM-DD&hasta=YYYY-MM-DD&producto=ID / &lote=ID)
+# ==========================================
+
+def _leer_fecha(params, nombre):
+    valor = params.get(nombre)
+    if not valor:
+        return None
+    fecha = parse_date(valor)
+    if fecha is None:
+        raise ValueError(f"Fecha inválida en '{nombre}': {valor} (use YYYY-MM-DD)")
+    return fecha
+
+
+def _leer_id(params, nombre):
+    valor = params.get(nombre)
+    if not valor:
+        return None
+    if not valor.isdigit():
+        raise ValueError(f"'{nombre}' debe ser un número: {valor}")
+    return int(valor)
+
+
+def filtrar_produccion(params):
+    """Aplica los filtros de la URL a ReporteProduccion. Lanza ValueError si son inválidos."""
+    reportes = ReporteProduccion.objects.all()
+    desde = _leer_fecha(params, 'desde')
+    hasta = _leer_fecha(params, 'hasta')
+    producto = _leer_id(params, 'producto')
+    if desde:
+        reportes = reportes.filter(fecha_registro__gte=desde)
+    if hasta:
+        reportes = reportes.filter(fecha_registro__lte=hasta)
+    if producto:
+        reportes = reportes.filter(producto_id=producto)
+    return reportes
+
+
+def filtrar_granja(params):
+    """Aplica los filtros de la URL a ReporteDiarioAves. Lanza ValueError si son inválidos."""
+    reportes = ReporteDiarioAves.objects.all()
+    desde = _leer_fecha(params, 'desde')
+    hasta = _leer_fecha(params, 'hasta')
+    lote = _leer_id(params, 'lote')
+    if desde:
+        reportes = reportes.filter(fecha_reporte__gte=desde)
+    if hasta:
+        reportes = reportes.filter(fecha_reporte__lte=hasta)
+    if lote:
+        reportes = reportes.filter(lote_id=lote)
+    return reportes
+
+
+# ==========================================
+# EXPORTACIONES EXCEL (Modo "write-only", memoria constante)
+# ==========================================
+
+CONTENT_TYPE_XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Cuántas filas trae la base de datos por cada viaje al recorrer el iterator()
+TAMANO_LOTE = 2000
+
+# Ancho fijo para columnas de fecha y número (Ej: '31/12/2025', '123456.78')
+ANCHO_FECHA = 12
+ANCHO_NUMERO = 14
+
+
+def _cabecera(ws, headers, font, fill, alignment=None):
+    celdas = []
+    for titulo in headers:
+        celda = WriteOnlyCell(ws, value=titulo)
+        celda.font = font
+        celda.fill = fill
+        if alignment:
+            celda.alignment = alignment
+        celdas.append(celda)
+    ws.append(celdas)
+
+
+def _fijar_anchos(ws, headers, anchos):
+    """
+    En modo write-only los anchos se escriben ANTES que las filas,
+    así que los calculamos con una consulta previa (Max(Length(...))).
+    """
+    for i, titulo in enumerate(headers, start=1):
+        ancho = max(len(titulo), anchos[i - 1] or 0) + 2
+        ws.column_dimensions[get_column_letter(i)].width = ancho
+
+
+def _fila_total(ws, columna_etiqueta, etiqueta, valores, font_valores):
+    """Agrega la fila de totales: la etiqueta en 'columna_etiqueta' y los valores a su derecha."""
+    fila = [None] * (columna_etiqueta - 1)
+    celda = WriteOnlyCell(ws, value=etiqueta)
+    celda.font = Font(bold=True)
+    fila.append(celda)
+    for valor in valores:
+        celda = WriteOnlyCell(ws, value=valor)
+        celda.font = font_valores
+        fila.append(celda)
+    ws.append(fila)
+
+
+def escribir_excel_algas(destino, reportes=None):
+    """
+    Escribe el Excel de producción de algas en 'destino' (ruta o archivo abierto).
+    Recorre los reportes UNA sola vez con iterator(), sumando el total en el camino.
+    """
+    if reportes is None:
+        reportes = ReporteProduccion.objects.all()
+    reportes = reportes.order_by('-fecha_registro')
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Reporte Algas")
+
+    headers = ['Fecha Registro', 'Fecha Sistema', 'Producto', 'Categoría', 'Cantidad (Kg/L)', 'Responsable']
+    categorias = dict(Producto.CATEGORIAS)
+
+    largos = reportes.aggregate(
+        producto=Max(Length('producto__nombre')),
+        responsable=Max(Length('responsable')),
+    )
+    _fijar_anchos(ws, headers, [
+        ANCHO_FECHA,
+        ANCHO_FECHA,
+        largos['producto'],
+        max((len(c) for c in categorias.values()), default=0),
+        max(ANCHO_NUMERO, len("TOTAL PRODUCIDO:")),
+        largos['responsable'],
+    ])
+
+    _cabecera(
+        ws, headers,
+        font=Font(bold=True, color="FFFFFF"),
+        fill=PatternFill(start_color="1a252f", end_color="1a252f", fill_type="solid"),
+        alignment=Alignment(horizontal="center"),
+    )
+
+    filas = reportes.values_list(
+        'fecha_registro', 'created_at', 'producto__nombre', 'producto__categoria',
+        'cantidad_producida', 'responsable',
+    )
+
+    total_kg = 0
+    for fecha, creado, nombre, categoria, cantidad, responsable in filas.iterator(chunk_size=TAMANO_LOTE):
+        total_kg += float(cantidad)
+        ws.append([
+            fecha,
+            creado.strftime("%d/%m/%Y"),
+            nombre,
+            categorias.get(categoria, categoria),
+            float(cantidad),  # Importante que sea número para que Excel sume
+            responsable,
+        ])
+
+    _fila_total(ws, 4, "TOTAL PRODUCIDO:", [total_kg], Font(bold=True, color="008000"))
+    wb.save(destino)
+
+
+def escribir_excel_granja(destino, reportes=None):
+    """
+    Escribe el Excel de la granja en 'destino' (ruta o archivo abierto).
+    """
+    if reportes is None:
+        reportes = ReporteDiarioAves.objects.all()
+    reportes = reportes.order_by('-fecha_reporte')
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Reporte Granja")
+
+    # ReporteDiarioAves no guarda responsable: la última columna son las observaciones
+    headers = ['Fecha Reporte', 'Lote', 'Dieta', 'Huevos', 'Alimento (Kg)', 'Mortalidad', 'Obs']
+    dietas = dict(LoteAves.DIETAS)
+
+    largos = reportes.aggregate(
+        lote=Max(Length('lote__nombre')),
+        observaciones=Max(Length('observaciones')),
+    )
+    _fijar_anchos(ws, headers, [
+        ANCHO_FECHA,
+        largos['lote'],
+        max(max((len(d) for d in dietas.values()), default=0), len("TOTALES:")),
+        ANCHO_NUMERO,
+        ANCHO_NUMERO,
+        ANCHO_NUMERO,
+        largos['observaciones'],
+    ])
+
+    _cabecera(
+        ws, headers,
+        font=Font(bold=True, color="FFFFFF"),
+        fill=PatternFill(start_color="e65100", end_color="e65100", fill_type="solid"),  # Naranja para granja
+    )
+
+    filas = reportes.values_list(
+        'fecha_reporte', 'lote__nombre', 'lote__tipo_dieta', 'huevos_recolectados',
+        'alimento_consumido_kg', 'mortalidad', 'observaciones',
+    )
+
+    total_huevos = 0
+    total_alimento = 0
+    for fecha, lote, dieta, huevos, alimento, mortalidad, observaciones in filas.iterator(chunk_size=TAMANO_LOTE):
+        total_huevos += huevos
+        total_alimento += float(alimento)
+        ws.append([
+            fecha,
+            lote,
+            dietas.get(dieta, dieta),
+            huevos,
+            float(alimento),
+            mortalidad,
+            observaciones,
+        ])
+
+    _fila_total(ws, 3, "TOTALES:", [total_huevos, total_alimento], Font(bold=True))
+    wb.save(destino)
+
+
+def respuesta_excel(escribir, nombre_archivo, reportes=None):
+    """
+    Genera el Excel en un archivo temporal (no en RAM) y lo envía por partes
+    con FileResponse (StreamingHttpResponse). El temporal se borra al cerrar.
+    """
+    archivo = tempfile.TemporaryFile(suffix='.xlsx')
+    escribir(archivo, reportes)
+    archivo.seek(0)
+    return FileResponse(
+        archivo,
+        as_attachment=True,
+        filename=nombre_archivo,
+        content_type=CONTENT_TYPE_XLSX,
+    )
+
+
+# ==========================================
+# EXPORTACIONES CSV (Streaming real, fila por fila)
+# ==========================================
+
+class _Eco:
+    """Pseudo-archivo: csv.writer le 'escribe' y nosotros devolvemos la línea tal cual."""
+    def write(self, valor):
+        return valor
+
+
+def filas_csv_produccion(reportes):
+    writer = csv.writer(_Eco())
+    yield writer.writerow(['fecha_registro', 'created_at', 'producto_id', 'producto', 'categoria', 'cantidad_producida', 'responsable'])
+    filas = reportes.order_by('fecha_registro', 'created_at').values_list(
+        'fecha_registro', 'created_at', 'producto_id', 'producto__nombre', 'producto__categoria',
+        'cantidad_producida', 'responsable',
+    )
+    for fecha, creado, producto_id, nombre, categoria, cantidad, responsable in filas.iterator(chunk_size=TAMANO_LOTE):
+        yield writer.writerow([fecha.isoformat(), creado.isoformat(), producto_id, nombre, categoria, cantidad, responsable])
+
+
+def filas_csv_granja(reportes):
+    writer = csv.writer(_Eco())
+    yield writer.writerow(['fecha_reporte', 'created_at', 'lote_id', 'lote', 'tipo_dieta', 'huevos_recolectados', 'huevos_rotos', 'alimento_consumido_kg', 'mortalidad', 'observaciones'])
+    filas = reportes.order_by('fecha_reporte', 'created_at').values_list(
+        'fecha_reporte', 'created_at', 'lote_id', 'lote__nombre', 'lote__tipo_dieta',
+        'huevos_recolectados', 'huevos_rotos', 'alimento_consumido_kg', 'mortalidad', 'observaciones',
+    )
+    for fecha, creado, lote_id, lote, dieta, huevos, rotos, alimento, mortalidad, observaciones in filas.iterator(chunk_size=TAMANO_LOTE):
+        yield writer.writerow([fecha.isoformat(), creado.isoformat(), lote_id, lote, dieta, huevos, rotos, alimento, mortalidad, observaciones or ''])
+
+
+def _comprimir_gzip(lineas, cada=TAMANO_LOTE):
+    """
+    Comprime las líneas en formato gzip a medida que llegan.
+    Cada 'cada' líneas hacemos flush para que el cliente reciba datos sin esperar al final.
+    """
+    compresor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 -> cabecera gzip
+    pendientes = 0
+    for linea in lineas:
+        bloque = compresor.compress(linea.encode('utf-8'))
+        pendientes += 1
+        if pendientes >= cada:
+            bloque += compresor.flush(zlib.Z_SYNC_FLUSH)
+            pendientes = 0
+        if bloque:
+            yield bloque
+    yield compresor.flush()
+
+
+def respuesta_csv(lineas, nombre_archivo, comprimido=False):
+    """Envía el CSV con StreamingHttpResponse; opcionalmente comprimido con gzip (.csv.gz)."""
+    if comprimido:
+        response = StreamingHttpResponse(_comprimir_gzip(lineas), content_type='application/gzip')
+        nombre_archivo += '.gz'
+    else:
+        response = StreamingHttpResponse(lineas, content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{nombre_archivo}"'
+    return response
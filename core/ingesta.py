@@ -0,0 +1,223 @@
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .agregados import acumular_reportes_aves, acumular_reportes_produccion
+from .cache_dashboard import invalidar_dashboard_al_confirmar
+from .inventario import movimiento_de_produccion, registrar_movimientos
+from .models import LoteAves, Producto, ReporteDiarioAves, ReporteProduccion
+
+
+# ==========================================
+# INGESTA DE REPORTES (Uno a uno o en lote desde la cola offline)
+# ==========================================
+
+# Máximo de reportes aceptados en una sola llamada a /api/guardar-lote/
+MAX_REPORTES_POR_LOTE = 500
+
+
+def _fecha(datos):
+    """La fecha real cuando se hizo el trabajo (offline) o la de hoy."""
+    valor = datos.get('fecha_registro')
+    if not valor:
+        return timezone.localdate()
+    fecha = parse_date(str(valor)[:10])
+    if fecha is None:
+        raise ValueError(f"Fecha inválida: {valor}")
+    return fecha
+
+
+def _decimal(valor, nombre):
+    try:
+        return Decimal(str(valor))
+    except (InvalidOperation, TypeError):
+        raise ValueError(f"'{nombre}' no es un número válido: {valor}")
+
+
+def _entero(valor, nombre, defecto=None):
+    if valor in (None, '') and defecto is not None:
+        return defecto
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        raise ValueError(f"'{nombre}' no es un número entero: {valor}")
+
+
+def _conteo(valor, nombre, defecto=None):
+    """
+    Entero >= 0. Los PositiveIntegerField no traen un validador que full_clean
+    revise: sin esto el negativo llegaba al CHECK de la base como IntegrityError.
+    """
+    numero = _entero(valor, nombre, defecto)
+    if numero < 0:
+        raise ValueError(f"'{nombre}' no puede ser negativo: {valor}")
+    return numero
+
+
+def clave_cliente(datos):
+    """
+    Clave de idempotencia: el temp_id que app.js genera para cada reporte.
+    Reportes sin temp_id (clientes viejos) se guardan siempre, sin deduplicar.
+    """
+    valor = datos.get('temp_id')
+    if valor in (None, ''):
+        return None
+    return str(valor)[:64]
+
+
+def _validar(reporte, excluir):
+    """full_clean sin los ForeignKey (ya los buscamos todos juntos) para no hacer 1 consulta por reporte."""
+    try:
+        reporte.full_clean(exclude=excluir)
+    except ValidationError as e:
+        raise ValueError("; ".join(f"{campo}: {' '.join(errores)}" for campo, errores in e.message_dict.items()))
+
+
+def construir_reporte_produccion(datos, producto):
+    """Arma (sin guardar) un ReporteProduccion a partir del JSON de app.js."""
+    if producto is None:
+        raise ValueError(f"Producto no encontrado: {datos.get('producto_id')}")
+    reporte = ReporteProduccion(
+        producto=producto,
+        cantidad_producida=_decimal(datos.get('cantidad'), 'cantidad'),
+        responsable=datos.get('responsable') or '',
+        fecha_registro=_fecha(datos),
+        id_cliente=clave_cliente(datos),
+    )
+    # id_cliente también se excluye: su unicidad la resolvemos nosotros sin 1 consulta por reporte
+    _validar(reporte, ['producto', 'id_cliente'])
+    return reporte
+
+
+def construir_reporte_aves(datos, lote):
+    """Arma (sin guardar) un ReporteDiarioAves a partir del JSON de app.js."""
+    if lote is None:
+        raise ValueError(f"Lote no encontrado: {datos.get('lote_id')}")
+    responsable = datos.get('responsable')
+    offline = bool(datos.get('fecha_registro'))
+    reporte = ReporteDiarioAves(
+        lote=lote,
+        huevos_recolectados=_conteo(datos.get('huevos'), 'huevos'),
+        alimento_consumido_kg=_decimal(datos.get('alimento'), 'alimento'),
+        mortalidad=_conteo(datos.get('mortalidad'), 'mortalidad', defecto=0),
+        # Observaciones automáticas si es offline
+        observaciones=f"Rep. por {responsable} (Offline)" if offline else f"Rep. por {responsable}",
+        fecha_reporte=_fecha(datos),
+        id_cliente=clave_cliente(datos),
+    )
+    _validar(reporte, ['lote', 'id_cliente'])
+    return reporte
+
+
+def _tipo(datos):
+    """app.js manda 'tipo' (ALGAS / GRANJA); si falta lo deducimos de los campos."""
+    tipo = (datos.get('tipo') or '').upper()
+    if tipo in ('ALGAS', 'GRANJA'):
+        return tipo
+    if 'producto_id' in datos:
+        return 'ALGAS'
+    if 'lote_id' in datos:
+        return 'GRANJA'
+    raise ValueError("No se reconoce el tipo de reporte (ALGAS o GRANJA)")
+
+
+def _buscar_por_id(modelo, items, campo):
+    ids = set()
+    for datos in items:
+        if not isinstance(datos, dict):
+            continue
+        try:
+            ids.add(int(datos.get(campo)))
+        except (TypeError, ValueError):
+            pass
+    return modelo.objects.in_bulk(ids) if ids else {}
+
+
+def _claves_existentes(modelo, claves):
+    claves = [c for c in claves if c]
+    if not claves:
+        return set()
+    return set(modelo.objects.filter(id_cliente__in=claves).values_list('id_cliente', flat=True))
+
+
+def guardar_lote_reportes(items):
+    """
+    Valida y guarda una lista mezclada de reportes ALGAS / GRANJA.
+
+    - Productos y lotes se buscan con UNA consulta cada uno (in_bulk).
+    - Los temp_id ya guardados se buscan con UNA consulta por tabla: esos
+      reportes se responden 'ok' (duplicado) sin volver a sumar nada.
+    - Los reportes válidos se insertan con bulk_create en UNA transacción,
+      junto con el stock y los resúmenes diarios.
+    - Devuelve un resultado por cada item, en el mismo orden.
+    """
+    try:
+        return _guardar_lote(items)
+    except IntegrityError:
+        # Solo es una carrera si otro envío guardó alguno de estos temp_id mientras
+        # tanto: repetimos y esos reportes aparecerán como duplicados. Cualquier otro
+        # IntegrityError es un error de datos y no se responde como "ya estaba guardado"
+        # (app.js borraría el reporte del celular sin que nadie lo haya guardado).
+        claves = [clave_cliente(d) for d in items if isinstance(d, dict)]
+        if not (_claves_existentes(ReporteProduccion, claves) or _claves_existentes(ReporteDiarioAves, claves)):
+            raise
+        return _guardar_lote(items)
+
+
+def _guardar_lote(items):
+    productos = _buscar_por_id(Producto, items, 'producto_id')
+    lotes = _buscar_por_id(LoteAves, items, 'lote_id')
+
+    claves = [clave_cliente(d) for d in items if isinstance(d, dict)]
+    vistas = {
+        'ALGAS': _claves_existentes(ReporteProduccion, claves),
+        'GRANJA': _claves_existentes(ReporteDiarioAves, claves),
+    }
+
+    resultados = []
+    nuevos_prod = []
+    nuevos_aves = []
+
+    for datos in items:
+        resultado = {'temp_id': datos.get('temp_id') if isinstance(datos, dict) else None}
+        try:
+            if not isinstance(datos, dict):
+                raise ValueError("Cada reporte debe ser un objeto JSON")
+            tipo = _tipo(datos)
+            clave = clave_cliente(datos)
+            if clave and clave in vistas[tipo]:
+                resultado.update(status='ok', duplicado=True)
+                resultados.append(resultado)
+                continue
+
+            if tipo == 'ALGAS':
+                producto = productos.get(_entero(datos.get('producto_id'), 'producto_id'))
+                nuevos_prod.append(construir_reporte_produccion(datos, producto))
+            else:
+                lote = lotes.get(_entero(datos.get('lote_id'), 'lote_id'))
+                nuevos_aves.append(construir_reporte_aves(datos, lote))
+            if clave:
+                vistas[tipo].add(clave)  # Repetido dentro del mismo paquete
+            resultado['status'] = 'ok'
+        except ValueError as e:
+            resultado.update(status='error', mensaje=str(e))
+        resultados.append(resultado)
+
+    with transaction.atomic():
+        ReporteProduccion.objects.bulk_create(nuevos_prod)
+        ReporteDiarioAves.objects.bulk_create(nuevos_aves)
+
+        # Stock: una entrada en el libro por reporte y un solo UPDATE por producto
+        registrar_movimientos([movimiento_de_produccion(r) for r in nuevos_prod])
+
+        acumular_reportes_produccion(nuevos_prod)
+        acumular_reportes_aves(nuevos_aves)
+
+        # bulk_create no dispara señales: avisamos a la caché del dashboard nosotros
+        if nuevos_prod or nuevos_aves:
+            invalidar_dashboard_al_confirmar()
+
+    return resultados
@@ -0,0 +1,148 @@
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+
+from .agregados import produccion_por_producto
+from .cache_dashboard import invalidar_dashboard_al_confirmar
+from .models import MovimientoStock, Producto, SnapshotStock
+
+
+# ==========================================
+# LIBRO DE STOCK (Movimientos + saldos por fecha)
+# ==========================================
+
+def movimiento_de_produccion(reporte):
+    """El movimiento de entrada que corresponde a un ReporteProduccion."""
+    return MovimientoStock(
+        producto_id=reporte.producto_id,
+        tipo='PRODUCCION',
+        cantidad=Decimal(str(reporte.cantidad_producida)),
+        fecha=MovimientoStock._meta.get_field('fecha').to_python(reporte.fecha_registro),
+        reporte=reporte if reporte.pk else None,
+        nota=f"Reporte #{reporte.pk}" if reporte.pk else "",
+    )
+
+
+def registrar_movimientos(movimientos):
+    """
+    Guarda los movimientos y los aplica al stock_actual de cada producto.
+
+    - Un UPDATE atómico (F) por producto con la suma de sus movimientos.
+    - Si un producto no existe se lanza Producto.DoesNotExist (y se revierte todo).
+    - Los snapshots desde la fecha del movimiento más antiguo quedan obsoletos
+      (llegó un reporte offline con fecha pasada) y se borran.
+    """
+    if not movimientos:
+        return []
+
+    suma_por_producto = defaultdict(Decimal)
+    fecha_minima = {}
+    for mov in movimientos:
+        mov.fecha = MovimientoStock._meta.get_field('fecha').to_python(mov.fecha)
+        suma_por_producto[mov.producto_id] += Decimal(str(mov.cantidad))
+        if mov.producto_id not in fecha_minima or mov.fecha < fecha_minima[mov.producto_id]:
+            fecha_minima[mov.producto_id] = mov.fecha
+
+    with transaction.atomic():
+        for producto_id, suma in suma_por_producto.items():
+            actualizados = Producto.objects.filter(id=producto_id).update(
+                stock_actual=F('stock_actual') + suma
+            )
+            if not actualizados:
+                raise Producto.DoesNotExist("Producto matching query does not exist.")
+
+        creados = MovimientoStock.objects.bulk_create(movimientos)
+
+        obsoletos = Q()
+        for producto_id, fecha in fecha_minima.items():
+            obsoletos |= Q(producto_id=producto_id, fecha__gte=fecha)
+        SnapshotStock.objects.filter(obsoletos).delete()
+
+        # update() no dispara señales: avisamos a la caché del dashboard nosotros
+        invalidar_dashboard_al_confirmar()
+
+    return creados
+
+
+def saldo_actual(producto):
+    """O(1): el saldo vigente ya está materializado en el producto."""
+    return producto.stock_actual
+
+
+def saldo_en_fecha(producto_id, fecha):
+    """
+    Stock al cierre de 'fecha' = último snapshot <= fecha + movimientos posteriores hasta 'fecha'.
+    Son dos consultas por índice (producto, fecha), sin recorrer toda la historia.
+    """
+    snapshot = (
+        SnapshotStock.objects
+        .filter(producto_id=producto_id, fecha__lte=fecha)
+        .order_by('-fecha')
+        .first()
+    )
+    movimientos = MovimientoStock.objects.filter(producto_id=producto_id, fecha__lte=fecha)
+    saldo = Decimal('0')
+    if snapshot:
+        movimientos = movimientos.filter(fecha__gt=snapshot.fecha)
+        saldo = snapshot.saldo
+    return saldo + (movimientos.aggregate(total=Sum('cantidad'))['total'] or Decimal('0'))
+
+
+@transaction.atomic
+def compactar_snapshots(hasta=None):
+    """
+    Crea un snapshot por cada día con movimientos, desde el último snapshot de cada
+    producto hasta 'hasta' (por defecto ayer: el día de hoy sigue abierto).
+    Devuelve cuántos snapshots se crearon.
+    """
+    if hasta is None:
+        hasta = timezone.localdate() - timedelta(days=1)
+
+    nuevos = []
+    for producto_id in Producto.objects.values_list('id', flat=True):
+        ultimo = SnapshotStock.objects.filter(producto_id=producto_id).order_by('-fecha').first()
+        saldo = ultimo.saldo if ultimo else Decimal('0')
+        diarios = MovimientoStock.objects.filter(producto_id=producto_id, fecha__lte=hasta)
+        if ultimo:
+            diarios = diarios.filter(fecha__gt=ultimo.fecha)
+        diarios = diarios.values('fecha').annotate(neto=Sum('cantidad')).order_by('fecha')
+        for dia in diarios:
+            saldo += dia['neto']
+            nuevos.append(SnapshotStock(producto_id=producto_id, fecha=dia['fecha'], saldo=saldo))
+
+    SnapshotStock.objects.bulk_create(nuevos, batch_size=500)
+    return len(nuevos)
+
+
+def proyeccion_por_tendencia(productos, dias, producido=None):
+    """
+    Proyecta el stock a 'dias' días repitiendo el movimiento neto real de los
+    últimos 'dias' días (producción - despachos).
+    - La producción sale del resumen diario (produccion_por_producto); quien ya la
+      tenga calculada para el mismo periodo la pasa en 'producido'.
+    - Los despachos salen del libro, en UNA consulta agrupada.
+    - Los AJUSTE no son tendencia (un conteo corregido no se repite cada semana).
+    La producción diaria no puede superar la capacidad instalada del producto.
+    """
+    desde = timezone.localdate() - timedelta(days=dias)
+    if producido is None:
+        producido = produccion_por_producto(desde)
+    despachado = dict(
+        MovimientoStock.objects
+        .filter(fecha__gt=desde, tipo='DESPACHO')
+        .values('producto_id')
+        .annotate(total=Sum('cantidad'))
+        .order_by()
+        .values_list('producto_id', 'total')
+    )
+
+    proyecciones = {}
+    for p in productos:
+        produccion_diaria = min((producido.get(p.id) or Decimal('0')) / dias, p.capacidad_maxima_diaria)
+        promedio_diario = produccion_diaria + (despachado.get(p.id) or Decimal('0')) / dias
+        proyecciones[p.id] = max(p.stock_actual + promedio_diario * dias, Decimal('0'))
+    return proyecciones
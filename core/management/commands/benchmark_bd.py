@@ -0,0 +1,153 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections
+from django.test.utils import override_settings
+from django.utils.dateparse import parse_date
+
+from core.ingesta import guardar_lote_reportes
+from core.microlotes import IngestaOcupada, guardar_en_microlote, guardar_paquete_en_microlote
+from core.models import LoteAves, Producto
+
+
+def _reporte(numero, envio, k, producto_id, lote_id):
+    if k % 2:
+        return {
+            'tipo': 'ALGAS', 'temp_id': f'bench-{numero}-{envio}-{k}', 'producto_id': producto_id,
+            'cantidad': '1.5', 'responsable': 'benchmark',
+        }
+    return {
+        'tipo': 'GRANJA', 'temp_id': f'bench-{numero}-{envio}-{k}', 'lote_id': lote_id,
+        'huevos': 90, 'alimento': '12.5', 'mortalidad': 0, 'responsable': 'benchmark',
+    }
+
+
+def _medir_envio(enviar, latencias, fallas):
+    inicio = time.perf_counter()
+    try:
+        enviar()
+    except (OperationalError, IngestaOcupada):
+        fallas.append(1)  # "database is locked" o cola llena: el celular reintenta más tarde
+    latencias.append(time.perf_counter() - inicio)
+
+
+def _trabajador(tarea):
+    """
+    Un proceso = un worker de gunicorn.
+      paquetes:    envíos de 'reportes' reportes por guardar_paquete_en_microlote (/api/guardar-lote/)
+      individual:  'hilos' requests a la vez, un reporte y una transacción cada uno
+      microlotes:  lo mismo, pero por guardar_en_microlote (/api/guardar-produccion/ y granja)
+    """
+    modo, numero, envios, reportes, hilos, producto_id, lote_id = tarea
+    latencias = []
+    fallas = []
+
+    if modo == 'paquetes':
+        for envio in range(envios):
+            paquete = [_reporte(numero, envio, k, producto_id, lote_id) for k in range(reportes)]
+            _medir_envio(lambda: guardar_paquete_en_microlote(paquete), latencias, fallas)
+        connections.close_all()
+        return latencias, (envios - len(fallas)) * reportes, len(fallas)
+
+    guardar = guardar_en_microlote if modo == 'microlotes' else (lambda datos: guardar_lote_reportes([datos])[0])
+
+    def hilo(h):
+        for envio in range(envios):
+            datos = _reporte(f'{numero}.{h}', envio, envio, producto_id, lote_id)
+            _medir_envio(lambda: guardar(datos), latencias, fallas)
+        connections.close_all()
+
+    corriendo = [threading.Thread(target=hilo, args=(h,)) for h in range(hilos)]
+    for t in corriendo:
+        t.start()
+    for t in corriendo:
+        t.join()
+    return latencias, envios * hilos - len(fallas), len(fallas)
+
+
+def _percentil(valores, p):
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(len(valores) * p))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide envíos concurrentes de reportes (varios procesos, como los workers de gunicorn) "
+        "sobre una base temporal del mismo motor que DATABASE_URL. Para comparar motores se corre una vez "
+        "con cada DATABASE_URL."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--procesos', type=int, default=4, help="Workers escribiendo a la vez.")
+        parser.add_argument('--envios', type=int, default=50, help="Envíos por worker.")
+        parser.add_argument('--reportes', type=int, default=20, help="Reportes por envío (modo paquetes).")
+        parser.add_argument('--hilos', type=int, default=8, help="Requests simultáneos por worker (modos individual y microlotes).")
+        parser.add_argument('--modo', choices=['paquetes', 'individual', 'microlotes'], default='paquetes')
+        parser.add_argument('--sin-pragmas', action='store_true', help="SQLite sin WAL ni busy_timeout (para comparar).")
+
+    def handle(self, *args, **options):
+        conexion = connections['default']
+        carpeta = tempfile.mkdtemp()
+        if conexion.vendor == 'sqlite':
+            # En archivo (no en memoria) para que la compartan todos los procesos
+            conexion.settings_dict['TEST']['NAME'] = os.path.join(carpeta, 'benchmark.sqlite3')
+
+        ajustes = {'CACHES': {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}}
+        if options['sin_pragmas']:
+            ajustes['SQLITE_PRAGMAS'] = {}
+
+        nombre_original = conexion.settings_dict['NAME']
+        with override_settings(**ajustes):
+            conexion.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                self._medir(conexion, options)
+            finally:
+                connections.close_all()
+                conexion.creation.destroy_test_db(nombre_original, verbosity=0)
+                shutil.rmtree(carpeta, ignore_errors=True)
+
+    def _medir(self, conexion, options):
+        producto = Producto.objects.create(nombre="Benchmark", categoria='MP_ALGA_DESHIDRATADA', capacidad_maxima_diaria=10 ** 6)
+        lote = LoteAves.objects.create(
+            nombre="Benchmark", tipo_dieta='ALGAS', cantidad_aves_inicial=1000, fecha_inicio=parse_date('2025-01-01'),
+        )
+        modo = ''
+        if conexion.vendor == 'sqlite':
+            with conexion.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode')
+                modo = f" (journal_mode={cursor.fetchone()[0]})"
+        # Cada proceso abre su propia conexión: no se heredan sockets ni archivos abiertos
+        connections.close_all()
+
+        procesos = options['procesos']
+        tareas = [
+            (options['modo'], n, options['envios'], options['reportes'], options['hilos'], producto.id, lote.id)
+            for n in range(procesos)
+        ]
+        inicio = time.perf_counter()
+        with multiprocessing.get_context('fork').Pool(procesos) as pool:
+            resultados = pool.map(_trabajador, tareas)
+        total = time.perf_counter() - inicio
+
+        latencias = [valor for parcial, _, _ in resultados for valor in parcial]
+        guardados = sum(g for _, g, _ in resultados)
+        fallas = sum(f for _, _, f in resultados)
+
+        if options['modo'] == 'paquetes':
+            carga = f"{options['envios']} envíos x {options['reportes']} reportes"
+        else:
+            carga = f"{options['hilos']} hilos x {options['envios']} reportes sueltos"
+        self.stdout.write(f"Motor: {conexion.vendor}{modo}, modo {options['modo']}: {procesos} procesos x {carga}")
+        self.stdout.write(f"Tiempo total: {total:.2f} s")
+        self.stdout.write(f"Reportes guardados por segundo: {guardados / total:.0f}")
+        self.stdout.write(
+            f"Latencia por envío: p50 {_percentil(latencias, 0.5) * 1000:.1f} ms, "
+            f"p95 {_percentil(latencias, 0.95) * 1000:.1f} ms, máx {max(latencias) * 1000:.1f} ms"
+        )
+        estilo = self.style.SUCCESS if fallas == 0 else self.style.ERROR
+        self.stdout.write(estilo(f"Envíos rechazados ('database is locked' o cola llena): {fallas}"))
@@ -0,0 +1,235 @@
+import json
+import os
+import platform
+import shutil
+import statistics
+import tempfile
+import time
+import uuid
+
+import django
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.cache_dashboard import invalidar_dashboard
+from core.models import LoteAves, Producto
+from core.sinteticos import generar_datos_sinteticos
+
+
+# Los mismos periodos que ofrecen los botones del dashboard
+DIAS_DASHBOARD = (7, 30, 365)
+REPORTES_POR_LOTE = 100
+
+
+def _leer(response):
+    """Consume la respuesta completa (las exportaciones se envían por streaming)."""
+    if response.streaming:
+        return sum(len(trozo) for trozo in response.streaming_content)
+    return len(response.content)
+
+
+def comparar(actual, base, tolerancia):
+    """
+    Compara dos resultados del benchmark caso por caso (por la mediana).
+    Devuelve [(caso, ms base, ms actual, % de cambio, más lento que la tolerancia)]
+    solo para los casos que están en ambos.
+    """
+    filas = []
+    for caso, medida in actual['casos'].items():
+        anterior = base['casos'].get(caso)
+        if not anterior:
+            continue
+        cambio = (medida['mediana_ms'] - anterior['mediana_ms']) / anterior['mediana_ms'] * 100
+        filas.append((caso, anterior['mediana_ms'], medida['mediana_ms'], cambio, cambio > tolerancia))
+    return filas
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera datos sintéticos en una base temporal y mide dashboard, exportaciones, ingesta y el panel "
+        "de gerencia (con sus tablas). Con --salida guarda la línea base en JSON; con --comparar muestra el "
+        "cambio en % contra una línea base anterior (falla si algún caso empeora más que --tolerancia)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--productos', type=int, default=10)
+        parser.add_argument('--lotes', type=int, default=20)
+        parser.add_argument('--anios', type=int, default=2, help="Años de reportes diarios.")
+        parser.add_argument('--semilla', type=int, default=1)
+        parser.add_argument('--repeticiones', type=int, default=5, help="Veces que se mide cada caso.")
+        parser.add_argument('--salida', help="Archivo JSON donde guardar los resultados.")
+        parser.add_argument('--comparar', help="Línea base JSON anterior.")
+        parser.add_argument('--tolerancia', type=float, default=10.0, help="% de empeoramiento aceptado.")
+
+    def handle(self, *args, **options):
+        if options['repeticiones'] < 1:
+            raise CommandError("--repeticiones debe ser al menos 1")
+        base = None
+        if options['comparar']:
+            try:
+                with open(options['comparar'], encoding='utf-8') as archivo:
+                    base = json.load(archivo)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"No se pudo leer la línea base: {e}")
+
+        conexion = connections['default']
+        carpeta = tempfile.mkdtemp()
+        if conexion.vendor == 'sqlite':
+            # En archivo: el hilo escritor de micro-lotes abre su propia conexión
+            conexion.settings_dict['TEST']['NAME'] = os.path.join(carpeta, 'benchmark.sqlite3')
+
+        ajustes = {
+            'CACHES': {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+            # Sin collectstatic: {% static %} no debe buscar en staticfiles.json
+            'STORAGES': {
+                'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+                'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+            },
+            'METRICAS_UMBRAL_LENTO_MS': 10 ** 9,  # Aquí todo es "lento" a propósito: no llenar el log
+        }
+        nombre_original = conexion.settings_dict['NAME']
+        with override_settings(**ajustes):
+            conexion.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                resultado = self._medir(conexion, options)
+            finally:
+                connections.close_all()
+                conexion.creation.destroy_test_db(nombre_original, verbosity=0)
+                shutil.rmtree(carpeta, ignore_errors=True)
+
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as archivo:
+                json.dump(resultado, archivo, indent=2, ensure_ascii=False)
+            self.stdout.write(f"Resultados guardados en {options['salida']}")
+
+        if base is not None:
+            self._comparar(resultado, base, options['tolerancia'])
+
+    # --- Medición ---
+
+    def _medir(self, conexion, options):
+        dias = options['anios'] * 365
+        inicio = time.perf_counter()
+        escala = generar_datos_sinteticos(
+            productos=options['productos'], lotes=options['lotes'], dias=dias, semilla=options['semilla'],
+        )
+        escala['dias'] = dias
+        self.stdout.write(
+            f"Datos: {escala['reportes_produccion']} reportes de producción y {escala['reportes_aves']} de granja "
+            f"({time.perf_counter() - inicio:.1f} s)"
+        )
+
+        gerente = User.objects.create_user('benchmark', password='x', is_staff=True)
+        cliente = Client()
+        cliente.force_login(gerente)
+        producto = Producto.objects.order_by('id').first()
+        lote = LoteAves.objects.order_by('id').first()
+        prefijo = uuid.uuid4().hex[:8]
+        contador = iter(range(10 ** 9))
+
+        def get(nombre, **params):
+            def pedir():
+                return cliente.get(reverse(nombre), params)
+            return pedir
+
+        def get_args(nombre, *args):
+            def pedir():
+                return cliente.get(reverse(nombre, args=args))
+            return pedir
+
+        def sin_cache(pedir):
+            def pedir_en_frio():
+                invalidar_dashboard()  # Mide el cálculo, no la caché del dashboard
+                return pedir()
+            return pedir_en_frio
+
+        def reporte(tipo):
+            temp_id = f'bench-{prefijo}-{next(contador)}'  # Siempre nuevo: nada cuenta como duplicado
+            if tipo == 'ALGAS':
+                return {'tipo': tipo, 'temp_id': temp_id, 'producto_id': producto.id,
+                        'cantidad': '1.5', 'responsable': 'benchmark'}
+            return {'tipo': tipo, 'temp_id': temp_id, 'lote_id': lote.id,
+                    'huevos': 900, 'alimento': '110', 'responsable': 'benchmark'}
+
+        def post(nombre, cuerpo):
+            def pedir():
+                return cliente.post(reverse(nombre), json.dumps(cuerpo()), content_type='application/json')
+            return pedir
+
+        casos = {}
+        for d in DIAS_DASHBOARD:
+            casos[f'dashboard_{d}_dias'] = sin_cache(get('dashboard', dias=d))
+            casos[f'graficos_{d}_dias'] = sin_cache(get('api_graficos_dashboard', dias=d))
+        casos.update({
+            'exportar_algas_xlsx': get('exportar_algas'),
+            'exportar_granja_xlsx': get('exportar_granja'),
+            'exportar_algas_csv': get('exportar_algas_csv'),
+            'exportar_granja_csv': get('exportar_granja_csv'),
+            # Ambas ingestas se escriben en el hilo de micro-lotes: sus consultas no se cuentan aquí (sí en las métricas por vista)
+            'ingesta_reporte_suelto': post('api_guardar_prod', lambda: reporte('ALGAS')),
+            f'ingesta_lote_{REPORTES_POR_LOTE}': post('api_guardar_lote', lambda: {
+                'reportes': [reporte('ALGAS' if k % 2 else 'GRANJA') for k in range(REPORTES_POR_LOTE)],
+            }),
+            'panel_gerencia': get('panel_gerencia'),
+        })
+        for tabla in ('usuarios', 'productos', 'lotes'):
+            casos[f'tabla_gerencia_{tabla}'] = get_args('api_tabla_gerencia', tabla)
+
+        medidos = {}
+        for caso, pedir in casos.items():
+            medidos[caso] = self._medir_caso(caso, pedir, options['repeticiones'])
+
+        return {
+            'fecha': timezone.now().isoformat(timespec='seconds'),
+            'motor': conexion.vendor,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'escala': escala,
+            'repeticiones': options['repeticiones'],
+            'casos': medidos,
+        }
+
+    def _medir_caso(self, caso, pedir, repeticiones):
+        pedir()  # Calentamiento: plantillas compiladas, conexión abierta, imports perezosos
+        tiempos = []
+        for _ in range(repeticiones):
+            with CaptureQueriesContext(connection) as consultas:
+                inicio = time.perf_counter()
+                response = pedir()
+                tamano = _leer(response)
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+            if response.status_code != 200:
+                raise CommandError(f"{caso}: respuesta {response.status_code}")
+        medida = {
+            'mediana_ms': round(statistics.median(tiempos), 2),
+            'min_ms': round(min(tiempos), 2),
+            'consultas': len(consultas),
+            'bytes': tamano,
+        }
+        self.stdout.write(
+            f"{caso:28} mediana {medida['mediana_ms']:9.1f} ms   mín {medida['min_ms']:9.1f} ms   "
+            f"{medida['consultas']:4} consultas"
+        )
+        return medida
+
+    # --- Comparación con la línea base ---
+
+    def _comparar(self, actual, base, tolerancia):
+        if base.get('escala') != actual['escala']:
+            self.stdout.write(self.style.WARNING(
+                f"La línea base se midió con otra escala ({base.get('escala')}): los % no son comparables"
+            ))
+        self.stdout.write(f"\nComparación con la línea base del {base.get('fecha', '?')} (tolerancia {tolerancia:g}%):")
+        filas = comparar(actual, base, tolerancia)
+        for caso, antes, ahora, cambio, peor in filas:
+            estilo = self.style.ERROR if peor else (self.style.SUCCESS if cambio < -tolerancia else str)
+            self.stdout.write(estilo(f"{caso:28} {antes:9.1f} ms -> {ahora:9.1f} ms   {cambio:+7.1f}%"))
+
+        peores = [caso for caso, _, _, _, peor in filas if peor]
+        if peores:
+            raise CommandError(f"{len(peores)} caso(s) más lentos que la línea base: {', '.join(peores)}")
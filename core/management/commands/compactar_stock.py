@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.utils.dateparse import parse_date
+
+from core.inventario import compactar_snapshots
+
+
+class Command(BaseCommand):
+    help = "Guarda el saldo diario de cada producto (snapshots) para consultar el stock histórico rápido."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hasta', help="Último día a compactar (YYYY-MM-DD). Por defecto: ayer.")
+
+    def handle(self, *args, **options):
+        hasta = parse_date(options['hasta']) if options['hasta'] else None
+        creados = compactar_snapshots(hasta)
+        self.stdout.write(self.style.SUCCESS(f"Snapshots de stock creados: {creados}"))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.sinteticos import PREFIJO, borrar_datos_sinteticos, generar_datos_sinteticos
+
+
+class Command(BaseCommand):
+    help = (
+        f"Genera datos sintéticos reproducibles (productos y lotes '{PREFIJO} ...' con sus reportes diarios) "
+        "para probar el sistema con volúmenes reales. Ej: --productos 20 --lotes 40 --anios 3"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--productos', type=int, default=5)
+        parser.add_argument('--lotes', type=int, default=10)
+        parser.add_argument('--anios', type=int, default=1, help="Años de reportes diarios hacia atrás desde hoy.")
+        parser.add_argument('--dias', type=int, help="Días de reportes (reemplaza a --anios).")
+        parser.add_argument('--aves', type=int, default=1000, help="Aves iniciales por lote.")
+        parser.add_argument('--semilla', type=int, default=1, help="Misma semilla y escala = mismos datos.")
+        parser.add_argument('--limpiar', action='store_true', help="Borra antes los datos sintéticos anteriores.")
+
+    def handle(self, *args, **options):
+        dias = options['dias'] or options['anios'] * 365
+        if dias < 1 or options['productos'] < 0 or options['lotes'] < 0:
+            raise CommandError("--dias/--anios, --productos y --lotes no pueden ser negativos")
+
+        if options['limpiar']:
+            self.stdout.write(f"Filas sintéticas borradas: {borrar_datos_sinteticos()}")
+
+        creados = generar_datos_sinteticos(
+            productos=options['productos'], lotes=options['lotes'], dias=dias,
+            aves=options['aves'], semilla=options['semilla'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Creados {creados['productos']} productos y {creados['lotes']} lotes con "
+            f"{creados['reportes_produccion']} reportes de producción y {creados['reportes_aves']} de granja "
+            f"({dias} días)."
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core.trabajos import limpiar_exportaciones
+
+
+class Command(BaseCommand):
+    help = "Borra los Excel viejos de EXPORTACIONES_DIR y los trabajos de exportación terminados o colgados."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--horas', type=float, help="Antigüedad mínima a borrar. Por defecto: EXPORTACIONES_HORAS_ARCHIVO.")
+
+    def handle(self, *args, **options):
+        borrados = limpiar_exportaciones(options['horas'])
+        self.stdout.write(self.style.SUCCESS(f"Archivos de exportación borrados: {borrados}"))
@@ -0,0 +1,110 @@
+import asyncio
+import json
+import time
+import uuid
+from collections import Counter
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import LoteAves, Producto
+
+
+def _percentil(valores, p):
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(len(valores) * p))]
+
+
+async def _enviar(host, puerto, ruta, cuerpo, trozo, pausa):
+    """
+    Un celular con mala señal: abre la conexión, manda los encabezados y sube el
+    cuerpo de a 'trozo' bytes con 'pausa' segundos entre cada uno.
+    Devuelve (código HTTP o 0 si falló la conexión, segundos totales).
+    """
+    inicio = time.perf_counter()
+    try:
+        lector, escritor = await asyncio.open_connection(host, puerto)
+        escritor.write((
+            f"POST {ruta} HTTP/1.1\r\nHost: {host}:{puerto}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(cuerpo)}\r\nConnection: close\r\n\r\n"
+        ).encode('ascii'))
+        for i in range(0, len(cuerpo), trozo):
+            await escritor.drain()
+            await asyncio.sleep(pausa)
+            escritor.write(cuerpo[i:i + trozo])
+        await escritor.drain()
+        linea = await lector.readline()
+        await lector.read()  # Hasta que el servidor cierre: la respuesta completa
+        escritor.close()
+        codigo = int(linea.split()[1]) if linea else 0
+    except (OSError, asyncio.IncompleteReadError, ValueError, IndexError):
+        codigo = 0
+    return codigo, time.perf_counter() - inicio
+
+
+class Command(BaseCommand):
+    help = (
+        "Prueba de carga contra un servidor local: muchas conexiones lentas a la vez subiendo reportes. "
+        "Correrla una vez contra cada servidor para comparar, por ejemplo:\n"
+        "  sync:  gunicorn sistema_central.wsgi:application -w 4\n"
+        "  async: gunicorn sistema_central.asgi:application -k uvicorn.workers.UvicornWorker -w 4\n"
+        "Todavía no hay cifras de esa comparación: se escribió sin uvicorn instalado y el lado async no se corrió."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help="Servidor a probar.")
+        parser.add_argument('--conexiones', type=int, default=1000, help="Celulares subiendo a la vez.")
+        parser.add_argument('--rondas', type=int, default=1, help="Reportes que manda cada celular, uno tras otro.")
+        parser.add_argument('--trozo', type=int, default=32, help="Bytes por envío al subir el cuerpo.")
+        parser.add_argument('--pausa-ms', type=int, default=200, help="Espera entre trozos (enlace rural lento).")
+        parser.add_argument('--tipo', choices=['ALGAS', 'GRANJA'], default='ALGAS')
+
+    def handle(self, *args, **options):
+        url = urlsplit(options['url'])
+        if url.scheme != 'http' or not url.hostname:
+            raise CommandError("--url debe ser http://host:puerto")
+
+        if options['tipo'] == 'ALGAS':
+            producto = Producto.objects.order_by('id').first()
+            if producto is None:
+                raise CommandError("No hay productos: cree uno antes de probar")
+            ruta, base = '/api/guardar-produccion/', {'producto_id': producto.id, 'cantidad': '1.5'}
+        else:
+            lote = LoteAves.objects.filter(activo=True).order_by('id').first()
+            if lote is None:
+                raise CommandError("No hay lotes activos: cree uno antes de probar")
+            ruta, base = '/api/guardar-granja/', {'lote_id': lote.id, 'huevos': 90, 'alimento': '12.5'}
+
+        resultados, total = asyncio.run(self._probar(url.hostname, url.port or 80, ruta, base, options))
+
+        codigos = Counter(codigo for codigo, _ in resultados)
+        ok = [segundos for codigo, segundos in resultados if codigo == 200]
+        self.stdout.write(f"{options['url']}{ruta}: {options['conexiones']} conexiones x {options['rondas']} reportes")
+        self.stdout.write(f"Tiempo total: {total:.2f} s")
+        self.stdout.write(f"Reportes aceptados por segundo: {len(ok) / total:.1f}")
+        if ok:
+            self.stdout.write(
+                f"Latencia: p50 {_percentil(ok, 0.5) * 1000:.0f} ms, "
+                f"p99 {_percentil(ok, 0.99) * 1000:.0f} ms, máx {max(ok) * 1000:.0f} ms"
+            )
+        respuestas = ', '.join(f"{codigo or 'sin conexión'}: {n}" for codigo, n in sorted(codigos.items()))
+        estilo = self.style.SUCCESS if len(ok) == len(resultados) else self.style.WARNING
+        self.stdout.write(estilo(f"Respuestas: {respuestas}"))
+
+    async def _probar(self, host, puerto, ruta, base, options):
+        pausa = options['pausa_ms'] / 1000
+        prefijo = uuid.uuid4().hex[:8]  # Cada corrida con temp_id nuevos: nada cuenta como duplicado
+
+        async def celular(numero):
+            resultados = []
+            for ronda in range(options['rondas']):
+                cuerpo = json.dumps(dict(
+                    base, tipo=options['tipo'], responsable='prueba-carga',
+                    temp_id=f'carga-{prefijo}-{numero}-{ronda}',
+                )).encode('utf-8')
+                resultados.append(await _enviar(host, puerto, ruta, cuerpo, options['trozo'], pausa))
+            return resultados
+
+        inicio = time.perf_counter()
+        por_celular = await asyncio.gather(*(celular(n) for n in range(options['conexiones'])))
+        return [r for lista in por_celular for r in lista], time.perf_counter() - inicio
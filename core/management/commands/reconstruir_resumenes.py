@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from core.agregados import reconstruir_resumenes
+
+
+class Command(BaseCommand):
+    help = "Reconstruye desde cero los resúmenes diarios de producción y granja."
+
+    def handle(self, *args, **options):
+        filas_prod, filas_lote = reconstruir_resumenes()
+        self.stdout.write(self.style.SUCCESS(
+            f"Resúmenes reconstruidos: {filas_prod} de producción, {filas_lote} de lotes."
+        ))
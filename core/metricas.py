@@ -0,0 +1,342 @@
+import bisect
+import contextvars
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+
+# ==========================================
+# MÉTRICAS POR REQUEST (Tiempo, consultas, tiempo de BD y tamaño de respuesta)
+# ==========================================
+#
+# Todo vive en la memoria de cada proceso: con varios workers de gunicorn
+# cada uno expone lo suyo (Prometheus los suma si se scrapean por separado).
+
+logger = logging.getLogger('core.metricas')
+
+# Límites de los buckets (el último, +Inf, se agrega solo)
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_CONSULTAS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+BUCKETS_BYTES = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# Percentiles "recientes": sobre los últimos N requests de cada vista
+VENTANA = 1000
+CUANTILES = (0.5, 0.9, 0.99)
+
+# Sentencias SQL que se guardan por request para el log de requests lentos
+MAX_SQL_POR_REQUEST = 50
+
+# La medición del request en curso. Es una ContextVar y no un atributo del hilo:
+# sync_to_async la copia al hilo donde corre el ORM en las vistas async.
+_medicion_actual = contextvars.ContextVar('medicion_actual', default=None)
+
+
+class _Medicion:
+    __slots__ = ('consultas', 'segundos_bd', 'sql')
+
+    def __init__(self):
+        self.consultas = 0
+        self.segundos_bd = 0.0
+        self.sql = []
+
+    def sumar(self, otra):
+        self.consultas += otra.consultas
+        self.segundos_bd += otra.segundos_bd
+        self.sql.extend(otra.sql[:MAX_SQL_POR_REQUEST - len(self.sql)])
+
+
+def medicion_en_curso():
+    """La medición del request que está corriendo (None fuera de un request)."""
+    return _medicion_actual.get()
+
+
+@contextmanager
+def medir_aparte():
+    """
+    Mide las consultas del bloque en una medición propia, fuera de cualquier request.
+    La usa el hilo escritor de micro-lotes para devolverle a cada request que
+    esperó su lote las consultas que se hicieron por él (ver core/microlotes.py).
+    """
+    medicion = _Medicion()
+    token = _medicion_actual.set(medicion)
+    try:
+        yield medicion
+    finally:
+        _medicion_actual.reset(token)
+
+
+def medir_consulta(execute, sql, params, many, context):
+    """execute_wrapper que se instala en cada conexión (ver instalar_en_conexion)."""
+    medicion = _medicion_actual.get()
+    if medicion is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duracion = time.perf_counter() - inicio
+        medicion.consultas += 1
+        medicion.segundos_bd += duracion
+        if len(medicion.sql) < MAX_SQL_POR_REQUEST:
+            medicion.sql.append((duracion, sql))
+
+
+def instalar_en_conexion(sender, connection, **kwargs):
+    """Receptor de connection_created: mide todas las consultas de esa conexión."""
+    if medir_consulta not in connection.execute_wrappers:
+        connection.execute_wrappers.append(medir_consulta)
+
+
+class _Histograma:
+    def __init__(self, limites):
+        self.limites = limites
+        self.cuentas = [0] * (len(limites) + 1)
+        self.suma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        self.cuentas[bisect.bisect_left(self.limites, valor)] += 1
+        self.suma += valor
+        self.total += 1
+
+
+class _MetricasVista:
+    def __init__(self):
+        self.duracion = _Histograma(BUCKETS_SEGUNDOS)
+        self.segundos_bd = _Histograma(BUCKETS_SEGUNDOS)
+        self.consultas = _Histograma(BUCKETS_CONSULTAS)
+        self.bytes = _Histograma(BUCKETS_BYTES)
+        self.recientes = deque(maxlen=VENTANA)
+        self.codigos = {}
+
+
+_vistas = {}
+_candado = threading.Lock()
+
+
+def registrar(vista, codigo, segundos, medicion, tamano):
+    with _candado:
+        metricas = _vistas.get(vista)
+        if metricas is None:
+            metricas = _vistas[vista] = _MetricasVista()
+        metricas.duracion.observar(segundos)
+        metricas.segundos_bd.observar(medicion.segundos_bd)
+        metricas.consultas.observar(medicion.consultas)
+        if tamano is not None:
+            metricas.bytes.observar(tamano)
+        metricas.recientes.append(segundos)
+        metricas.codigos[codigo] = metricas.codigos.get(codigo, 0) + 1
+
+
+def reiniciar_metricas():
+    with _candado:
+        _vistas.clear()
+
+
+def _nombre_vista(request):
+    coincidencia = getattr(request, 'resolver_match', None)
+    return coincidencia.view_name if coincidencia else 'sin_ruta'
+
+
+def _tamano(response):
+    """Bytes del cuerpo; en archivos enviados por streaming solo si declaran Content-Length."""
+    if response.streaming:
+        largo = response.get('Content-Length')
+        return int(largo) if largo and largo.isdigit() else None
+    return len(response.content)
+
+
+class _CuerpoMedido:
+    """
+    Envuelve el cuerpo de una respuesta por streaming: cuenta en 'medicion' las
+    consultas hechas mientras se genera (las exportaciones consultan por trozos)
+    y sus bytes. Al terminar, o si la respuesta se cierra antes, llama una sola
+    vez a al_terminar(bytes enviados).
+    """
+
+    def __init__(self, contenido, medicion, al_terminar):
+        self._iterador = iter(contenido)
+        self._medicion = medicion
+        self._al_terminar = al_terminar
+        self._enviados = 0
+        self._terminado = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        token = _medicion_actual.set(self._medicion)
+        try:
+            trozo = next(self._iterador)
+        except StopIteration:
+            self.close()
+            raise
+        finally:
+            _medicion_actual.reset(token)
+        self._enviados += len(trozo)
+        return trozo
+
+    def close(self):
+        if not self._terminado:
+            self._terminado = True
+            self._al_terminar(self._enviados)
+
+
+class _CuerpoMedidoAsync(_CuerpoMedido):
+    """_CuerpoMedido para respuestas con un iterador async (ASGI)."""
+
+    __iter__ = None  # StreamingHttpResponse decide sync/async según se pueda iterar
+
+    def __init__(self, contenido, medicion, al_terminar):
+        super().__init__([], medicion, al_terminar)
+        self._iterador = contenido.__aiter__()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        token = _medicion_actual.set(self._medicion)
+        try:
+            trozo = await self._iterador.__anext__()
+        except StopAsyncIteration:
+            self.close()
+            raise
+        finally:
+            _medicion_actual.reset(token)
+        self._enviados += len(trozo)
+        return trozo
+
+
+def _avisar_si_lento(request, vista, segundos, medicion):
+    umbral = getattr(settings, 'METRICAS_UMBRAL_LENTO_MS', 1000) / 1000
+    if segundos < umbral:
+        return
+    lineas = [
+        f"Request lento: {request.method} {request.get_full_path()} ({vista}) {segundos * 1000:.0f} ms, "
+        f"{medicion.consultas} consultas, {medicion.segundos_bd * 1000:.0f} ms en la base de datos"
+    ]
+    for duracion, sql in medicion.sql:
+        lineas.append(f"  {duracion * 1000:8.1f} ms  {sql}")
+    if medicion.consultas > len(medicion.sql):
+        lineas.append(f"  ... y {medicion.consultas - len(medicion.sql)} consultas más")
+    logger.warning("\n".join(lineas))
+
+
+class MetricasMiddleware:
+    """
+    Mide cada request: tiempo total, cantidad y tiempo de consultas, tamaño de la
+    respuesta. Sirve tanto vistas sync como async (no obliga a ASGI a pasar las
+    vistas async a un hilo). En las respuestas por streaming (exportaciones) la
+    medición termina cuando se envió el último trozo, no cuando vuelve la vista.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        medicion = _Medicion()
+        token = _medicion_actual.set(medicion)
+        inicio = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _medicion_actual.reset(token)
+        return self._terminar(request, response, inicio, medicion)
+
+    async def __acall__(self, request):
+        medicion = _Medicion()
+        token = _medicion_actual.set(medicion)
+        inicio = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _medicion_actual.reset(token)
+        return self._terminar(request, response, inicio, medicion)
+
+    def _terminar(self, request, response, inicio, medicion):
+        vista = _nombre_vista(request)
+
+        def registrar_request(tamano):
+            segundos = time.perf_counter() - inicio
+            registrar(vista, response.status_code, segundos, medicion, tamano)
+            _avisar_si_lento(request, vista, segundos, medicion)
+
+        # Un archivo ya armado (FileResponse) solo se copia: se mide como una respuesta normal
+        if response.streaming and getattr(response, 'file_to_stream', None) is None:
+            cuerpo = _CuerpoMedidoAsync if response.is_async else _CuerpoMedido
+            response.streaming_content = cuerpo(response.streaming_content, medicion, registrar_request)
+        else:
+            registrar_request(_tamano(response))
+        return response
+
+
+# --- Formato de texto de Prometheus ---
+
+def _etiquetas(**valores):
+    pares = []
+    for nombre, valor in valores.items():
+        valor = str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pares.append(f'{nombre}="{valor}"')
+    return '{' + ','.join(pares) + '}'
+
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+def _histograma(lineas, nombre, ayuda, por_vista):
+    lineas.append(f"# HELP {nombre} {ayuda}")
+    lineas.append(f"# TYPE {nombre} histogram")
+    for vista, histograma in por_vista:
+        acumulado = 0
+        for limite, cuenta in zip(list(histograma.limites) + ['+Inf'], histograma.cuentas):
+            acumulado += cuenta
+            lineas.append(f"{nombre}_bucket{_etiquetas(vista=vista, le=limite)} {acumulado}")
+        lineas.append(f"{nombre}_sum{_etiquetas(vista=vista)} {_numero(histograma.suma)}")
+        lineas.append(f"{nombre}_count{_etiquetas(vista=vista)} {histograma.total}")
+
+
+def texto_prometheus():
+    """Todas las métricas de este proceso en el formato de exposición de Prometheus (0.0.4)."""
+    with _candado:
+        vistas = sorted(_vistas.items())
+        recientes = {vista: sorted(m.recientes) for vista, m in vistas}
+        lineas = []
+
+        lineas.append("# HELP django_vista_requests_total Requests atendidos por vista y código HTTP.")
+        lineas.append("# TYPE django_vista_requests_total counter")
+        for vista, m in vistas:
+            for codigo, total in sorted(m.codigos.items()):
+                lineas.append(f"django_vista_requests_total{_etiquetas(vista=vista, codigo=codigo)} {total}")
+
+        _histograma(lineas, 'django_vista_duracion_segundos', "Tiempo total del request.",
+                    [(v, m.duracion) for v, m in vistas])
+        _histograma(lineas, 'django_vista_bd_segundos', "Tiempo en consultas a la base de datos por request.",
+                    [(v, m.segundos_bd) for v, m in vistas])
+        _histograma(lineas, 'django_vista_consultas_bd', "Consultas a la base de datos por request.",
+                    [(v, m.consultas) for v, m in vistas])
+        _histograma(lineas, 'django_vista_respuesta_bytes', "Tamaño del cuerpo de la respuesta.",
+                    [(v, m.bytes) for v, m in vistas])
+
+        lineas.append(f"# HELP django_vista_duracion_recientes_segundos Percentiles de los últimos {VENTANA} requests.")
+        lineas.append("# TYPE django_vista_duracion_recientes_segundos summary")
+        for vista, _ in vistas:
+            valores = recientes[vista]
+            for cuantil in CUANTILES:
+                valor = valores[min(len(valores) - 1, int(len(valores) * cuantil))]
+                lineas.append(f"django_vista_duracion_recientes_segundos{_etiquetas(vista=vista, quantile=cuantil)} {_numero(valor)}")
+            lineas.append(f"django_vista_duracion_recientes_segundos_sum{_etiquetas(vista=vista)} {_numero(sum(valores))}")
+            lineas.append(f"django_vista_duracion_recientes_segundos_count{_etiquetas(vista=vista)} {len(valores)}")
+
+    return "\n".join(lineas) + "\n"
@@ -0,0 +1,222 @@
+import asyncio
+import queue
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connection
+
+from .ingesta import guardar_lote_reportes
+from .metricas import medicion_en_curso, medir_aparte
+
+
+# ==========================================
+# MICRO-LOTES DE ESCRITURA (Reportes sueltos agrupados en una sola transacción)
+# ==========================================
+#
+# Cuando muchos celulares recuperan la señal a la vez (cambio de turno), cada
+# POST a /api/guardar-produccion/ o /api/guardar-granja/ era su propia
+# transacción: un commit (y un fsync) por reporte, y en SQLite todos peleando
+# por el mismo candado de escritura. Aquí cada request deja su reporte en una
+# cola y UN hilo escritor por proceso junta lo que llega en una ventana de
+# pocos milisegundos y lo guarda con guardar_lote_reportes (un solo commit).
+#
+# Los paquetes de la cola offline (/api/guardar-lote/) pasan por el mismo hilo
+# y el mismo tope, contado en reportes: un celular que vacía 500 pendientes no
+# se salta la cola de los demás. Si no caben el request responde 503 al instante
+# (backpressure) con Retry-After, y app.js / bd.js esperan eso antes de reintentar.
+#
+# Necesita workers que atiendan varios requests a la vez (gunicorn gthread, ver
+# gunicorn.conf.py, o ASGI): con workers sync cada micro-lote tendría un solo
+# reporte y la ventana solo sumaría espera.
+
+
+class IngestaOcupada(Exception):
+    """La cola de escritura está llena o no respondió a tiempo: reintentar más tarde."""
+
+
+class _Pedido:
+    __slots__ = ('reportes', 'listo', 'resultado', 'error', 'avisar', 'medicion')
+
+    def __init__(self, reportes, avisar=None):
+        self.reportes = reportes  # Uno (reporte suelto) o un paquete de la cola offline
+        self.listo = threading.Event()
+        self.resultado = None
+        self.error = None
+        self.avisar = avisar  # Vistas async: despierta al event loop en vez de bloquear un hilo
+        # Métricas del request que espera (core/metricas.py): las consultas del lote
+        # corren en el hilo escritor y se le suman a cada request del lote al terminar
+        self.medicion = medicion_en_curso()
+
+
+_cola = None
+_hilo = None
+_candado = threading.Lock()
+_contadores = {'lotes': 0, 'reportes': 0, 'rechazados': 0}
+# Reportes esperando en la cola (el tope INGESTA_COLA_MAX se cuenta en reportes, no en pedidos)
+_en_cola = 0
+_candado_cupo = threading.Lock()
+
+
+def _ajuste(nombre, defecto):
+    return getattr(settings, nombre, defecto)
+
+
+def _iniciar():
+    """Arranca el hilo escritor de este proceso la primera vez que se usa."""
+    global _cola, _hilo, _en_cola
+    with _candado:
+        if _hilo is None or not _hilo.is_alive():
+            _cola = queue.Queue()
+            _en_cola = 0
+            _hilo = threading.Thread(target=_escritor, args=(_cola,), name='ingesta-microlotes', daemon=True)
+            _hilo.start()
+    return _cola
+
+
+def _sacar(cola, timeout=None):
+    global _en_cola
+    pedido = cola.get(timeout=timeout)
+    with _candado_cupo:
+        _en_cola -= len(pedido.reportes)
+    return pedido
+
+
+def _juntar(cola):
+    """
+    Espera el primer pedido y suma los que lleguen dentro de la ventana, hasta
+    INGESTA_MAX_LOTE reportes (un paquete de la cola offline no se parte).
+    """
+    ventana = _ajuste('INGESTA_VENTANA_MS', 5) / 1000
+    maximo = _ajuste('INGESTA_MAX_LOTE', 200)
+    lote = [_sacar(cola)]
+    reportes = len(lote[0].reportes)
+    limite = time.monotonic() + ventana
+    while reportes < maximo:
+        restante = limite - time.monotonic()
+        if restante <= 0:
+            break
+        try:
+            lote.append(_sacar(cola, timeout=restante))
+        except queue.Empty:
+            break
+        reportes += len(lote[-1].reportes)
+    return lote
+
+
+def _escritor(cola):
+    while True:
+        lote = _juntar(cola)
+        # Igual que al empezar un request: respeta CONN_MAX_AGE y descarta conexiones caídas
+        close_old_connections()
+        try:
+            with medir_aparte() as medicion:
+                resultados = guardar_lote_reportes([datos for pedido in lote for datos in pedido.reportes])
+            inicio = 0
+            for pedido in lote:
+                pedido.resultado = resultados[inicio:inicio + len(pedido.reportes)]
+                inicio += len(pedido.reportes)
+            _contadores['lotes'] += 1
+            _contadores['reportes'] += len(resultados)
+        except Exception as e:
+            # Falló la transacción entera (p. ej. la base no respondió): todos reciben el error
+            for pedido in lote:
+                pedido.error = e
+        finally:
+            for pedido in lote:
+                if pedido.medicion is not None:
+                    # Cada request esperó el lote entero: ve todas sus consultas
+                    pedido.medicion.sumar(medicion)
+                pedido.listo.set()
+                if pedido.avisar:
+                    try:
+                        pedido.avisar()
+                    except RuntimeError:
+                        pass  # El event loop del request ya cerró (cliente desconectado)
+
+
+# Puede guardarse igual más tarde: el reintento con el mismo temp_id no lo duplica
+DEMORADO = "El guardado está demorado, se reintentará"
+
+
+def _encolar(pedido):
+    global _en_cola
+    cola = _iniciar()
+    with _candado_cupo:
+        # Con la cola vacía entra igual: un paquete más grande que el tope no quedaría nunca
+        if _en_cola and _en_cola + len(pedido.reportes) > _ajuste('INGESTA_COLA_MAX', 1000):
+            _contadores['rechazados'] += 1
+            raise IngestaOcupada("Servidor ocupado, el reporte queda en cola para reintentar")
+        _en_cola += len(pedido.reportes)
+        cola.put(pedido)
+    return pedido
+
+
+def _resultado(pedido):
+    if pedido.error is not None:
+        raise pedido.error
+    return pedido.resultado
+
+
+def guardar_en_microlote(datos):
+    """
+    Guarda UN reporte (JSON de app.js) junto con los que lleguen en los próximos
+    milisegundos. Devuelve su resultado, igual que un item de guardar_lote_reportes.
+    Lanza IngestaOcupada si la cola está llena o el lote no terminó a tiempo.
+    """
+    return guardar_paquete_en_microlote([datos])[0]
+
+
+def guardar_paquete_en_microlote(reportes):
+    """
+    Guarda un paquete de la cola offline (/api/guardar-lote/) por el mismo hilo
+    escritor y con el mismo tope que los reportes sueltos. Devuelve un resultado
+    por reporte, como guardar_lote_reportes.
+    """
+    if not reportes:
+        return []
+    if connection.in_atomic_block or _ajuste('INGESTA_VENTANA_MS', 5) <= 0:
+        # Dentro de una transacción abierta (ATOMIC_REQUESTS, tests) el hilo escritor
+        # no vería lo que todavía no se confirmó: guardamos en línea
+        return guardar_lote_reportes(reportes)
+
+    pedido = _encolar(_Pedido(reportes))
+    if not pedido.listo.wait(_ajuste('INGESTA_ESPERA_SEGUNDOS', 10)):
+        raise IngestaOcupada(DEMORADO)
+    return _resultado(pedido)
+
+
+async def guardar_en_microlote_async(datos):
+    """
+    guardar_en_microlote para las vistas async (ASGI): el request espera su lote
+    en el event loop, sin ocupar un hilo mientras tanto.
+    """
+    return (await guardar_paquete_en_microlote_async([datos]))[0]
+
+
+async def guardar_paquete_en_microlote_async(reportes):
+    """guardar_paquete_en_microlote para las vistas async (ASGI)."""
+    if not reportes:
+        return []
+    if _ajuste('INGESTA_VENTANA_MS', 5) <= 0:
+        return await sync_to_async(guardar_lote_reportes)(reportes)
+
+    loop = asyncio.get_running_loop()
+    terminado = loop.create_future()
+
+    def despertar():
+        if not terminado.done():
+            terminado.set_result(None)
+
+    pedido = _encolar(_Pedido(reportes, avisar=lambda: loop.call_soon_threadsafe(despertar)))
+    try:
+        await asyncio.wait_for(terminado, _ajuste('INGESTA_ESPERA_SEGUNDOS', 10))
+    except asyncio.TimeoutError:
+        raise IngestaOcupada(DEMORADO)
+    return _resultado(pedido)
+
+
+def estadisticas_microlotes():
+    """Lotes escritos, reportes, rechazos por cola llena y reportes esperando en la cola (este proceso)."""
+    return dict(_contadores, en_cola=_en_cola if _cola is not None else 0)
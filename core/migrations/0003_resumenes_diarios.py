@@ -0,0 +1,99 @@
+# Generated by Django 4.2.8 on 2026-10-18 16:58
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+import django.db.models.deletion
+
+
+def llenar_resumenes(apps, schema_editor):
+    """
+    Calcula los resúmenes de los reportes que ya existían (lo mismo que
+    'manage.py reconstruir_resumenes', pero solo con los modelos históricos).
+    """
+    ReporteProduccion = apps.get_model('core', 'ReporteProduccion')
+    ResumenDiarioProduccion = apps.get_model('core', 'ResumenDiarioProduccion')
+    ReporteDiarioAves = apps.get_model('core', 'ReporteDiarioAves')
+    ResumenDiarioLote = apps.get_model('core', 'ResumenDiarioLote')
+
+    produccion = (
+        ReporteProduccion.objects
+        .values('fecha_registro', 'producto_id')
+        .annotate(total=Sum('cantidad_producida'), reportes=Count('id'))
+        .order_by()
+    )
+    ResumenDiarioProduccion.objects.bulk_create([
+        ResumenDiarioProduccion(
+            fecha=f['fecha_registro'],
+            producto_id=f['producto_id'],
+            total_kilos=f['total'],
+            cantidad_reportes=f['reportes'],
+        )
+        for f in produccion.iterator()
+    ], batch_size=500)
+
+    granja = (
+        ReporteDiarioAves.objects
+        .values('fecha_reporte', 'lote_id')
+        .annotate(
+            huevos=Sum('huevos_recolectados'),
+            rotos=Sum('huevos_rotos'),
+            alimento=Sum('alimento_consumido_kg'),
+            muertes=Sum('mortalidad'),
+            reportes=Count('id'),
+        )
+        .order_by()
+    )
+    ResumenDiarioLote.objects.bulk_create([
+        ResumenDiarioLote(
+            fecha=f['fecha_reporte'],
+            lote_id=f['lote_id'],
+            huevos_recolectados=f['huevos'],
+            huevos_rotos=f['rotos'],
+            alimento_consumido_kg=f['alimento'],
+            mortalidad=f['muertes'],
+            cantidad_reportes=f['reportes'],
+        )
+        for f in granja.iterator()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_alter_producto_capacidad_maxima_diaria_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenDiarioProduccion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('total_kilos', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('cantidad_reportes', models.PositiveIntegerField(default=0)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.producto')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ResumenDiarioLote',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('huevos_recolectados', models.PositiveIntegerField(default=0)),
+                ('huevos_rotos', models.PositiveIntegerField(default=0)),
+                ('alimento_consumido_kg', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('mortalidad', models.PositiveIntegerField(default=0)),
+                ('cantidad_reportes', models.PositiveIntegerField(default=0)),
+                ('lote', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.loteaves')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='resumendiarioproduccion',
+            constraint=models.UniqueConstraint(fields=('fecha', 'producto'), name='resumen_prod_fecha_producto_unico'),
+        ),
+        migrations.AddConstraint(
+            model_name='resumendiariolote',
+            constraint=models.UniqueConstraint(fields=('fecha', 'lote'), name='resumen_lote_fecha_lote_unico'),
+        ),
+        migrations.RunPython(llenar_resumenes, migrations.RunPython.noop),
+    ]
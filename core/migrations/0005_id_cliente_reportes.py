@@ -0,0 +1,23 @@
+# Generated by Django 4.2.8 on 2026-10-18 17:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_trabajos_exportacion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reportediarioaves',
+            name='id_cliente',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='reporteproduccion',
+            name='id_cliente',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+    ]
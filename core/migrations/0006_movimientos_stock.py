@@ -0,0 +1,45 @@
+# Generated by Django 4.2.8 on 2026-10-18 17:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_id_cliente_reportes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SnapshotStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('saldo', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.producto')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MovimientoStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('PRODUCCION', 'Entrada por Producción'), ('DESPACHO', 'Salida por Despacho'), ('AJUSTE', 'Ajuste Manual')], max_length=12)),
+                ('cantidad', models.DecimalField(decimal_places=2, help_text='Kilos o Litros. Positivo entra, negativo sale.', max_digits=12)),
+                ('fecha', models.DateField(default=django.utils.timezone.now)),
+                ('nota', models.CharField(blank=True, max_length=200)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.producto')),
+                ('reporte', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='core.reporteproduccion')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='snapshotstock',
+            constraint=models.UniqueConstraint(fields=('producto', 'fecha'), name='snapshot_stock_producto_fecha_unico'),
+        ),
+        migrations.AddIndex(
+            model_name='movimientostock',
+            index=models.Index(fields=['producto', 'fecha'], name='mov_stock_producto_fecha'),
+        ),
+    ]
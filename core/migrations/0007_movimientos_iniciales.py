@@ -0,0 +1,59 @@
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import Sum
+from django.utils import timezone
+
+
+def crear_movimientos_iniciales(apps, schema_editor):
+    """
+    Pasa la historia existente al libro de movimientos:
+    una entrada por cada ReporteProduccion y un ajuste por la diferencia
+    con el stock_actual (cambios manuales hechos antes del libro).
+    """
+    Producto = apps.get_model('core', 'Producto')
+    ReporteProduccion = apps.get_model('core', 'ReporteProduccion')
+    MovimientoStock = apps.get_model('core', 'MovimientoStock')
+
+    movimientos = [
+        MovimientoStock(
+            producto_id=r.producto_id,
+            tipo='PRODUCCION',
+            cantidad=r.cantidad_producida,
+            fecha=r.fecha_registro,
+            reporte_id=r.id,
+            nota=f"Reporte #{r.id}",
+        )
+        for r in ReporteProduccion.objects.filter(cantidad_producida__gt=0).iterator()
+    ]
+    MovimientoStock.objects.bulk_create(movimientos, batch_size=500)
+
+    producido = dict(
+        ReporteProduccion.objects.values('producto_id')
+        .annotate(total=Sum('cantidad_producida'))
+        .values_list('producto_id', 'total')
+    )
+    hoy = timezone.now().date()
+    ajustes = []
+    for producto in Producto.objects.all():
+        diferencia = producto.stock_actual - (producido.get(producto.id) or Decimal('0'))
+        if diferencia:
+            ajustes.append(MovimientoStock(
+                producto_id=producto.id,
+                tipo='AJUSTE',
+                cantidad=diferencia,
+                fecha=hoy,
+                nota="Saldo inicial (ajustes previos al libro de movimientos)",
+            ))
+    MovimientoStock.objects.bulk_create(ajustes)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_movimientos_stock'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_movimientos_iniciales, migrations.RunPython.noop),
+    ]
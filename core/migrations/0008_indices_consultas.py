@@ -0,0 +1,33 @@
+# Generated by Django 4.2.8 on 2026-10-18 17:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_movimientos_iniciales'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='movimientostock',
+            index=models.Index(fields=['fecha', 'producto'], name='mov_stock_fecha_producto'),
+        ),
+        migrations.AddIndex(
+            model_name='reportediarioaves',
+            index=models.Index(fields=['lote', 'fecha_reporte', 'created_at'], name='rep_aves_lote_fecha'),
+        ),
+        migrations.AddIndex(
+            model_name='reportediarioaves',
+            index=models.Index(fields=['-fecha_reporte', '-created_at'], name='rep_aves_fecha_creado'),
+        ),
+        migrations.AddIndex(
+            model_name='reporteproduccion',
+            index=models.Index(fields=['-fecha_registro', '-created_at'], name='rep_prod_fecha_creado'),
+        ),
+        migrations.AddIndex(
+            model_name='reporteproduccion',
+            index=models.Index(fields=['producto', 'fecha_registro', 'created_at'], name='rep_prod_producto_fecha'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.8 on 2026-10-18 17:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_indices_consultas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CambioCatalogo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modelo', models.CharField(choices=[('PRODUCTO', 'Producto'), ('LOTE', 'Lote de Aves')], max_length=10)),
+                ('objeto_id', models.PositiveBigIntegerField()),
+                ('borrado', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='cambiocatalogo',
+            constraint=models.UniqueConstraint(fields=('modelo', 'objeto_id'), name='cambio_catalogo_objeto_unico'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+from django.db import migrations
+
+
+def registrar_catalogo_existente(apps, schema_editor):
+    """Un cambio por cada producto y lote que ya existía, para que la primera sincronización los traiga."""
+    Producto = apps.get_model('core', 'Producto')
+    LoteAves = apps.get_model('core', 'LoteAves')
+    CambioCatalogo = apps.get_model('core', 'CambioCatalogo')
+
+    cambios = [
+        CambioCatalogo(modelo='PRODUCTO', objeto_id=producto_id)
+        for producto_id in Producto.objects.order_by('id').values_list('id', flat=True)
+    ] + [
+        CambioCatalogo(modelo='LOTE', objeto_id=lote_id)
+        for lote_id in LoteAves.objects.order_by('id').values_list('id', flat=True)
+    ]
+    CambioCatalogo.objects.bulk_create(cambios, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_cambios_catalogo'),
+    ]
+
+    operations = [
+        migrations.RunPython(registrar_catalogo_existente, migrations.RunPython.noop),
+    ]
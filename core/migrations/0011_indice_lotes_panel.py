@@ -0,0 +1,17 @@
+# Generated by Django 4.2.8 on 2026-10-18 17:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_catalogo_inicial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='loteaves',
+            index=models.Index(fields=['activo', '-fecha_inicio'], name='lote_activo_inicio'),
+        ),
+    ]
@@ -62,6 +62,17 @@ class ReporteProduccion(models.Model):
     
     responsable = models.CharField(max_length=100, help_text="Nombre del trabajador")
 
+    # temp_id que genera app.js: si el celular reenvía el mismo reporte no se duplica
+    id_cliente = models.CharField(max_length=64, unique=True, null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Bitácora del dashboard y exportaciones: ORDER BY -fecha_registro, -created_at
+            models.Index(fields=['-fecha_registro', '-created_at'], name='rep_prod_fecha_creado'),
+            # Exportación filtrada por producto y rango de fechas (ya ordenada por fecha, created_at)
+            models.Index(fields=['producto', 'fecha_registro', 'created_at'], name='rep_prod_producto_fecha'),
+        ]
+
     def __str__(self):
         return f"{self.fecha_registro} - {self.producto.nombre}: {self.cantidad_producida}"
 
@@ -89,6 +100,12 @@ class LoteAves(models.Model):
     fecha_inicio = models.DateField()
     activo = models.BooleanField(default=True)
 
+    class Meta:
+        indexes = [
+            # Pestaña de lotes del panel: activo = X ORDER BY fecha_inicio DESC (ver tablas_gerencia.py)
+            models.Index(fields=['activo', '-fecha_inicio'], name='lote_activo_inicio'),
+        ]
+
     def __str__(self):
         return f"{self.nombre} - {self.get_tipo_dieta_display()}"
 
@@ -116,6 +133,17 @@ class ReporteDiarioAves(models.Model):
     observaciones = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # temp_id que genera app.js (ver ReporteProduccion.id_cliente)
+    id_cliente = models.CharField(max_length=64, unique=True, null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Filtro por lote y periodo: lote = X AND fecha_reporte >= Y (ya ordenado por fecha, created_at)
+            models.Index(fields=['lote', 'fecha_reporte', 'created_at'], name='rep_aves_lote_fecha'),
+            # Bitácora del dashboard y exportaciones: ORDER BY -fecha_reporte, -created_at
+            models.Index(fields=['-fecha_reporte', '-created_at'], name='rep_aves_fecha_creado'),
+        ]
+
     @property
     def tasa_postura(self):
         if self.lote.cantidad_aves_inicial > 0:
@@ -123,4 +151,182 @@ class ReporteDiarioAves(models.Model):
         return 0
 
     def __str__(self):
-        return f"{self.fecha_reporte} - {self.lote.nombre}"
\ No newline at end of file
+        return f"{self.fecha_reporte} - {self.lote.nombre}"
+
+# ==========================================
+# SECCIÓN 3: RESÚMENES DIARIOS (Tablas pre-calculadas)
+# ==========================================
+
+class ResumenDiarioProduccion(models.Model):
+    """
+    Una fila por día y por producto con los totales de ReporteProduccion.
+    Se actualiza al guardar cada reporte y se puede reconstruir con
+    'python manage.py reconstruir_resumenes'.
+    """
+    fecha = models.DateField()
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE)
+
+    total_kilos = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    cantidad_reportes = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'producto'], name='resumen_prod_fecha_producto_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} - {self.producto.nombre}: {self.total_kilos}"
+
+
+class ResumenDiarioLote(models.Model):
+    """
+    Una fila por día y por lote con los totales de ReporteDiarioAves.
+    """
+    fecha = models.DateField()
+    lote = models.ForeignKey(LoteAves, on_delete=models.CASCADE)
+
+    huevos_recolectados = models.PositiveIntegerField(default=0)
+    huevos_rotos = models.PositiveIntegerField(default=0)
+    alimento_consumido_kg = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    mortalidad = models.PositiveIntegerField(default=0)
+    cantidad_reportes = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'lote'], name='resumen_lote_fecha_lote_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} - {self.lote.nombre}: {self.huevos_recolectados} huevos"
+
+
+# ==========================================
+# SECCIÓN 4: EXPORTACIONES EN SEGUNDO PLANO
+# ==========================================
+
+class TrabajoExportacion(models.Model):
+    """
+    Un pedido de exportación Excel que se arma fuera del request.
+    'clave' identifica los filtros + la marca de agua de los datos, así que dos
+    pedidos iguales sobre los mismos datos comparten el mismo archivo en disco.
+    """
+    TIPOS = [
+        ('ALGAS', 'Reporte Algas'),
+        ('GRANJA', 'Reporte Granja'),
+    ]
+    ESTADOS = [
+        ('PENDIENTE', 'Pendiente'),
+        ('PROCESANDO', 'Procesando'),
+        ('LISTO', 'Listo'),
+        ('ERROR', 'Error'),
+    ]
+
+    tipo = models.CharField(max_length=10, choices=TIPOS)
+    filtros = models.JSONField(default=dict, blank=True)
+    clave = models.CharField(max_length=64, db_index=True)
+    estado = models.CharField(max_length=12, choices=ESTADOS, default='PENDIENTE')
+    error = models.TextField(blank=True)
+
+    usuario = models.ForeignKey('auth.User', on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    terminado_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} #{self.id} ({self.estado})"
+
+
+# ==========================================
+# SECCIÓN 5: MOVIMIENTOS DE STOCK (Libro de entradas y salidas)
+# ==========================================
+
+class MovimientoStock(models.Model):
+    """
+    Cada entrada o salida de stock queda registrada aquí y NO se modifica después.
+    Producto.stock_actual es la suma de todos los movimientos del producto.
+    """
+    TIPOS = [
+        ('PRODUCCION', 'Entrada por Producción'),
+        ('DESPACHO', 'Salida por Despacho'),
+        ('AJUSTE', 'Ajuste Manual'),
+    ]
+
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE)
+    tipo = models.CharField(max_length=12, choices=TIPOS)
+    cantidad = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        help_text="Kilos o Litros. Positivo entra, negativo sale.",
+    )
+    fecha = models.DateField(default=timezone.now)
+    reporte = models.ForeignKey(ReporteProduccion, on_delete=models.SET_NULL, null=True, blank=True)
+    nota = models.CharField(max_length=200, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['producto', 'fecha'], name='mov_stock_producto_fecha'),
+            # Tendencia del dashboard: fecha > X agrupado por producto
+            models.Index(fields=['fecha', 'producto'], name='mov_stock_fecha_producto'),
+        ]
+
+    def clean(self):
+        from django.core.exceptions import ValidationError
+        if self.cantidad is None:
+            return
+        if self.tipo == 'PRODUCCION' and self.cantidad <= 0:
+            raise ValidationError({'cantidad': "Una entrada por producción debe ser positiva."})
+        if self.tipo == 'DESPACHO' and self.cantidad >= 0:
+            raise ValidationError({'cantidad': "Un despacho es una salida: use una cantidad negativa."})
+
+    def __str__(self):
+        return f"{self.fecha} - {self.producto.nombre}: {self.cantidad:+}"
+
+
+class SnapshotStock(models.Model):
+    """
+    Saldo de un producto al cierre de un día. Se generan con
+    'python manage.py compactar_stock' y sirven para calcular el stock en
+    cualquier fecha pasada sin sumar toda la historia.
+    """
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE)
+    fecha = models.DateField()
+    saldo = models.DecimalField(max_digits=14, decimal_places=2)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['producto', 'fecha'], name='snapshot_stock_producto_fecha_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} - {self.producto.nombre}: {self.saldo}"
+
+
+# ==========================================
+# SECCIÓN 6: CAMBIOS DEL CATÁLOGO (Sincronización incremental de la PWA)
+# ==========================================
+
+class CambioCatalogo(models.Model):
+    """
+    Último cambio de cada Producto / LoteAves. El id es el cursor de la API de
+    sincronización: el celular pide "lo cambiado después de N" y recibe solo eso.
+    Se guarda una sola fila por objeto (la anterior se borra), así la tabla
+    nunca crece más que el propio catálogo.
+    """
+    MODELOS = [
+        ('PRODUCTO', 'Producto'),
+        ('LOTE', 'Lote de Aves'),
+    ]
+
+    modelo = models.CharField(max_length=10, choices=MODELOS)
+    objeto_id = models.PositiveBigIntegerField()
+    borrado = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['modelo', 'objeto_id'], name='cambio_catalogo_objeto_unico'),
+        ]
+
+    def __str__(self):
+        accion = "baja" if self.borrado else "cambio"
+        return f"#{self.id} {accion} {self.get_modelo_display()} {self.objeto_id}"
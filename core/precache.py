@@ -0,0 +1,57 @@
+import hashlib
+import json
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import ManifestFilesMixin, staticfiles_storage
+
+from .archivos_pwa import leer_en_memoria
+
+
+# ==========================================
+# MANIFIESTO DE PRECACHE DEL SERVICE WORKER
+# ==========================================
+
+# Archivos propios que las páginas offline necesitan desde la primera pintura
+ARCHIVOS_PRECACHE = ['js/app.js', 'js/bd.js']
+
+
+def _ruta(nombre):
+    """El archivo tal como quedó después de collectstatic; en desarrollo, el original."""
+    ruta = os.path.join(settings.STATIC_ROOT, nombre)
+    return ruta if os.path.exists(ruta) else finders.find(nombre)
+
+
+def _hash_contenido(nombre):
+    return leer_en_memoria(_ruta(nombre))[1][:12]
+
+
+def _nombres_con_hash():
+    """
+    True si collectstatic dejó los archivos con el hash en el nombre (ManifestStaticFilesStorage,
+    ver staticfiles.json). En DEBUG Django sirve los nombres originales aunque exista.
+    """
+    return isinstance(staticfiles_storage, ManifestFilesMixin) and not settings.DEBUG
+
+
+def manifiesto_precache():
+    """
+    Lo que sw.js guarda al instalarse:
+      - inmutables: URLs con hash de contenido -> cache-first y solo se bajan si cambió el hash.
+      - revisables: URLs sin hash (desarrollo) -> se vuelven a bajar en cada instalación.
+      - version: cambia si cambia cualquier archivo, así el navegador instala el SW nuevo.
+    """
+    urls = {}
+    hashes = []
+    for nombre in ARCHIVOS_PRECACHE:
+        urls[nombre] = staticfiles_storage.url(nombre)
+        hashes.append(_hash_contenido(nombre))
+
+    con_hash = _nombres_con_hash()
+    return {
+        'version': hashlib.md5(json.dumps([urls, hashes]).encode('utf-8')).hexdigest()[:12],
+        'inmutables': list(urls.values()) if con_hash else [],
+        'revisables': [] if con_hash else list(urls.values()),
+        'bd': urls['js/bd.js'],
+    }
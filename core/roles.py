@@ -0,0 +1,124 @@
+import time
+from functools import wraps
+
+from django.contrib.auth.views import redirect_to_login
+from django.core.cache import cache
+from django.db import transaction
+from django.http import JsonResponse
+from django.shortcuts import redirect
+
+
+# ==========================================
+# ROLES (Resueltos una vez por sesión, invalidados al cambiar grupos)
+# ==========================================
+#
+# Antes cada vista preguntaba por su cuenta: groups.filter(name='Trabajadores')
+# (una consulta por request) o is_staff. Ahora los grupos del usuario se leen una
+# vez y quedan en su sesión junto con una versión guardada en la caché; si alguien
+# le cambia los grupos la versión sube y el siguiente request los vuelve a leer.
+# is_staff viene en request.user (ya cargado), así que no necesita caché.
+
+ROL_GERENCIA = 'gerencia'
+ROL_TRABAJADOR = 'trabajador'
+
+# Grupo de Django -> rol
+ROLES_POR_GRUPO = {'Trabajadores': ROL_TRABAJADOR}
+
+CLAVE_SESION = '_roles'
+CLAVE_VERSION_GLOBAL = 'roles:version'
+
+
+def _clave_version(user_id):
+    return f'roles:version:{user_id}'
+
+
+def _versiones(user_id):
+    claves = [CLAVE_VERSION_GLOBAL, _clave_version(user_id)]
+    guardadas = cache.get_many(claves)
+    if len(guardadas) < len(claves):
+        # add() no pisa un valor existente; si la caché se perdió arranca desde la hora
+        # actual y ninguna sesión vieja coincide (se vuelven a leer los grupos)
+        for clave in claves:
+            cache.add(clave, time.time_ns(), timeout=None)
+        guardadas = cache.get_many(claves)
+    return [guardadas.get(clave) for clave in claves]
+
+
+def invalidar_roles(user_ids=None):
+    """Obliga a releer los grupos de esos usuarios (o de todos si no se indican)."""
+    claves = [_clave_version(user_id) for user_id in user_ids] if user_ids is not None else [CLAVE_VERSION_GLOBAL]
+    cache.set_many({clave: time.time_ns() for clave in claves}, timeout=None)
+
+
+def roles_de(request):
+    """Conjunto de roles del usuario del request. Sin consultas mientras la sesión esté vigente."""
+    if hasattr(request, '_roles'):
+        return request._roles
+    usuario = request.user
+    if not usuario.is_authenticated:
+        return frozenset()
+
+    versiones = _versiones(usuario.pk)
+    guardado = request.session.get(CLAVE_SESION)
+    if guardado and guardado.get('versiones') == versiones:
+        grupos = guardado['grupos']
+    else:
+        grupos = sorted(usuario.groups.values_list('name', flat=True))
+        request.session[CLAVE_SESION] = {'versiones': versiones, 'grupos': grupos}
+
+    roles = {ROLES_POR_GRUPO[g] for g in grupos if g in ROLES_POR_GRUPO}
+    if usuario.is_staff:
+        roles.add(ROL_GERENCIA)
+    request._roles = frozenset(roles)
+    return request._roles
+
+
+# --- Reglas que usan las vistas ---
+
+def es_gerencia(roles):
+    return ROL_GERENCIA in roles
+
+
+def no_es_trabajador(roles):
+    return ROL_TRABAJADOR not in roles
+
+
+def rol_requerido(regla, redirigir_a=None, mensaje='Solo gerencia'):
+    """
+    Reemplaza a @login_required y además revisa los roles con 'regla(roles)'.
+    Si no se cumple: redirige a 'redirigir_a' (páginas) o responde 403 en JSON (APIs).
+    """
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            if not request.user.is_authenticated:
+                return redirect_to_login(request.get_full_path())
+            if not regla(roles_de(request)):
+                if redirigir_a:
+                    return redirect(redirigir_a)
+                return JsonResponse({'status': 'error', 'mensaje': mensaje}, status=403)
+            return vista(request, *args, **kwargs)
+        return envoltura
+    return decorador
+
+
+# --- Invalidación (conectada en signals.py) ---
+# Al confirmar la transacción: si invalidáramos antes, otro request podría leer
+# los grupos viejos y guardarlos en su sesión con la versión nueva.
+
+def grupos_cambiados(sender, instance, action, reverse, pk_set, **kwargs):
+    """m2m_changed de User.groups, desde el usuario (user.groups.add) o desde el grupo (group.user_set.add)."""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        user_ids = [instance.pk]
+    elif pk_set is not None:
+        user_ids = list(pk_set)
+    else:
+        user_ids = None  # group.user_set.clear(): no sabemos a quiénes afectó
+    transaction.on_commit(lambda: invalidar_roles(user_ids))
+
+
+def grupo_modificado(sender, **kwargs):
+    """Un grupo renombrado o borrado cambia los roles de todos sus miembros."""
+    transaction.on_commit(invalidar_roles)
@@ -0,0 +1,59 @@
+from django.contrib.auth.models import Group, User
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+
+from .agregados import CLAVES_RESUMEN, reporte_borrado, reporte_guardado, reporte_por_guardar
+from .cache_dashboard import invalidar_dashboard_al_confirmar
+from .catalogo import registrar_cambio
+from .conexiones import configurar_sqlite
+from .metricas import instalar_en_conexion
+from .models import LoteAves, Producto, ReporteDiarioAves, ReporteProduccion
+from .roles import grupo_modificado, grupos_cambiados
+
+
+# Cualquier cambio en estos modelos cambia lo que muestra el dashboard.
+# (bulk_create y update() no disparan señales: esos caminos llaman a
+#  invalidar_dashboard_al_confirmar() por su cuenta, ver ingesta.py e inventario.py)
+MODELOS_DEL_DASHBOARD = (ReporteProduccion, ReporteDiarioAves, Producto, LoteAves)
+
+for modelo in MODELOS_DEL_DASHBOARD:
+    post_save.connect(invalidar_dashboard_al_confirmar, sender=modelo, dispatch_uid=f'dashboard_save_{modelo.__name__}')
+    post_delete.connect(invalidar_dashboard_al_confirmar, sender=modelo, dispatch_uid=f'dashboard_delete_{modelo.__name__}')
+
+
+# Resúmenes diarios de los reportes guardados o borrados uno a uno (admin), ver core/agregados.py
+for modelo in CLAVES_RESUMEN:
+    pre_save.connect(reporte_por_guardar, sender=modelo, dispatch_uid=f'resumen_pre_save_{modelo.__name__}')
+    post_save.connect(reporte_guardado, sender=modelo, dispatch_uid=f'resumen_save_{modelo.__name__}')
+    post_delete.connect(reporte_borrado, sender=modelo, dispatch_uid=f'resumen_delete_{modelo.__name__}')
+
+
+# Productos y lotes que ven los formularios de la PWA (ver core/catalogo.py).
+# El stock no viaja al celular, así que los update() de inventario.py no hacen falta aquí.
+MODELOS_DEL_CATALOGO = {Producto: 'PRODUCTO', LoteAves: 'LOTE'}
+
+
+def catalogo_guardado(sender, instance, **kwargs):
+    registrar_cambio(MODELOS_DEL_CATALOGO[sender], instance.pk)
+
+
+def catalogo_borrado(sender, instance, **kwargs):
+    registrar_cambio(MODELOS_DEL_CATALOGO[sender], instance.pk, borrado=True)
+
+
+for modelo in MODELOS_DEL_CATALOGO:
+    post_save.connect(catalogo_guardado, sender=modelo, dispatch_uid=f'catalogo_save_{modelo.__name__}')
+    post_delete.connect(catalogo_borrado, sender=modelo, dispatch_uid=f'catalogo_delete_{modelo.__name__}')
+
+
+# PRAGMAs de SQLite (WAL, busy_timeout...) en cada conexión nueva, ver core/conexiones.py
+connection_created.connect(configurar_sqlite, dispatch_uid='configurar_sqlite')
+
+# Cantidad y tiempo de las consultas de cada request, ver core/metricas.py
+connection_created.connect(instalar_en_conexion, dispatch_uid='metricas_consultas')
+
+
+# Roles guardados en la sesión: se releen cuando cambian los grupos, ver core/roles.py
+m2m_changed.connect(grupos_cambiados, sender=User.groups.through, dispatch_uid='roles_grupos_usuario')
+post_save.connect(grupo_modificado, sender=Group, dispatch_uid='roles_grupo_guardado')
+post_delete.connect(grupo_modificado, sender=Group, dispatch_uid='roles_grupo_borrado')
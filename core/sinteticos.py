@@ -0,0 +1,158 @@
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .agregados import reconstruir_resumenes
+from .cache_dashboard import invalidar_dashboard_al_confirmar
+from .models import LoteAves, MovimientoStock, Producto, ReporteDiarioAves, ReporteProduccion
+
+
+# ==========================================
+# DATOS SINTÉTICOS (Para medir con volúmenes de producción real)
+# ==========================================
+#
+# Genera productos, lotes y años de reportes diarios con una semilla fija: la
+# misma escala y la misma semilla dan exactamente los mismos datos, así dos
+# corridas del benchmark (antes y después de un cambio) miden lo mismo.
+# Los reportes se insertan con bulk_create y los resúmenes diarios se
+# reconstruyen al final (igual que 'manage.py reconstruir_resumenes').
+
+PREFIJO = "Sintético"
+TAMANO_BLOQUE = 2000
+
+# Postura (huevos por ave y por día) y extras de la dieta con algas
+POSTURA_PICO = 0.92
+BONO_ALGAS = 0.03
+MORTALIDAD_DIARIA = 0.0004
+ALIMENTO_KG_POR_AVE = 0.11
+
+
+def _postura(semana, dieta, azar):
+    """Curva de postura simplificada: sube hasta el pico y cae lentamente."""
+    if semana < 20:
+        tasa = max(0.0, (semana - 18) * 0.45)
+    else:
+        tasa = POSTURA_PICO - max(0, semana - 30) * 0.004
+    if dieta == 'ALGAS':
+        tasa += BONO_ALGAS
+    return max(0.0, min(0.98, tasa + azar.gauss(0, 0.02)))
+
+
+def _en_bloques(modelo, objetos):
+    creados = 0
+    for i in range(0, len(objetos), TAMANO_BLOQUE):
+        creados += len(modelo.objects.bulk_create(objetos[i:i + TAMANO_BLOQUE]))
+    return creados
+
+
+def _reportes_aves(lotes, desde, hasta, azar):
+    reportes = []
+    for lote in lotes:
+        aves = lote.cantidad_aves_inicial
+        fecha = desde
+        while fecha <= hasta:
+            semana = 18 + (fecha - lote.fecha_inicio).days // 7
+            huevos = int(aves * _postura(semana, lote.tipo_dieta, azar))
+            muertes = int(aves * MORTALIDAD_DIARIA + azar.random())  # Redondeo al azar: ~0.4 por día cada 1000 aves
+            reportes.append(ReporteDiarioAves(
+                lote=lote,
+                fecha_reporte=fecha,
+                huevos_recolectados=huevos,
+                huevos_rotos=int(huevos * azar.uniform(0, 0.02)),
+                alimento_consumido_kg=Decimal(str(round(aves * ALIMENTO_KG_POR_AVE * azar.uniform(0.95, 1.05), 2))),
+                mortalidad=muertes,
+            ))
+            aves = max(0, aves - muertes)
+            fecha += timedelta(days=1)
+    return reportes
+
+
+def _reportes_produccion(productos, desde, hasta, azar):
+    reportes = []
+    for producto in productos:
+        capacidad = float(producto.capacidad_maxima_diaria)
+        fecha = desde
+        while fecha <= hasta:
+            # Algunos días no se produce (mantención, domingos, lluvia)
+            if azar.random() < 0.85:
+                reportes.append(ReporteProduccion(
+                    producto=producto,
+                    fecha_registro=fecha,
+                    cantidad_producida=Decimal(str(round(capacidad * azar.uniform(0.4, 0.95), 2))),
+                    responsable=f"{PREFIJO} {azar.randint(1, 12)}",
+                ))
+            fecha += timedelta(days=1)
+    return reportes
+
+
+@transaction.atomic
+def generar_datos_sinteticos(productos=5, lotes=10, dias=365, aves=1000, semilla=1):
+    """
+    Crea 'productos' productos y 'lotes' lotes (mitad ALGAS, mitad CONTROL) con
+    un reporte diario por lote y casi uno por producto durante los últimos 'dias'
+    días, más el libro de stock que corresponde. Devuelve lo que se creó.
+    """
+    azar = random.Random(semilla)
+    categorias = [clave for clave, _ in Producto.CATEGORIAS]
+    hoy = timezone.now().date()
+    desde = hoy - timedelta(days=dias - 1)
+
+    creados_productos = [
+        Producto.objects.create(
+            nombre=f"{PREFIJO} {i + 1}",
+            categoria=categorias[i % len(categorias)],
+            capacidad_maxima_diaria=azar.choice([50, 100, 200, 500]),
+        )
+        for i in range(productos)
+    ]
+    creados_lotes = [
+        LoteAves.objects.create(
+            nombre=f"{PREFIJO} Nave {i + 1}",
+            tipo_dieta='ALGAS' if i % 2 == 0 else 'CONTROL',
+            cantidad_aves_inicial=aves,
+            fecha_inicio=desde - timedelta(days=azar.randint(0, 60)),
+        )
+        for i in range(lotes)
+    ]
+
+    total_aves = _en_bloques(ReporteDiarioAves, _reportes_aves(creados_lotes, desde, hoy, azar))
+    produccion = _reportes_produccion(creados_productos, desde, hoy, azar)
+    total_produccion = _en_bloques(ReporteProduccion, produccion)
+
+    # Libro de stock: un movimiento por reporte y el saldo materializado en el producto
+    _en_bloques(MovimientoStock, [
+        MovimientoStock(
+            producto_id=r.producto_id, tipo='PRODUCCION', cantidad=r.cantidad_producida,
+            fecha=r.fecha_registro, nota=PREFIJO,
+        )
+        for r in produccion
+    ])
+    for producto in creados_productos:
+        total = MovimientoStock.objects.filter(producto=producto).aggregate(total=Sum('cantidad'))['total']
+        Producto.objects.filter(pk=producto.pk).update(stock_actual=total or 0)
+
+    reconstruir_resumenes()
+    # bulk_create y update() no disparan señales
+    invalidar_dashboard_al_confirmar()
+    return {
+        'productos': len(creados_productos),
+        'lotes': len(creados_lotes),
+        'reportes_aves': total_aves,
+        'reportes_produccion': total_produccion,
+    }
+
+
+@transaction.atomic
+def borrar_datos_sinteticos():
+    """
+    Borra productos y lotes sintéticos (sus reportes, resúmenes y movimientos caen
+    en cascada). Devuelve la cantidad total de filas borradas.
+    """
+    borradas, _ = Producto.objects.filter(nombre__startswith=PREFIJO).delete()
+    borradas_lotes, _ = LoteAves.objects.filter(nombre__startswith=PREFIJO).delete()
+    invalidar_dashboard_al_confirmar()
+    return borradas + borradas_lotes
@@ -0,0 +1,172 @@
+import base64
+import binascii
+import json
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.urls import reverse
+
+from .models import LoteAves, Producto
+
+
+# ==========================================
+# TABLAS DEL PANEL DE GERENCIA (Búsqueda, orden y paginación por cursor)
+# ==========================================
+#
+# El panel ya no trae todos los usuarios, productos y lotes en el HTML: cada
+# pestaña pide sus filas a /api/gerencia/<tabla>/ al abrirse, de a una página.
+# La paginación es por "keyset" (WHERE (orden, id) > (último visto) LIMIT n):
+# la página 100 cuesta lo mismo que la primera, sin OFFSET que recorra todo.
+
+LIMITE_POR_DEFECTO = 25
+LIMITE_MAXIMO = 100
+LARGO_MAXIMO_BUSQUEDA = 100
+
+# Lotes: por defecto solo los activos (los terminados se piden aparte)
+ESTADOS_LOTE = {
+    'activos': Q(activo=True),
+    'terminados': Q(activo=False),
+    'todos': Q(),
+}
+
+
+def _usuario(u):
+    return {
+        'id': u.id,
+        'usuario': u.username,
+        'nombre': u.get_full_name(),
+        'email': u.email,
+        'admin': u.is_superuser,
+        'url_editar': reverse('editar_usuario', args=[u.id]),
+        # Los administradores no se borran desde el panel
+        'url_borrar': None if u.is_superuser else reverse('eliminar_usuario', args=[u.id]),
+    }
+
+
+def _producto(p):
+    return {
+        'id': p.id,
+        'nombre': p.nombre,
+        'categoria': p.get_categoria_display(),
+        'stock': str(p.stock_actual),
+        'url_editar': reverse('editar_producto', args=[p.id]),
+        'url_borrar': reverse('eliminar_producto', args=[p.id]),
+    }
+
+
+def _lote(lote):
+    return {
+        'id': lote.id,
+        'nombre': lote.nombre,
+        'dieta': lote.get_tipo_dieta_display(),
+        'aves': lote.cantidad_aves_inicial,
+        'inicio': lote.fecha_inicio.isoformat(),
+        'activo': lote.activo,
+        'url_editar': reverse('editar_lote', args=[lote.id]),
+        'url_borrar': reverse('eliminar_lote', args=[lote.id]),
+    }
+
+
+# orden: nombre en la URL -> campo del modelo. El id siempre desempata.
+TABLAS = {
+    'usuarios': {
+        'modelo': User,
+        'busqueda': ('username', 'first_name', 'last_name', 'email'),
+        'orden': {'usuario': 'username', 'nombre': 'first_name', 'alta': 'date_joined'},
+        'por_defecto': '-alta',
+        'fila': _usuario,
+    },
+    'productos': {
+        'modelo': Producto,
+        'busqueda': ('nombre',),
+        'orden': {'nombre': 'nombre', 'categoria': 'categoria', 'stock': 'stock_actual'},
+        'por_defecto': 'nombre',
+        'fila': _producto,
+    },
+    'lotes': {
+        'modelo': LoteAves,
+        'busqueda': ('nombre',),
+        'orden': {'nombre': 'nombre', 'dieta': 'tipo_dieta', 'aves': 'cantidad_aves_inicial', 'inicio': 'fecha_inicio'},
+        'por_defecto': '-inicio',
+        'estados': ESTADOS_LOTE,
+        'fila': _lote,
+    },
+}
+
+
+def _codificar_cursor(orden, valor, id):
+    texto = json.dumps([orden, str(valor), id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(texto.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def _decodificar_cursor(cursor, orden, campo):
+    """(valor, id) de la última fila de la página anterior. El cursor solo vale para el mismo orden."""
+    try:
+        texto = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        orden_cursor, valor, id = json.loads(texto)
+        if orden_cursor != orden or not isinstance(id, int):
+            raise ValueError
+        return campo.to_python(valor), id
+    except (ValueError, TypeError, binascii.Error, ValidationError):
+        raise ValueError("'cursor' inválido (¿cambió el orden? pida de nuevo la primera página)")
+
+
+def _limite(parametros):
+    limite = parametros.get('limite', str(LIMITE_POR_DEFECTO))
+    if not limite.isdigit() or not 1 <= int(limite) <= LIMITE_MAXIMO:
+        raise ValueError(f"'limite' debe ser un número entre 1 y {LIMITE_MAXIMO}")
+    return int(limite)
+
+
+def pagina_tabla(nombre, parametros):
+    """
+    Una página de la tabla 'nombre' del panel según los parámetros de la URL:
+      ?q=      busca (sin distinguir mayúsculas) en las columnas de texto
+      ?orden=  columna, con '-' adelante para descendente (ver TABLAS)
+      ?cursor= el 'siguiente' de la página anterior
+      ?limite= filas por página (máximo LIMITE_MAXIMO)
+      ?estado= solo lotes: activos (por defecto), terminados o todos
+    Devuelve {'filas': [...], 'siguiente': cursor o None si no hay más}.
+    Lanza KeyError si la tabla no existe y ValueError si un parámetro es inválido.
+    """
+    tabla = TABLAS[nombre]
+    modelo = tabla['modelo']
+
+    orden = parametros.get('orden') or tabla['por_defecto']
+    descendente = orden.startswith('-')
+    if orden.lstrip('-') not in tabla['orden']:
+        raise ValueError(f"'orden' debe ser uno de: {', '.join(tabla['orden'])}")
+    campo = tabla['orden'][orden.lstrip('-')]
+    limite = _limite(parametros)
+
+    consulta = modelo.objects.all()
+    if 'estados' in tabla:
+        estado = parametros.get('estado') or next(iter(tabla['estados']))
+        if estado not in tabla['estados']:
+            raise ValueError(f"'estado' debe ser uno de: {', '.join(tabla['estados'])}")
+        consulta = consulta.filter(tabla['estados'][estado])
+
+    texto = parametros.get('q', '').strip()[:LARGO_MAXIMO_BUSQUEDA]
+    if texto:
+        busqueda = Q()
+        for columna in tabla['busqueda']:
+            busqueda |= Q(**{f'{columna}__icontains': texto})
+        consulta = consulta.filter(busqueda)
+
+    cursor = parametros.get('cursor')
+    if cursor:
+        valor, ultimo_id = _decodificar_cursor(cursor, orden, modelo._meta.get_field(campo))
+        mayor = 'lt' if descendente else 'gt'
+        consulta = consulta.filter(
+            Q(**{f'{campo}__{mayor}': valor}) | Q(**{campo: valor, f'id__{mayor}': ultimo_id})
+        )
+
+    signo = '-' if descendente else ''
+    # Una fila de más para saber si hay otra página, sin contar todo con COUNT(*)
+    filas = list(consulta.order_by(f'{signo}{campo}', f'{signo}id')[:limite + 1])
+    siguiente = None
+    if len(filas) > limite:
+        filas = filas[:limite]
+        siguiente = _codificar_cursor(orden, getattr(filas[-1], campo), filas[-1].id)
+    return {'filas': [tabla['fila'](f) for f in filas], 'siguiente': siguiente}
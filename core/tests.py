@@ -1,3 +1,1730 @@
-from django.test import TestCase
+import asyncio
+import csv
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from importlib import import_module
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import openpyxl
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.admin import site as admin_site
+from django.contrib.auth.models import AnonymousUser, Group, User
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management import call_command
+from django.db import IntegrityError, connection, connections, transaction
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.db.migrations.loader import MigrationLoader
+from django.test import AsyncRequestFactory, Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from . import metricas, microlotes
+from .agregados import reconstruir_resumenes, rendimiento_por_dieta
+from .archivos_pwa import leer_en_memoria
+from .catalogo import cambios_desde, cambios_desde_async
+from .estadisticas import analizar_ensayo, cola_t
+from .exportar import (
+    escribir_excel_algas, escribir_excel_granja, filas_csv_granja, filas_csv_produccion,
+    filtrar_granja, filtrar_produccion,
+)
+from .forms import ProductoForm
+from .inventario import (
+    compactar_snapshots, movimiento_de_produccion, proyeccion_por_tendencia, registrar_movimientos, saldo_en_fecha,
+)
+from .management.commands.benchmark_vistas import comparar
+from .models import (
+    CambioCatalogo, LoteAves, Producto, ReporteDiarioAves, ReporteProduccion,
+    MovimientoStock, ResumenDiarioLote, ResumenDiarioProduccion, SnapshotStock, TrabajoExportacion,
+)
+from .sinteticos import borrar_datos_sinteticos, generar_datos_sinteticos
+from .tablas_gerencia import pagina_tabla
+from .trabajos import calcular_clave
+from .views import (
+    api_catalogo_cambios_async, api_guardar_aves_async, api_guardar_lote_async, api_guardar_produccion_async,
+    calcular_datos_dashboard,
+)
+
+
+def crear_lotes(cantidad, dieta, aves=100, huevos=80, dias=3):
+    """Crea 'cantidad' lotes activos con 'dias' reportes cada uno."""
+    hoy = timezone.now().date()
+    for i in range(cantidad):
+        lote = LoteAves.objects.create(
+            nombre=f"Lote {dieta} {i}",
+            tipo_dieta=dieta,
+            cantidad_aves_inicial=aves,
+            fecha_inicio=hoy - timedelta(days=60),
+        )
+        for d in range(dias):
+            # create() dispara post_save, que suma el reporte a su resumen del día
+            ReporteDiarioAves.objects.create(
+                lote=lote,
+                fecha_reporte=hoy - timedelta(days=d),
+                huevos_recolectados=huevos,
+                alimento_consumido_kg=10,
+            )
+
+
+class RendimientoPorDietaTests(TestCase):
+
+    def test_calcula_tasa_por_dieta(self):
+        crear_lotes(2, 'ALGAS', aves=100, huevos=90)
+        crear_lotes(1, 'CONTROL', aves=200, huevos=100)
+
+        resultado = rendimiento_por_dieta(timezone.now().date() - timedelta(days=30))
+
+        self.assertEqual(resultado['ALGAS']['tasa'], 90.0)
+        self.assertEqual(resultado['ALGAS']['total_huevos'], 2 * 3 * 90)
+        self.assertEqual(resultado['ALGAS']['aves_dias'], 2 * 3 * 100)
+        self.assertEqual(resultado['CONTROL']['tasa'], 50.0)
+
+    def test_ignora_lotes_inactivos_y_reportes_viejos(self):
+        crear_lotes(1, 'ALGAS', huevos=90)
+        LoteAves.objects.update(activo=False)
+        crear_lotes(1, 'CONTROL', huevos=50)
+
+        resultado = rendimiento_por_dieta(timezone.now().date())
+
+        self.assertEqual(resultado['ALGAS']['tasa'], 0)
+        self.assertEqual(resultado['CONTROL']['dias_reportados'], 1)
+
+    def test_una_sola_consulta(self):
+        crear_lotes(5, 'ALGAS')
+        crear_lotes(5, 'CONTROL')
+        with self.assertNumQueries(1):
+            rendimiento_por_dieta(timezone.now().date() - timedelta(days=365))
+
+
+# Los tests no corren collectstatic: sin staticfiles.json {% static %} no podría resolver
+# los nombres con hash, así que usan el storage simple (el de producción se prueba en
+# PrecacheServiceWorkerTests.test_urls_de_collectstatic). La caché va en memoria para
+# no leer ni dejar entradas en la caché en disco del proyecto (BASE_DIR/.cache).
+AJUSTES_DE_PRUEBA = override_settings(
+    STORAGES={
+        'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+        'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    },
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+)
+
+
+def setUpModule():
+    AJUSTES_DE_PRUEBA.enable()
+
+
+def tearDownModule():
+    AJUSTES_DE_PRUEBA.disable()
+
+
+class DashboardConsultasTests(TestCase):
+
+    def setUp(self):
+        self.gerente = User.objects.create_user('gerente', password='clave-segura-123', is_staff=True)
+        self.client.force_login(self.gerente)
+
+    def contar_consultas(self):
+        cache.clear()  # Medimos el cálculo completo, no la caché
+        with CaptureQueriesContext(connection) as ctx:
+            respuesta = self.client.get(reverse('dashboard'), {'dias': 365})
+        self.assertEqual(respuesta.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_cantidad_de_consultas_no_depende_de_los_lotes(self):
+        crear_lotes(1, 'ALGAS')
+        crear_lotes(1, 'CONTROL')
+        con_pocos_lotes = self.contar_consultas()
+
+        crear_lotes(20, 'ALGAS')
+        crear_lotes(20, 'CONTROL')
+        con_muchos_lotes = self.contar_consultas()
+
+        self.assertEqual(con_pocos_lotes, con_muchos_lotes)
+
+
+class ResumenesDiariosTests(TestCase):
+
+    def setUp(self):
+        self.producto = Producto.objects.create(
+            nombre="Alga Seca", categoria='MP_ALGA_DESHIDRATADA', capacidad_maxima_diaria=100,
+        )
+        self.lote = LoteAves.objects.create(
+            nombre="Nave 1", tipo_dieta='ALGAS', cantidad_aves_inicial=100, fecha_inicio='2025-01-01',
+        )
+
+    def post(self, url, datos):
+        return self.client.post(url, json.dumps(datos), content_type='application/json')
+
+    def test_api_produccion_acumula_en_el_resumen_del_dia(self):
+        for cantidad in ('10.5', '4.5'):
+            self.post(reverse('api_guardar_prod'), {
+                'producto_id': self.producto.id, 'cantidad': cantidad,
+                'responsable': 'Ana', 'fecha_registro': '2025-03-01',
+            })
+
+        resumen = ResumenDiarioProduccion.objects.get()
+        self.assertEqual(str(resumen.fecha), '2025-03-01')
+        self.assertEqual(resumen.total_kilos, Decimal('15.00'))
+        self.assertEqual(resumen.cantidad_reportes, 2)
+
+    def test_api_granja_acumula_en_el_resumen_del_dia(self):
+        for huevos in (80, 70):
+            self.post(reverse('api_guardar_aves'), {
+                'lote_id': self.lote.id, 'huevos': huevos, 'alimento': '12.5',
+                'mortalidad': 1, 'responsable': 'Luis', 'fecha_registro': '2025-03-01',
+            })
+
+        resumen = ResumenDiarioLote.objects.get()
+        self.assertEqual(resumen.huevos_recolectados, 150)
+        self.assertEqual(resumen.alimento_consumido_kg, Decimal('25.00'))
+        self.assertEqual(resumen.mortalidad, 2)
+        self.assertEqual(resumen.cantidad_reportes, 2)
+
+    def test_dashboard_lee_la_produccion_del_resumen(self):
+        hoy = timezone.localdate()
+        for dias_atras, cantidad in ((1, '10.5'), (2, '4.5'), (40, '99')):
+            self.post(reverse('api_guardar_prod'), {
+                'producto_id': self.producto.id, 'cantidad': cantidad,
+                'responsable': 'Ana', 'fecha_registro': str(hoy - timedelta(days=dias_atras)),
+            })
+
+        with CaptureQueriesContext(connection) as consultas:
+            datos = calcular_datos_dashboard(30)
+
+        self.assertEqual(datos['produccion_prod'], [15.0])
+        # La única consulta a los reportes crudos es la bitácora (los últimos 5)
+        crudas = [c['sql'] for c in consultas if 'core_reporteproduccion' in c['sql']]
+        self.assertEqual(len(crudas), 1)
+        self.assertIn('LIMIT 5', crudas[0])
+        self.assertTrue(any('core_resumendiarioproduccion' in c['sql'] for c in consultas))
+
+    def test_reconstruir_coincide_con_la_actualizacion_incremental(self):
+        crear_lotes(3, 'CONTROL', dias=5)
+        ReporteProduccion.objects.create(producto=self.producto, cantidad_producida=7, responsable='Ana')
+        antes = list(ResumenDiarioLote.objects.values_list('fecha', 'lote_id', 'huevos_recolectados', 'cantidad_reportes').order_by('fecha', 'lote_id'))
+
+        filas_prod, filas_lote = reconstruir_resumenes()
+
+        despues = list(ResumenDiarioLote.objects.values_list('fecha', 'lote_id', 'huevos_recolectados', 'cantidad_reportes').order_by('fecha', 'lote_id'))
+        self.assertEqual(antes, despues)
+        self.assertEqual((filas_prod, filas_lote), (1, 15))
+
+    def test_editar_un_reporte_mueve_su_resumen(self):
+        reporte = ReporteProduccion.objects.create(
+            producto=self.producto, cantidad_producida=7, responsable='Ana', fecha_registro='2025-03-01',
+        )
+        ReporteProduccion.objects.create(
+            producto=self.producto, cantidad_producida=3, responsable='Ana', fecha_registro='2025-03-01',
+        )
+
+        reporte.fecha_registro = parse_date('2025-03-02')
+        reporte.cantidad_producida = 10
+        reporte.save()
+
+        resumenes = dict(ResumenDiarioProduccion.objects.values_list('fecha', 'total_kilos'))
+        self.assertEqual(resumenes, {parse_date('2025-03-01'): Decimal('3.00'), parse_date('2025-03-02'): Decimal('10.00')})
+
+    def test_borrar_un_reporte_descuenta_del_resumen(self):
+        for huevos in (80, 70):
+            ReporteDiarioAves.objects.create(
+                lote=self.lote, fecha_reporte='2025-03-01', huevos_recolectados=huevos, alimento_consumido_kg=10,
+            )
+
+        ReporteDiarioAves.objects.filter(huevos_recolectados=80).delete()
+        resumen = ResumenDiarioLote.objects.get()
+        self.assertEqual((resumen.huevos_recolectados, resumen.cantidad_reportes), (70, 1))
+
+        ReporteDiarioAves.objects.get().delete()
+        self.assertFalse(ResumenDiarioLote.objects.exists())
+
+    def test_borrar_el_lote_no_recalcula_reporte_por_reporte(self):
+        crear_lotes(1, 'ALGAS', dias=5)
+        with CaptureQueriesContext(connection) as consultas:
+            LoteAves.objects.get(nombre="Lote ALGAS 0").delete()
+        self.assertLess(len(consultas), 15)
+        self.assertFalse(ResumenDiarioLote.objects.exclude(lote=self.lote).exists())
+
+    def test_la_migracion_llena_los_resumenes_de_los_reportes_existentes(self):
+        # Lo mismo que hace RunPython en 0003_resumenes_diarios con los modelos históricos
+        ReporteProduccion.objects.create(producto=self.producto, cantidad_producida=7, responsable='Ana')
+        crear_lotes(2, 'CONTROL', dias=3)
+        esperado = list(ResumenDiarioLote.objects.values_list('fecha', 'lote_id', 'huevos_recolectados').order_by('fecha', 'lote_id'))
+        ResumenDiarioProduccion.objects.all().delete()
+        ResumenDiarioLote.objects.all().delete()
+
+        migracion = import_module('core.migrations.0003_resumenes_diarios')
+        historicos = MigrationLoader(connection).project_state(('core', '0003_resumenes_diarios')).apps
+        migracion.llenar_resumenes(historicos, None)
+
+        self.assertEqual(ResumenDiarioProduccion.objects.count(), 1)
+        self.assertEqual(
+            list(ResumenDiarioLote.objects.values_list('fecha', 'lote_id', 'huevos_recolectados').order_by('fecha', 'lote_id')),
+            esperado,
+        )
+
+
+class ExportarExcelTests(TestCase):
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('gerente', password='clave-segura-123', is_staff=True))
+        producto = Producto.objects.create(
+            nombre="Saco Alimento Gallina 20kg", categoria='PT_ALIMENTO', capacidad_maxima_diaria=100,
+        )
+        for cantidad in (10, 20, 30):
+            ReporteProduccion.objects.create(producto=producto, cantidad_producida=cantidad, responsable='Ana')
+        crear_lotes(2, 'ALGAS', huevos=50, dias=2)
+
+    def descargar(self, nombre_url):
+        respuesta = self.client.get(reverse(nombre_url))
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertTrue(respuesta.streaming)
+        libro = openpyxl.load_workbook(io.BytesIO(b''.join(respuesta.streaming_content)))
+        return libro.active
+
+    def test_excel_algas_con_total_y_anchos(self):
+        ws = self.descargar('exportar_algas')
+        self.assertEqual(ws.title, "Reporte Algas")
+        self.assertEqual(ws.max_row, 1 + 3 + 1)
+        self.assertEqual(ws.cell(row=5, column=4).value, "TOTAL PRODUCIDO:")
+        self.assertEqual(ws.cell(row=5, column=5).value, 60)
+        self.assertEqual(ws.cell(row=2, column=4).value, "Producto Terminado: Alimento Animal")
+        self.assertGreaterEqual(ws.column_dimensions['C'].width, len("Saco Alimento Gallina 20kg"))
+
+    def test_excel_granja_con_totales(self):
+        ws = self.descargar('exportar_granja')
+        self.assertEqual(ws.max_row, 1 + 4 + 1)
+        self.assertEqual(ws.cell(row=6, column=3).value, "TOTALES:")
+        self.assertEqual(ws.cell(row=6, column=4).value, 200)
+        self.assertEqual(ws.cell(row=6, column=5).value, 40)
+
+    def test_excel_granja_observaciones_bajo_su_columna(self):
+        ReporteDiarioAves.objects.update(observaciones="Sin novedad")
+        ws = self.descargar('exportar_granja')
+        encabezados = [celda.value for celda in ws[1]]
+        self.assertEqual(len(encabezados), len([celda.value for celda in ws[2]]))
+        self.assertEqual(encabezados[-1], 'Obs')
+        self.assertEqual(ws.cell(row=2, column=len(encabezados)).value, "Sin novedad")
+
+
+class ExportarCsvTests(TestCase):
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('gerente', password='clave-segura-123', is_staff=True))
+        self.producto = Producto.objects.create(nombre="Alga Seca", categoria='MP_ALGA_DESHIDRATADA', capacidad_maxima_diaria=100)
+        otro = Producto.objects.create(nombre="Bioestimulante", categoria='PT_BIOESTIMULANTE', capacidad_maxima_diaria=50)
+        for dia, producto in (('2025-01-10', self.producto), ('2025-02-10', self.producto), ('2025-02-11', otro)):
+            ReporteProduccion.objects.create(producto=producto, cantidad_producida=5, responsable='Ana', fecha_registro=dia)
+
+    def leer(self, respuesta, comprimido=False):
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertTrue(respuesta.streaming)
+        contenido = b''.join(respuesta.streaming_content)
+        if comprimido:
+            contenido = gzip.decompress(contenido)
+        return list(csv.reader(io.StringIO(contenido.decode('utf-8'))))
+
+    def test_csv_produccion_con_filtros(self):
+        filas = self.leer(self.client.get(reverse('exportar_algas_csv'), {
+            'desde': '2025-02-01', 'producto': self.producto.id,
+        }))
+        self.assertEqual(filas[0][0], 'fecha_registro')
+        self.assertEqual(len(filas), 2)
+        self.assertEqual(filas[1][0], '2025-02-10')
+
+    def test_csv_produccion_gzip(self):
+        respuesta = self.client.get(reverse('exportar_algas_csv'), {'gzip': '1'})
+        self.assertIn('.csv.gz', respuesta['Content-Disposition'])
+        self.assertEqual(len(self.leer(respuesta, comprimido=True)), 4)
+
+    def test_csv_granja_filtrado_por_lote(self):
+        crear_lotes(2, 'ALGAS', dias=3)
+        lote = LoteAves.objects.first()
+        filas = self.leer(self.client.get(reverse('exportar_granja_csv'), {'lote': lote.id}))
+        self.assertEqual(len(filas), 1 + 3)
+
+    def test_fecha_invalida(self):
+        respuesta = self.client.get(reverse('exportar_algas_csv'), {'desde': 'ayer'})
+        self.assertEqual(respuesta.status_code, 400)
+
+
+def ejecutar_en_linea(funcion, *args):
+    return funcion(*args)
+
+
+@mock.patch('core.trabajos.ejecutar_en_segundo_plano', ejecutar_en_linea)
+class ExportacionSegundoPlanoTests(TestCase):
+
+    def setUp(self):
+        self.carpeta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.carpeta)
+        ajustes = override_settings(EXPORTACIONES_DIR=self.carpeta)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        self.client.force_login(User.objects.create_user('gerente', password='clave-segura-123', is_staff=True))
+        crear_lotes(2, 'ALGAS', dias=2)
+
+    def encolar(self, **filtros):
+        with self.captureOnCommitCallbacks(execute=True):
+            respuesta = self.client.get(reverse('exportar_segundo_plano', args=['granja']), filtros)
+        return respuesta
+
+    def test_encola_genera_y_descarga(self):
+        respuesta = self.encolar()
+        self.assertEqual(respuesta.status_code, 202)
+
+        estado = self.client.get(respuesta.json()['url_estado']).json()
+        self.assertEqual(estado['estado'], 'LISTO')
+
+        descarga = self.client.get(estado['url_descarga'])
+        ws = openpyxl.load_workbook(io.BytesIO(b''.join(descarga.streaming_content))).active
+        self.assertEqual(ws.max_row, 1 + 4 + 1)
+
+    def test_pedido_repetido_usa_el_archivo_en_cache(self):
+        self.encolar()
+        with mock.patch('core.trabajos.procesar_trabajo') as procesar:
+            respuesta = self.encolar()
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertIn('url_descarga', respuesta.json())
+        procesar.assert_not_called()
+
+    def test_datos_nuevos_invalidan_la_cache(self):
+        primero = TrabajoExportacion.objects.get(id=self.encolar().json()['trabajo'])
+        crear_lotes(1, 'CONTROL', dias=1)
+        segundo = TrabajoExportacion.objects.get(id=self.encolar().json()['trabajo'])
+        self.assertNotEqual(primero.clave, segundo.clave)
+
+    def test_otro_usuario_no_ve_el_trabajo(self):
+        trabajo_id = self.encolar().json()['trabajo']
+        self.client.force_login(User.objects.create_user('trabajador', password='clave-segura-123'))
+        respuesta = self.client.get(reverse('estado_exportacion', args=[trabajo_id]))
+        self.assertEqual(respuesta.status_code, 404)
+
+    def test_no_reutiliza_el_trabajo_en_curso_de_otro_usuario(self):
+        otro = User.objects.create_user('contador', password='clave-segura-123')
+        ajeno = TrabajoExportacion.objects.create(tipo='GRANJA', clave=calcular_clave('GRANJA', {}), usuario=otro)
+
+        respuesta = self.encolar()
+        self.assertNotEqual(respuesta.json()['trabajo'], ajeno.id)
+        self.assertEqual(self.client.get(respuesta.json()['url_estado']).json()['estado'], 'LISTO')
+
+    def test_trabajo_colgado_se_vence_y_se_vuelve_a_encolar(self):
+        gerente = User.objects.get(username='gerente')
+        colgado = TrabajoExportacion.objects.create(
+            tipo='GRANJA', clave=calcular_clave('GRANJA', {}), usuario=gerente, estado='PROCESANDO',
+        )
+        TrabajoExportacion.objects.filter(id=colgado.id).update(created_at=timezone.now() - timedelta(hours=2))
+
+        respuesta = self.encolar()
+        self.assertNotEqual(respuesta.json()['trabajo'], colgado.id)
+        colgado.refresh_from_db()
+        self.assertEqual(colgado.estado, 'ERROR')
+
+    def test_limpieza_borra_archivos_y_trabajos_viejos(self):
+        reciente = TrabajoExportacion.objects.get(id=self.encolar().json()['trabajo'])
+        viejo = os.path.join(self.carpeta, 'viejo.xlsx')
+        abandonado = os.path.join(self.carpeta, 'abandonado.xlsx.tmp')
+        hace_dos_dias = time.time() - 48 * 3600
+        for ruta in (viejo, abandonado):
+            with open(ruta, 'wb') as archivo:
+                archivo.write(b'x')
+            os.utime(ruta, (hace_dos_dias, hace_dos_dias))
+        terminado = TrabajoExportacion.objects.create(tipo='GRANJA', clave='vieja', estado='LISTO')
+        TrabajoExportacion.objects.filter(id=terminado.id).update(terminado_at=timezone.now() - timedelta(days=2))
+
+        call_command('limpiar_exportaciones', stdout=io.StringIO())
+
+        self.assertEqual(os.listdir(self.carpeta), [f'{reciente.clave}.xlsx'])
+        self.assertEqual(list(TrabajoExportacion.objects.values_list('id', flat=True)), [reciente.id])
+
+    def test_archivo_en_cache_se_renueva_al_reutilizarlo(self):
+        primero = TrabajoExportacion.objects.get(id=self.encolar().json()['trabajo'])
+        ruta = os.path.join(self.carpeta, f'{primero.clave}.xlsx')
+        hace_dos_dias = time.time() - 48 * 3600
+        os.utime(ruta, (hace_dos_dias, hace_dos_dias))
+
+        self.encolar()
+        call_command('limpiar_exportaciones', stdout=io.StringIO())
+        self.assertTrue(os.path.exists(ruta))
+
+    def test_descarga_sin_archivo_vuelve_a_encolar(self):
+        estado = self.client.get(self.encolar().json()['url_estado']).json()
+        for nombre in os.listdir(self.carpeta):
+            os.remove(os.path.join(self.carpeta, nombre))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            respuesta = self.client.get(estado['url_descarga'])
+        self.assertEqual(respuesta.status_code, 409)
+
+        estado = self.client.get(respuesta.json()['url_estado']).json()
+        self.assertEqual(estado['estado'], 'LISTO')
+        self.assertEqual(self.client.get(estado['url_descarga']).status_code, 200)
+
+    def test_botones_del_dashboard_usan_la_cola(self):
+        respuesta = self.client.get(reverse('dashboard'))
+        self.assertContains(respuesta, f'data-exportar="{reverse("exportar_segundo_plano", args=["granja"])}"')
+        self.assertContains(respuesta, f'data-exportar="{reverse("exportar_segundo_plano", args=["algas"])}"')
+
+
+class GuardarLoteTests(TestCase):
+
+    def setUp(self):
+        self.producto = Producto.objects.create(
+            nombre="Alga Seca", categoria='MP_ALGA_DESHIDRATADA', capacidad_maxima_diaria=100, stock_actual=5,
+        )
+        self.lote = LoteAves.objects.create(
+            nombre="Nave 1", tipo_dieta='ALGAS', cantidad_aves_inicial=100, fecha_inicio='2025-01-01',
+        )
+
+    def enviar(self, reportes):
+        return self.client.post(reverse('api_guardar_lote'), json.dumps({'reportes': reportes}), content_type='application/json')
+
+    def test_guarda_reportes_mezclados(self):
+        reportes = [
+            {'tipo': 'ALGAS', 'producto_id': self.producto.id, 'cantidad': '10', 'responsable': 'Ana', 'fecha_registro': '2025-03-01', 'temp_id': 1},
+            {'tipo': 'ALGAS', 'producto_id': self.producto.id, 'cantidad': '2.5', 'responsable': 'Ana', 'fecha_registro': '2025-03-01', 'temp_id': 2},
+            {'tipo': 'GRANJA', 'lote_id': self.lote.id, 'huevos': '80', 'alimento': '12', 'mortalidad': '', 'responsable': 'Luis', 'fecha_registro': '2025-03-01', 'temp_id': 3},
+        ]
+        respuesta = self.enviar(reportes)
+
+        self.assertEqual(respuesta.json()['status'], 'ok')
+        self.assertEqual([r['temp_id'] for r in respuesta.json()['resultados']], [1, 2, 3])
+        self.assertEqual(ReporteProduccion.objects.count(), 2)
+        self.assertEqual(ReporteDiarioAves.objects.get().observaciones, "Rep. por Luis (Offline)")
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.stock_actual, Decimal('17.50'))
+        self.assertEqual(ResumenDiarioProduccion.objects.get().cantidad_reportes, 2)
+
+    def test_resultado_por_item_con_errores(self):
+        reportes = [
+            {'tipo': 'ALGAS', 'producto_id': 9999, 'cantidad': '10', 'responsable': 'Ana'},
+            {'tipo': 'ALGAS', 'producto_id': self.producto.id, 'cantidad': '-3', 'responsable': 'Ana'},
+            {'tipo': 'GRANJA', 'lote_id': self.lote.id, 'huevos': '50', 'alimento': '5', 'responsable': 'Luis'},
+        ]
+        respuesta = self.enviar(reportes).json()
+
+        self.assertEqual(respuesta['status'], 'parcial')
+        self.assertEqual([r['status'] for r in respuesta['resultados']], ['error', 'error', 'ok'])
+        self.assertEqual(ReporteProduccion.objects.count(), 0)
+        self.assertEqual(ReporteDiarioAves.objects.count(), 1)
+
+    def test_consultas_constantes(self):
+        reportes = [
+            {'tipo': 'ALGAS', 'producto_id': self.producto.id, 'cantidad': '1', 'responsable': 'Ana', 'fecha_registro': '2025-03-01'}
+            for _ in range(50)
+        ]
+        with CaptureQueriesContext(connection) as ctx:
+            self.enviar(reportes)
+        self.assertLess(len(ctx.captured_queries), 15)
+        self.assertEqual(ReporteProduccion.objects.count(), 50)
+
+
+class IdempotenciaTests(TestCase):
+
+    def setUp(self):
+        self.producto = Producto.objects.create(
+            nombre="Alga Seca", categoria='MP_ALGA_DESHIDRATADA', capacidad_maxima_diaria=100,
+        )
+        self.lote = LoteAves.objects.create(
+            nombre="Nave 1", tipo_dieta='ALGAS', cantidad_aves_inicial=100, fecha_inicio='2025-01-01',
+        )
+
+    def post(self, url, datos):
+        return self.client.post(url, json.dumps(datos), content_type='application/json').json()
+
+    def test_reenvio_de_produccion_no_duplica_ni_suma_stock(self):
+        datos = {'producto_id': self.producto.id, 'cantidad': '10', 'responsable': 'Ana', 'temp_id': 'cel-1-1700000000000'}
+        self.post(reverse('api_guardar_prod'), datos)
+        segunda = self.post(reverse('api_guardar_prod'), datos)
+
+        self.assertEqual(segunda['status'], 'ok')
+        self.assertTrue(segunda['duplicado'])
+        self.assertEqual(ReporteProduccion.objects.count(), 1)
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.stock_actual, Decimal('10.00'))
+
+    def test_reenvio_de_granja_no_duplica(self):
+        datos = {'lote_id': self.lote.id, 'huevos': 80, 'alimento': '5', 'responsable': 'Luis', 'temp_id': 'cel-1-1'}
+        self.post(reverse('api_guardar_aves'), datos)
+        self.post(reverse('api_guardar_aves'), datos)
+        self.assertEqual(ReporteDiarioAves.objects.count(), 1)
+        self.assertEqual(ResumenDiarioLote.objects.get().cantidad_reportes, 1)
+
+    def test_lote_ignora_temp_id_ya_guardados_y_repetidos(self):
+        self.post(reverse('api_guardar_prod'), {'producto_id': self.producto.id, 'cantidad': '10', 'responsable': 'Ana', 'temp_id': 'a'})
+        reporte = {'tipo': 'ALGAS', 'producto_id': self.producto.id, 'cantidad': '5', 'responsable': 'Ana'}
+        respuesta = self.post(reverse('api_guardar_lote'), {'reportes': [
+            dict(reporte, temp_id='a'), dict(reporte, temp_id='b'), dict(reporte, temp_id='b'),
+        ]})
+
+        self.assertEqual([r.get('duplicado', False) for r in respuesta['resultados']], [True, False, True])
+        self.assertEqual(ReporteProduccion.objects.count(), 2)
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.stock_actual, Decimal('15.00'))
+
+    def test_datos_invalidos_no_se_responden_como_duplicado(self):
+        malos = [
+            (reverse('api_guardar_aves'), {'lote_id': self.lote.id, 'huevos': -5, 'alimento': '5', 'temp_id': 'x1'}),
+            (reverse('api_guardar_prod'), {'producto_id': self.producto.id, 'cantidad': '10', 'temp_id': 'x2'}),
+        ]
+        for url, datos in malos:
+            respuesta = self.client.post(url, json.dumps(datos), content_type='application/json')
+            self.assertEqual(respuesta.status_code, 400)
+            self.assertNotIn('duplicado', respuesta.json())
+        self.assertFalse(ReporteDiarioAves.objects.exists())
+        self.assertFalse(ReporteProduccion.objects.exists())
+
+    def test_integrity_error_sin_temp_id_guardado_no_es_duplicado(self):
+        datos = {'producto_id': self.producto.id, 'cantidad': '10', 'responsable': 'Ana', 'temp_id': 'x3'}
+        with mock.patch.object(ReporteProduccion.objects, 'bulk_create', side_effect=IntegrityError('NOT NULL')):
+            respuesta = self.client.post(reverse('api_guardar_prod'), json.dumps(datos), content_type='application/json')
+        self.assertEqual(respuesta.status_code, 500)
+        self.assertNotIn('duplicado', respuesta.json())
+
+
+class StockConcurrenteTests(TransactionTestCase):
+    """Varios trabajadores sincronizando a la vez sobre el MISMO producto."""
+
+    HILOS = 8
+    ENVIOS_POR_HILO = 5
+
+    def test_envios_en_paralelo_no_pierden_stock(self):
+        producto = Producto.objects.create(
+            nombre="Alga Seca", categoria='MP_ALGA_DESHIDRATADA', capacidad_maxima_diaria=100,
+        )
+        barrera = threading.Barrier(self.HILOS)
+        guardados = []
+
+        def trabajador(numero):
+            cliente = Client()
+            barrera.wait()  # Todos arrancan juntos
+            try:
+                for envio in range(self.ENVIOS_POR_HILO):
+                    datos = json.dumps({
+                        'producto_id': producto.id, 'cantidad': '1.25', 'responsable': f'T{numero}',
+                        'temp_id': f'hilo-{numero}-{envio}',
+                    })
+                    # SQLite puede responder "database is locked": reintentamos como haría app.js
+                    for _ in range(20):
+                        respuesta = cliente.post(reverse('api_guardar_prod'), datos, content_type='application/json')
+                        if respuesta.status_code == 200:
+                            guardados.append(respuesta.json())
+                            break
+            finally:
+                connections.close_all()
+
+        hilos = [threading.Thread(target=trabajador, args=(n,)) for n in range(self.HILOS)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        producto.refresh_from_db()
+        reportes = ReporteProduccion.objects.filter(producto=producto).count()
+        self.assertEqual(reportes, self.HILOS * self.ENVIOS_POR_HILO)
+        self.assertEqual(producto.stock_actual, Decimal('1.25') * reportes)
+
+
+class LibroStockTests(TestCase):
+
+    def setUp(self):
+        self.producto = Producto.objects.create(
+            nombre="Alga Seca", categoria='MP_ALGA_DESHIDRATADA', capacidad_maxima_diaria=100,
+        )
+
+    def mover(self, fecha, cantidad, tipo='PRODUCCION'):
+        registrar_movimientos([MovimientoStock(producto=self.producto, tipo=tipo, cantidad=cantidad, fecha=fecha)])
+
+    def producir(self, fecha, cantidad):
+        # Como la ingesta: el reporte (que llena su resumen diario) y su movimiento de entrada
+        reporte = ReporteProduccion.objects.create(
+            producto=self.producto, cantidad_producida=cantidad, responsable='Ana', fecha_registro=fecha,
+        )
+        registrar_movimientos([movimiento_de_produccion(reporte)])
+
+    def test_stock_actual_es_la_suma_del_libro(self):
+        self.mover('2025-01-01', 50)
+        self.mover('2025-01-02', -20, tipo='DESPACHO')
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.stock_actual, Decimal('30.00'))
+
+    def test_saldo_historico_con_snapshots(self):
+        self.mover('2025-01-01', 50)
+        self.mover('2025-01-03', 10)
+        self.mover('2025-01-05', -15, tipo='DESPACHO')
+        self.assertEqual(compactar_snapshots(hasta=parse_date('2025-01-04')), 2)
+
+        self.assertEqual(saldo_en_fecha(self.producto.id, parse_date('2025-01-02')), Decimal('50'))
+        self.assertEqual(saldo_en_fecha(self.producto.id, parse_date('2025-01-04')), Decimal('60'))
+        self.assertEqual(saldo_en_fecha(self.producto.id, parse_date('2025-01-05')), Decimal('45'))
+
+    def test_movimiento_con_fecha_pasada_invalida_snapshots(self):
+        self.mover('2025-01-01', 50)
+        self.mover('2025-01-03', 10)
+        compactar_snapshots(hasta=parse_date('2025-01-03'))
+
+        self.mover('2025-01-02', 5)  # Reporte offline que llegó tarde
+
+        self.assertEqual(SnapshotStock.objects.count(), 1)
+        self.assertEqual(saldo_en_fecha(self.producto.id, parse_date('2025-01-03')), Decimal('65'))
+
+    def test_proyeccion_sigue_la_tendencia_real(self):
+        hoy = timezone.localdate()
+        self.producir(hoy - timedelta(days=1), 70)
+        self.mover(hoy, -10, tipo='DESPACHO')
+        self.producto.refresh_from_db()
+
+        proyeccion = proyeccion_por_tendencia([self.producto], 7)
+        self.assertEqual(proyeccion[self.producto.id], Decimal('120'))
+
+    def test_proyeccion_ignora_los_ajustes(self):
+        hoy = timezone.localdate()
+        self.producir(hoy - timedelta(days=1), 70)
+        self.mover(hoy, 500, tipo='AJUSTE')  # Conteo de bodega corregido: no es tendencia
+        self.producto.refresh_from_db()
+
+        proyeccion = proyeccion_por_tendencia([self.producto], 7)
+        self.assertEqual(proyeccion[self.producto.id], Decimal('640'))
+
+    def test_api_produccion_deja_movimiento(self):
+        self.client.post(reverse('api_guardar_prod'), json.dumps({
+            'producto_id': self.producto.id, 'cantidad': '8', 'responsable': 'Ana', 'fecha_registro': '2025-03-01',
+        }), content_type='application/json')
+        movimiento = MovimientoStock.objects.get()
+        self.assertEqual((movimiento.tipo, movimiento.cantidad), ('PRODUCCION', Decimal('8.00')))
+        self.assertIsNotNone(movimiento.reporte)
+
+    def test_editar_stock_a_mano_queda_como_ajuste(self):
+        self.client.force_login(User.objects.create_user('gerente', password='clave-segura-123', is_staff=True))
+        self.client.post(reverse('editar_producto', args=[self.producto.id]), {
+            'nombre': "Alga Seca", 'categoria': 'MP_ALGA_DESHIDRATADA',
+            'stock_actual': '25', 'capacidad_maxima_diaria': '100',
+        })
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.stock_actual, Decimal('25.00'))
+        self.assertEqual(MovimientoStock.objects.get().tipo, 'AJUSTE')
+
+    def test_editar_producto_no_pisa_stock_que_llega_mientras_tanto(self):
+        self.client.force_login(User.objects.create_user('gerente', password='clave-segura-123', is_staff=True))
+        validar = ProductoForm.is_valid
+
+        def llega_un_reporte(form):
+            # Otro request suma producción entre la lectura del producto y el guardado
+            self.mover('2025-03-01', 8)
+            return validar(form)
+
+        with mock.patch.object(ProductoForm, 'is_valid', autospec=True, side_effect=llega_un_reporte):
+            self.client.post(reverse('editar_producto', args=[self.producto.id]), {
+                'nombre': "Alga Seca Premium", 'categoria': 'MP_ALGA_DESHIDRATADA',
+                'stock_actual': '0', 'capacidad_maxima_diaria': '100',
+            })
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.nombre, "Alga Seca Premium")
+        self.assertEqual(self.producto.stock_actual, Decimal('8.00'))
+
+    def test_admin_no_edita_el_stock(self):
+        self.mover('2025-01-01', 50)
+        self.client.force_login(User.objects.create_superuser('admin', password='clave-segura-123'))
+        self.client.post(reverse('admin:core_producto_change', args=[self.producto.id]), {
+            'nombre': "Alga Seca Premium", 'categoria': 'MP_ALGA_DESHIDRATADA',
+            'stock_actual': '999', 'capacidad_maxima_diaria': '100',
+        })
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.nombre, "Alga Seca Premium")
+        self.assertEqual(self.producto.stock_actual, Decimal('50.00'))
+        # Las tablas derivadas no se pueden tocar desde el admin
+        for modelo in (SnapshotStock, CambioCatalogo, ResumenDiarioLote, ResumenDiarioProduccion):
+            self.assertNotIn(modelo, admin_site._registry)
+
+
+class CacheDashboardTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.gerente = User.objects.create_user('gerente', password='clave-segura-123', is_staff=True)
+        self.client.force_login(self.gerente)
+        self.producto = Producto.objects.create(
+            nombre="Alga Seca", categoria='MP_ALGA_DESHIDRATADA', capacidad_maxima_diaria=100,
+        )
+
+    def ver_dashboard(self, dias=30):
+        return self.client.get(reverse('dashboard'), {'dias': dias})
+
+    def estadisticas(self):
+        return self.client.get(reverse('estadisticas_cache')).json()
+
+    def test_segunda_visita_sale_de_la_cache(self):
+        self.ver_dashboard()
+        with CaptureQueriesContext(connection) as ctx:
+            respuesta = self.ver_dashboard()
+        tablas_de_datos = [q['sql'] for q in ctx.captured_queries if 'core_' in q['sql']]
+        self.assertEqual(tablas_de_datos, [])
+        self.assertEqual(respuesta.context['nombres_prod'], ["Alga Seca"])
+        self.assertEqual(self.estadisticas()['aciertos'], 1)
+        self.assertEqual(self.estadisticas()['fallos'], 1)
+
+    def test_cada_periodo_tiene_su_entrada(self):
+        self.ver_dashboard(7)
+        self.ver_dashboard(30)
+        self.assertEqual(self.estadisticas()['fallos'], 2)
+
+    def test_escribir_un_reporte_invalida(self):
+        self.ver_dashboard()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('api_guardar_prod'), json.dumps({
+                'producto_id': self.producto.id, 'cantidad': '8', 'responsable': 'Ana',
+            }), content_type='application/json')
+        respuesta = self.ver_dashboard()
+        self.assertEqual(respuesta.context['stock_prod'], [8.0])
+        self.assertEqual(self.estadisticas()['fallos'], 2)
+
+    def test_guardado_en_lote_invalida(self):
+        self.ver_dashboard()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('api_guardar_lote'), json.dumps({'reportes': [
+                {'tipo': 'ALGAS', 'producto_id': self.producto.id, 'cantidad': '3', 'responsable': 'Ana'},
+            ]}), content_type='application/json')
+        self.assertEqual(self.ver_dashboard().context['stock_prod'], [3.0])
+
+    def test_estadisticas_solo_para_gerencia(self):
+        self.client.force_login(User.objects.create_user('trabajador', password='clave-segura-123'))
+        self.assertEqual(self.client.get(reverse('estadisticas_cache')).status_code, 403)
+
+
+# Tablas que crecen con cada reporte: ninguna consulta frecuente debe recorrerlas enteras
+TABLAS_GRANDES = (
+    'core_reporteproduccion', 'core_reportediarioaves',
+    'core_resumendiariolote', 'core_resumendiarioproduccion', 'core_movimientostock',
+)
+
+
+class PlanesDeConsultaTests(TestCase):
+    """
+    Corre EXPLAIN sobre las consultas reales del dashboard y de las exportaciones
+    y falla si alguna cae a un recorrido completo de una tabla grande.
+    SQLite: EXPLAIN QUERY PLAN. PostgreSQL: EXPLAIN con enable_seqscan = off.
+    """
+
+    def setUp(self):
+        self.producto = Producto.objects.create(nombre="Alga Seca", categoria='MP_ALGA_DESHIDRATADA', capacidad_maxima_diaria=100)
+        crear_lotes(2, 'ALGAS')
+        crear_lotes(1, 'CONTROL')
+        with self.captureOnCommitCallbacks(execute=True):
+            for d in range(3):
+                self.client.post(reverse('api_guardar_prod'), json.dumps({
+                    'producto_id': self.producto.id, 'cantidad': '5', 'responsable': 'Ana',
+                    'fecha_registro': (timezone.now().date() - timedelta(days=d)).isoformat(),
+                }), content_type='application/json')
+        self.filtros = {'desde': (timezone.now().date() - timedelta(days=30)).isoformat()}
+
+    def planes(self, funcion):
+        """Ejecuta 'funcion' y devuelve {sql: [líneas del plan]} de cada SELECT sobre tablas grandes."""
+        with CaptureQueriesContext(connection) as consultas:
+            funcion()
+        planes = {}
+        for consulta in consultas.captured_queries:
+            sql = consulta['sql']
+            if sql.lstrip().upper().startswith('SELECT') and any(t in sql for t in TABLAS_GRANDES):
+                planes[sql] = self.explicar(sql)
+        self.assertTrue(planes, "No se capturó ninguna consulta sobre tablas grandes")
+        return planes
+
+    def explicar(self, sql):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                return [fila[-1] for fila in cursor.fetchall()]
+            if connection.vendor == 'postgresql':
+                with transaction.atomic():
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+                    cursor.execute('EXPLAIN ' + sql)
+                    return [fila[0] for fila in cursor.fetchall()]
+        self.skipTest(f"EXPLAIN no soportado para {connection.vendor}")
+
+    def recorridos_completos(self, plan):
+        """Líneas del plan que leen una tabla grande entera, sin pasar por un índice."""
+        malas = []
+        for linea in plan:
+            for tabla in TABLAS_GRANDES:
+                if connection.vendor == 'sqlite' and linea.startswith(f'SCAN {tabla}') and ' USING ' not in linea:
+                    malas.append(linea)
+                if connection.vendor == 'postgresql' and f'Seq Scan on {tabla}' in linea:
+                    malas.append(linea)
+        return malas
+
+    def assertSinRecorridosCompletos(self, planes):
+        for sql, plan in planes.items():
+            self.assertEqual(self.recorridos_completos(plan), [], f"{sql}\n{plan}")
+
+    def assertBusquedaPorIndice(self, planes):
+        """Consultas filtradas: en SQLite cada tabla grande debe leerse con SEARCH (no SCAN)."""
+        self.assertSinRecorridosCompletos(planes)
+        if connection.vendor != 'sqlite':
+            return
+        for sql, plan in planes.items():
+            for linea in plan:
+                if any(linea.startswith(f'SCAN {t}') for t in TABLAS_GRANDES):
+                    self.fail(f"Se recorre el índice entero en vez de buscar:\n{sql}\n{plan}")
+
+    def test_dashboard(self):
+        self.assertSinRecorridosCompletos(self.planes(lambda: calcular_datos_dashboard(30)))
+
+    def test_rendimiento_por_dieta_busca_por_fecha(self):
+        desde = timezone.now().date() - timedelta(days=7)
+        self.assertBusquedaPorIndice(self.planes(lambda: rendimiento_por_dieta(desde)))
+
+    def test_excel_filtrado(self):
+        filtros = dict(self.filtros, producto=str(self.producto.id))
+        self.assertBusquedaPorIndice(self.planes(
+            lambda: escribir_excel_algas(io.BytesIO(), filtrar_produccion(filtros))
+        ))
+        lote = LoteAves.objects.first()
+        filtros = dict(self.filtros, lote=str(lote.id))
+        self.assertBusquedaPorIndice(self.planes(
+            lambda: escribir_excel_granja(io.BytesIO(), filtrar_granja(filtros))
+        ))
+
+    def test_csv_filtrado(self):
+        self.assertBusquedaPorIndice(self.planes(
+            lambda: list(filas_csv_produccion(filtrar_produccion(self.filtros)))
+        ))
+        self.assertBusquedaPorIndice(self.planes(
+            lambda: list(filas_csv_granja(filtrar_granja(self.filtros)))
+        ))
+
+    def test_marca_de_agua_de_exportacion(self):
+        self.assertBusquedaPorIndice(self.planes(lambda: calcular_clave('ALGAS', self.filtros)))
+
+
+class CurvasDePosturaTests(TestCase):
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('gerente', password='clave-segura-123', is_staff=True))
+        self.lote = LoteAves.objects.create(
+            nombre="Nave 1", tipo_dieta='ALGAS', cantidad_aves_inicial=100, fecha_inicio=parse_date('2024-12-01'),
+        )
+        # Del lunes 30/12/2024 al domingo 19/01/2025: 80 huevos, 2 rotos, 10 kg y 1 muerte por día
+        inicio = parse_date('2024-12-30')
+        ResumenDiarioLote.objects.bulk_create([
+            ResumenDiarioLote(
+                lote=self.lote, fecha=inicio + timedelta(days=d), huevos_recolectados=80, huevos_rotos=2,
+                alimento_consumido_kg=10, mortalidad=1, cantidad_reportes=1,
+            )
+            for d in range(21)
+        ])
+
+    def pedir(self, **params):
+        return self.client.get(reverse('api_curvas_postura'), params)
+
+    def test_serie_semanal(self):
+        datos = self.pedir(desde='2025-01-06', hasta='2025-01-19', granularidad='semana').json()
+
+        self.assertEqual(datos['granularidad'], 'semana')
+        self.assertFalse(datos['submuestreado'])
+        serie = datos['lotes'][0]['serie']
+        self.assertEqual([p['periodo'] for p in serie], ['2025-01-06', '2025-01-13'])
+        self.assertEqual(serie[0]['huevos'], 7 * 80)
+        self.assertEqual(serie[0]['tasa_postura'], 80.0)
+        self.assertEqual(serie[0]['kg_por_docena'], 1.5)
+        self.assertEqual(serie[0]['proporcion_rotos'], 2.5)
+        self.assertEqual(serie[0]['mortalidad'], 7)
+        # El acumulado incluye la semana anterior a 'desde'
+        self.assertEqual(serie[0]['mortalidad_acumulada'], 14)
+        self.assertEqual(serie[1]['mortalidad_acumulada'], 21)
+        self.assertEqual(serie[1]['mortalidad_acumulada_pct'], 21.0)
+
+    def test_submuestrea_rangos_largos(self):
+        datos = self.pedir(desde='2024-12-30', hasta='2025-01-19', granularidad='dia', max_puntos=5).json()
+        self.assertEqual(datos['granularidad'], 'semana')
+        self.assertTrue(datos['submuestreado'])
+        self.assertEqual(len(datos['lotes'][0]['serie']), 3)
+
+    def test_paginacion_por_lotes(self):
+        for i in range(3):
+            LoteAves.objects.create(
+                nombre=f"Extra {i}", tipo_dieta='CONTROL', cantidad_aves_inicial=50, fecha_inicio=parse_date('2025-01-01'),
+            )
+        datos = self.pedir(por_pagina=3, pagina=2).json()
+        self.assertEqual(datos['total_lotes'], 4)
+        self.assertEqual(datos['paginas'], 2)
+        self.assertEqual([l['nombre'] for l in datos['lotes']], ["Extra 2"])
+
+    def test_consultas_constantes(self):
+        for i in range(5):
+            LoteAves.objects.create(
+                nombre=f"Extra {i}", tipo_dieta='CONTROL', cantidad_aves_inicial=50, fecha_inicio=parse_date('2025-01-01'),
+            )
+        with CaptureQueriesContext(connection) as ctx:
+            self.pedir(desde='2024-12-30', hasta='2025-01-19')
+        series = [q for q in ctx.captured_queries if 'core_resumendiariolote' in q['sql']]
+        self.assertEqual(len(series), 1)
+
+    def test_parametros_invalidos(self):
+        self.assertEqual(self.pedir(granularidad='hora').status_code, 400)
+        self.assertEqual(self.pedir(desde='2025-02-01', hasta='2025-01-01').status_code, 400)
+
+    def test_trabajadores_no_tienen_acceso(self):
+        trabajador = User.objects.create_user('trabajador', password='clave-segura-123')
+        trabajador.groups.create(name='Trabajadores')
+        self.client.force_login(trabajador)
+        self.assertEqual(self.pedir().status_code, 403)
+
+
+class EstadisticasEnsayoTests(TestCase):
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('gerente', password='clave-segura-123', is_staff=True))
+
+    def test_distribucion_t(self):
+        self.assertAlmostEqual(cola_t(2.0, 10), 0.036694, places=5)
+        self.assertAlmostEqual(cola_t(0.0, 5), 0.5)
+
+    def test_compara_dietas_por_lote(self):
+        crear_lotes(1, 'ALGAS', huevos=90)
+        crear_lotes(1, 'ALGAS', huevos=92)
+        crear_lotes(1, 'CONTROL', huevos=80)
+        crear_lotes(1, 'CONTROL', huevos=82)
+
+        resultado = analizar_ensayo()
+
+        algas = resultado['dietas']['ALGAS']
+        self.assertEqual(algas['lotes'], 2)
+        self.assertEqual(algas['dias_lote'], 6)
+        self.assertEqual(algas['media'], 91.0)
+        self.assertEqual(algas['varianza'], 2.0)
+        self.assertEqual(algas['ic'], [78.29, 103.71])  # t(0.975, 1 gl) = 12.706
+        # t de Welch: diferencia 10, error sqrt(1 + 1), 2 grados de libertad
+        self.assertEqual(resultado['prueba']['t'], 7.0711)
+        self.assertEqual(resultado['prueba']['grados_libertad'], 2.0)
+        self.assertAlmostEqual(resultado['prueba']['p_valor'], 0.019419, places=5)
+        self.assertEqual(resultado['ganador'], 'ALGAS')
+
+    def test_sin_diferencia_no_hay_ganador(self):
+        crear_lotes(1, 'ALGAS', huevos=80)
+        crear_lotes(1, 'ALGAS', huevos=90)
+        crear_lotes(1, 'CONTROL', huevos=81)
+        crear_lotes(1, 'CONTROL', huevos=89)
+        self.assertIsNone(analizar_ensayo()['ganador'])
+
+    def test_promedio_movil(self):
+        crear_lotes(1, 'ALGAS', huevos=90, dias=3)
+        serie = analizar_ensayo(ventana=2)['promedio_movil']
+        self.assertEqual(len(serie['fechas']), 3)
+        self.assertEqual(serie['ALGAS'], [90.0, 90.0, 90.0])
+        self.assertEqual(serie['CONTROL'], [None, None, None])
+
+    def test_consultas_constantes(self):
+        crear_lotes(20, 'ALGAS')
+        crear_lotes(20, 'CONTROL')
+        with CaptureQueriesContext(connection) as ctx:
+            respuesta = self.client.get(reverse('api_estadisticas_ensayo'))
+        self.assertEqual(respuesta.json()['dietas']['ALGAS']['lotes'], 20)
+        self.assertEqual(len([q for q in ctx.captured_queries if 'core_' in q['sql']]), 3)
+
+    def test_parametros_invalidos(self):
+        respuesta = self.client.get(reverse('api_estadisticas_ensayo'), {'desde': '31-12-2025'})
+        self.assertEqual(respuesta.status_code, 400)
+
+
+class GraficosDashboardTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(User.objects.create_user('gerente', password='clave-segura-123', is_staff=True))
+        self.producto = Producto.objects.create(
+            nombre="Alga Seca", categoria='MP_ALGA_DESHIDRATADA', capacidad_maxima_diaria=100,
+        )
+        self.url = reverse('api_graficos_dashboard')
+
+    def guardar_reporte(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('api_guardar_prod'), json.dumps({
+                'producto_id': self.producto.id, 'cantidad': '8', 'responsable': 'Ana',
+            }), content_type='application/json')
+
+    def test_datos_con_etag(self):
+        respuesta = self.client.get(self.url, {'dias': 7})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertTrue(respuesta.has_header('ETag'))
+        self.assertTrue(respuesta.has_header('Last-Modified'))
+        self.assertIn('no-cache', respuesta['Cache-Control'])
+        datos = respuesta.json()
+        self.assertEqual(datos['productos']['nombres'], ["Alga Seca"])
+        self.assertEqual(datos['rendimiento'], {'ALGAS': 0, 'CONTROL': 0})
+
+    def test_revalidacion_responde_304(self):
+        etag = self.client.get(self.url)['ETag']
+        with CaptureQueriesContext(connection) as ctx:
+            respuesta = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 304)
+        self.assertEqual(respuesta.content, b'')
+        # Solo las búsquedas del último reporte de cada tabla, sin recalcular nada
+        self.assertEqual(len([q for q in ctx.captured_queries if 'core_' in q['sql']]), 3)
+
+    def test_reporte_nuevo_cambia_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        self.guardar_reporte()
+        respuesta = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotEqual(respuesta['ETag'], etag)
+        self.assertEqual(respuesta.json()['productos']['stock'], [8.0])
+
+    def test_cada_periodo_tiene_su_etag(self):
+        self.assertNotEqual(self.client.get(self.url, {'dias': 7})['ETag'], self.client.get(self.url, {'dias': 30})['ETag'])
+
+    def test_dashboard_pide_los_graficos_aparte(self):
+        respuesta = self.client.get(reverse('dashboard'), {'dias': 7})
+        self.assertContains(respuesta, f"{self.url}?dias=7")
+        self.assertNotContains(respuesta, "const stockProductos")
+
+
+class CatalogoSincronizacionTests(TestCase):
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('trabajador', password='clave-segura-123'))
+        # Los cambios se registran al confirmar la transacción (ver registrar_cambio)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.producto = Producto.objects.create(
+                nombre="Alga Seca", categoria='MP_ALGA_DESHIDRATADA', capacidad_maxima_diaria=100,
+            )
+            self.otro = Producto.objects.create(
+                nombre="Bioestimulante", categoria='PT_BIOESTIMULANTE', capacidad_maxima_diaria=50,
+            )
+            self.lote = LoteAves.objects.create(
+                nombre="Nave 1", tipo_dieta='ALGAS', cantidad_aves_inicial=100, fecha_inicio=parse_date('2025-01-01'),
+            )
+
+    def cambios(self, cursor=0):
+        return self.client.get(reverse('api_catalogo_cambios'), {'cursor': cursor}).json()
+
+    def test_primera_sincronizacion_trae_todo(self):
+        LoteAves.objects.create(
+            nombre="Nave vieja", tipo_dieta='CONTROL', cantidad_aves_inicial=10,
+            fecha_inicio=parse_date('2024-01-01'), activo=False,
+        )
+        datos = self.cambios()
+        self.assertTrue(datos['completo'])
+        self.assertEqual(datos['version'], 1)
+        self.assertEqual([p['nombre'] for p in datos['productos']], ["Alga Seca", "Bioestimulante"])
+        self.assertEqual(datos['lotes'], [{'id': self.lote.id, 'nombre': "Nave 1", 'dieta': 'Experimental (Base Algas)'}])
+
+    def test_solo_lo_cambiado_desde_el_cursor(self):
+        cursor = self.cambios()['cursor']
+        self.assertEqual(self.cambios(cursor)['productos'], [])
+
+        self.otro.nombre = "Bioestimulante 1L"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.otro.save()
+        datos = self.cambios(cursor)
+        self.assertFalse(datos['completo'])
+        self.assertEqual([p['nombre'] for p in datos['productos']], ["Bioestimulante 1L"])
+        self.assertEqual(datos['lotes'], [])
+        self.assertGreater(datos['cursor'], cursor)
+        self.assertEqual(self.cambios(datos['cursor'])['productos'], [])
+
+    def test_borrados_y_lotes_desactivados(self):
+        cursor = self.cambios()['cursor']
+        producto_id = self.producto.id
+        with self.captureOnCommitCallbacks(execute=True):
+            self.producto.delete()
+            self.lote.activo = False
+            self.lote.save()
+
+        datos = self.cambios(cursor)
+        self.assertEqual(datos['borrados'], {'productos': [producto_id], 'lotes': [self.lote.id]})
+        self.assertEqual(datos['productos'], [])
+        self.assertEqual(datos['lotes'], [])
+
+    def test_una_fila_por_objeto(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(5):
+                self.producto.nombre = f"Alga Seca {i}"
+                self.producto.save()
+        self.assertEqual(CambioCatalogo.objects.filter(modelo='PRODUCTO', objeto_id=self.producto.id).count(), 1)
+
+    def test_el_cambio_se_registra_al_confirmar(self):
+        cursor = self.cambios()['cursor']
+        with self.captureOnCommitCallbacks() as pendientes:
+            self.otro.nombre = "Bioestimulante 1L"
+            self.otro.save()
+            # Todavía sin confirmar: ningún cursor nuevo que otro cambio pueda saltarse
+            self.assertEqual(self.cambios(cursor)['cursor'], cursor)
+        for registrar in pendientes:
+            registrar()
+        self.assertEqual([p['nombre'] for p in self.cambios(cursor)['productos']], ["Bioestimulante 1L"])
+
+    def test_cambio_revertido_no_se_registra(self):
+        cursor = self.cambios()['cursor']
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(IntegrityError), transaction.atomic():
+                self.otro.nombre = "Bioestimulante 1L"
+                self.otro.save()
+                raise IntegrityError("se revierte")
+        self.assertEqual(self.cambios(cursor)['cursor'], cursor)
+
+    def test_cursor_desconocido_pide_todo(self):
+        datos = self.cambios(10 ** 9)
+        self.assertTrue(datos['completo'])
+        self.assertEqual(len(datos['productos']), 2)
+
+    def test_cursor_invalido(self):
+        self.assertEqual(self.client.get(reverse('api_catalogo_cambios'), {'cursor': 'abc'}).status_code, 400)
+
+
+class PrecacheServiceWorkerTests(TestCase):
+
+    def precache(self):
+        contenido = self.client.get(reverse('service_worker')).content.decode()
+        primera, _, resto = contenido.partition('\n')
+        self.assertTrue(primera.startswith('self.__PRECACHE = '))
+        self.assertIn('const RUTAS = [', resto)
+        return json.loads(primera[len('self.__PRECACHE = '):-1])
+
+    def test_sin_hash_en_el_nombre_se_revalida(self):
+        datos = self.precache()
+        self.assertEqual(datos['inmutables'], [])
+        self.assertEqual(datos['revisables'], ['/static/js/app.js', '/static/js/bd.js'])
+        self.assertEqual(datos['bd'], '/static/js/bd.js')
+
+    def test_urls_de_collectstatic(self):
+        destino = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, destino)
+        ajustes = override_settings(
+            STATIC_ROOT=destino,
+            STATICFILES_FINDERS=['django.contrib.staticfiles.finders.FileSystemFinder'],
+            STORAGES={
+                'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+                'staticfiles': {'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage'},
+            },
+        )
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+        datos = self.precache()
+        self.assertEqual(datos['revisables'], [])
+        self.assertEqual(len(datos['inmutables']), 2)
+        self.assertRegex(datos['inmutables'][0], r'^/static/js/app\.[0-9a-f]{12}\.js$')
+        self.assertIn(datos['bd'], datos['inmutables'])
+
+        # Si cambia un archivo cambian su URL y la versión (el navegador instala el SW nuevo)
+        antes = datos
+        with open(os.path.join(destino, 'js', 'app.js'), 'a') as archivo:
+            archivo.write('\n// cambio\n')
+        self.assertNotEqual(self.precache()['version'], antes['version'])
+
+        # WhiteNoise sirve el nombre con hash como inmutable y comprimido
+        respuesta = Client().get(datos['bd'], HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertIn('immutable', respuesta['Cache-Control'])
+        self.assertEqual(respuesta['Content-Encoding'], 'gzip')
+
+
+class ArchivosPwaTests(TestCase):
+
+    def test_service_worker_con_etag(self):
+        respuesta = self.client.get(reverse('service_worker'))
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertIn('no-cache', respuesta['Cache-Control'])
+        repetida = self.client.get(reverse('service_worker'), HTTP_IF_NONE_MATCH=respuesta['ETag'])
+        self.assertEqual(repetida.status_code, 304)
+        self.assertEqual(repetida.content, b'')
+
+    def test_manifest_con_etag(self):
+        respuesta = self.client.get(reverse('manifest'))
+        self.assertEqual(respuesta.json()['short_name'], 'AlgasApp')
+        repetida = self.client.get(reverse('manifest'), HTTP_IF_NONE_MATCH=respuesta['ETag'])
+        self.assertEqual(repetida.status_code, 304)
+
+    def test_relee_solo_si_cambio_el_archivo(self):
+        carpeta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, carpeta)
+        ruta = os.path.join(carpeta, 'manifest.json')
+        with open(ruta, 'w') as archivo:
+            archivo.write('{"v": 1}')
+
+        with mock.patch('builtins.open', wraps=open) as abrir:
+            primero = leer_en_memoria(ruta)
+            self.assertEqual(leer_en_memoria(ruta), primero)
+        self.assertEqual(abrir.call_count, 1)
+
+        with open(ruta, 'w') as archivo:
+            archivo.write('{"v": 2}')
+        os.utime(ruta, ns=(0, os.stat(ruta).st_mtime_ns + 10 ** 9))
+        self.assertEqual(leer_en_memoria(ruta)[0], b'{"v": 2}')
+        self.assertNotEqual(leer_en_memoria(ruta)[1], primero[1])
+
+
+class ConexionSqliteTests(TestCase):
+
+    def pragma(self, nombre):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {nombre}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_en_cada_conexion(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest("Solo SQLite")
+        self.assertEqual(self.pragma('busy_timeout'), 5000)
+        self.assertEqual(self.pragma('synchronous'), 1)  # NORMAL
+        self.assertEqual(self.pragma('temp_store'), 2)  # MEMORY
+
+    def modo_journal(self, ruta):
+        # Una conexión aparte a ese archivo: connection_created le aplica los PRAGMAs
+        conexion = DatabaseWrapper(dict(connection.settings_dict, NAME=ruta))
+        try:
+            with conexion.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode')
+                return cursor.fetchone()[0]
+        finally:
+            conexion.close()
+
+    def test_wal_por_defecto_y_opcion_para_desactivarlo(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest("Solo SQLite")
+        carpeta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, carpeta)
+
+        self.assertEqual(self.modo_journal(os.path.join(carpeta, 'db.sqlite3')), 'wal')
+        with override_settings(SQLITE_SIN_WAL=True):
+            self.assertEqual(self.modo_journal(os.path.join(carpeta, 'otra.sqlite3')), 'delete')
+
+    def test_conexion_persistente_con_chequeo(self):
+        self.assertGreater(settings.DATABASES['default']['CONN_MAX_AGE'], 0)
+        self.assertTrue(settings.DATABASES['default']['CONN_HEALTH_CHECKS'])
+
+
+class MicrolotesTests(TransactionTestCase):
+    """Reportes sueltos agrupados por el hilo escritor (fuera de una transacción, como en producción)."""
+
+    def setUp(self):
+        self.producto = Producto.objects.create(
+            nombre="Alga Seca", categoria='MP_ALGA_DESHIDRATADA', capacidad_maxima_diaria=100,
+        )
+        # Cola e hilo propios para cada test (toman los ajustes de override_settings)
+        reinicio = mock.patch.multiple(microlotes, _cola=None, _hilo=None)
+        reinicio.start()
+        self.addCleanup(reinicio.stop)
+
+    def post(self, temp_id):
+        datos = {'producto_id': self.producto.id, 'cantidad': '2', 'responsable': 'Ana', 'temp_id': temp_id}
+        return Client().post(reverse('api_guardar_prod'), json.dumps(datos), content_type='application/json')
+
+    @override_settings(INGESTA_VENTANA_MS=200)
+    def test_envios_simultaneos_van_en_una_transaccion(self):
+        hilos_n = 6
+        barrera = threading.Barrier(hilos_n)
+        respuestas = []
+
+        def enviar(numero):
+            barrera.wait()
+            try:
+                respuestas.append(self.post(f'micro-{numero}').json())
+            finally:
+                connections.close_all()
+
+        antes = microlotes.estadisticas_microlotes()['lotes']
+        hilos = [threading.Thread(target=enviar, args=(n,)) for n in range(hilos_n)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual([r['status'] for r in respuestas], ['ok'] * hilos_n)
+        self.assertEqual(ReporteProduccion.objects.count(), hilos_n)
+        self.assertLess(microlotes.estadisticas_microlotes()['lotes'] - antes, hilos_n)
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.stock_actual, Decimal('12.00'))
+
+    @override_settings(INGESTA_COLA_MAX=1, INGESTA_MAX_LOTE=1)
+    def test_cola_llena_responde_503(self):
+        escribiendo = threading.Event()
+        seguir = threading.Event()
+        guardar = microlotes.guardar_lote_reportes
+
+        def guardar_lento(items):
+            escribiendo.set()
+            seguir.wait(5)
+            return guardar(items)
+
+        with mock.patch.object(microlotes, 'guardar_lote_reportes', guardar_lento):
+            primero = threading.Thread(target=self.post, args=('lento-1',))
+            primero.start()
+            escribiendo.wait(5)  # El escritor está ocupado con el primero
+            segundo = threading.Thread(target=self.post, args=('lento-2',))
+            segundo.start()
+            while microlotes.estadisticas_microlotes()['en_cola'] < 1:
+                time.sleep(0.01)
+
+            respuesta = self.post('lento-3')  # La cola (tope 1) ya está llena
+            seguir.set()
+            primero.join()
+            segundo.join()
+
+        self.assertEqual(respuesta.status_code, 503)
+        self.assertEqual(respuesta['Retry-After'], '5')
+        self.assertEqual(
+            sorted(ReporteProduccion.objects.values_list('id_cliente', flat=True)), ['lento-1', 'lento-2'],
+        )
+
+    def test_consultas_del_lote_se_cuentan_en_el_request(self):
+        metricas.reiniciar_metricas()
+        self.addCleanup(metricas.reiniciar_metricas)
+        self.assertEqual(self.post('medido-1').status_code, 200)
+
+        consultas = next(
+            linea for linea in metricas.texto_prometheus().splitlines()
+            if linea.startswith('django_vista_consultas_bd_sum{vista="api_guardar_prod"}')
+        )
+        # El reporte, su movimiento de stock y su resumen se escriben en el hilo escritor
+        self.assertGreaterEqual(float(consultas.split()[-1]), 3)
+
+    def post_paquete(self, prefijo, cantidad):
+        reportes = [
+            {'tipo': 'ALGAS', 'producto_id': self.producto.id, 'cantidad': '1', 'responsable': 'Ana', 'temp_id': f'{prefijo}-{k}'}
+            for k in range(cantidad)
+        ]
+        return Client().post(reverse('api_guardar_lote'), json.dumps({'reportes': reportes}), content_type='application/json')
+
+    @override_settings(INGESTA_VENTANA_MS=200)
+    def test_paquete_pasa_por_el_hilo_escritor(self):
+        antes = microlotes.estadisticas_microlotes()
+        respuesta = self.post_paquete('paquete', 3)
+
+        self.assertEqual(respuesta.json()['guardados'], 3)
+        despues = microlotes.estadisticas_microlotes()
+        self.assertEqual((despues['lotes'] - antes['lotes'], despues['reportes'] - antes['reportes']), (1, 3))
+        self.assertEqual(despues['en_cola'], 0)
+
+    @override_settings(INGESTA_COLA_MAX=3, INGESTA_MAX_LOTE=1)
+    def test_paquete_comparte_el_tope_de_la_cola(self):
+        escribiendo = threading.Event()
+        seguir = threading.Event()
+        guardar = microlotes.guardar_lote_reportes
+
+        def guardar_lento(items):
+            escribiendo.set()
+            seguir.wait(5)
+            return guardar(items)
+
+        with mock.patch.object(microlotes, 'guardar_lote_reportes', guardar_lento):
+            primero = threading.Thread(target=self.post, args=('suelto-1',))
+            primero.start()
+            escribiendo.wait(5)
+            segundo = threading.Thread(target=self.post_paquete, args=('espera', 2))
+            segundo.start()
+            while microlotes.estadisticas_microlotes()['en_cola'] < 2:
+                time.sleep(0.01)
+
+            respuesta = self.post_paquete('no-cabe', 2)  # 2 en cola + 2 > tope de 3 reportes
+            seguir.set()
+            primero.join()
+            segundo.join()
+
+        self.assertEqual(respuesta.status_code, 503)
+        self.assertEqual(respuesta['Retry-After'], '5')
+        self.assertEqual(ReporteProduccion.objects.count(), 3)
+        self.assertFalse(ReporteProduccion.objects.filter(id_cliente__startswith='no-cabe').exists())
+
+    def test_gunicorn_usa_workers_con_hilos(self):
+        # Con workers 'sync' cada micro-lote tendría un solo reporte
+        configuracion = {}
+        with open(os.path.join(settings.BASE_DIR, 'gunicorn.conf.py'), encoding='utf-8') as archivo:
+            exec(archivo.read(), configuracion)
+        self.assertEqual(configuracion['worker_class'], 'gthread')
+        self.assertGreater(configuracion['threads'], 1)
+
+
+class VistasAsyncTests(TransactionTestCase):
+    """Ingesta y catálogo en sus versiones async (las que sirve ASGI)."""
+
+    def setUp(self):
+        self.producto = Producto.objects.create(
+            nombre="Alga Seca", categoria='MP_ALGA_DESHIDRATADA', capacidad_maxima_diaria=100,
+        )
+        self.lote = LoteAves.objects.create(
+            nombre="Nave 1", tipo_dieta='ALGAS', cantidad_aves_inicial=100, fecha_inicio=parse_date('2025-01-01'),
+        )
+        self.fabrica = AsyncRequestFactory()
+        reinicio = mock.patch.multiple(microlotes, _cola=None, _hilo=None)
+        reinicio.start()
+        self.addCleanup(reinicio.stop)
+
+    def post(self, vista, datos):
+        return vista(self.fabrica.post('/', json.dumps(datos), content_type='application/json'))
+
+    @override_settings(INGESTA_VENTANA_MS=200)
+    async def test_reportes_simultaneos_en_un_microlote(self):
+        antes = microlotes.estadisticas_microlotes()['lotes']
+        respuestas = await asyncio.gather(*(
+            self.post(api_guardar_produccion_async, {
+                'producto_id': self.producto.id, 'cantidad': '2', 'responsable': 'Ana', 'temp_id': f'async-{n}',
+            })
+            for n in range(5)
+        ))
+        self.assertEqual([r.status_code for r in respuestas], [200] * 5)
+        self.assertEqual(microlotes.estadisticas_microlotes()['lotes'] - antes, 1)
+        self.assertEqual(await ReporteProduccion.objects.acount(), 5)
+
+        repetida = await self.post(api_guardar_produccion_async, {
+            'producto_id': self.producto.id, 'cantidad': '2', 'responsable': 'Ana', 'temp_id': 'async-0',
+        })
+        self.assertTrue(json.loads(repetida.content)['duplicado'])
+
+    async def test_granja_y_lote(self):
+        respuesta = await self.post(api_guardar_aves_async, {'lote_id': self.lote.id, 'huevos': 80, 'alimento': '5', 'responsable': 'Luis'})
+        self.assertEqual(json.loads(respuesta.content)['mensaje'], 'Datos de granja guardados')
+
+        respuesta = await self.post(api_guardar_lote_async, {'reportes': [
+            {'tipo': 'GRANJA', 'lote_id': self.lote.id, 'huevos': 70, 'alimento': '5', 'responsable': 'Luis'},
+            {'tipo': 'GRANJA', 'lote_id': 999, 'huevos': 70, 'alimento': '5'},
+        ]})
+        self.assertEqual(json.loads(respuesta.content)['status'], 'parcial')
+        self.assertEqual(await ReporteDiarioAves.objects.acount(), 2)
+
+        invalido = await self.post(api_guardar_aves_async, {'lote_id': self.lote.id, 'huevos': 'muchos', 'alimento': '5'})
+        self.assertEqual(invalido.status_code, 400)
+
+    async def test_catalogo_async_igual_al_sync(self):
+        self.assertEqual(await cambios_desde_async(0), await sync_to_async(cambios_desde)(0))
+
+        request = self.fabrica.get('/', {'cursor': '0'})
+        request.user = await User.objects.acreate(username='trabajador')
+        datos = json.loads((await api_catalogo_cambios_async(request)).content)
+        self.assertEqual([p['nombre'] for p in datos['productos']], ["Alga Seca"])
+
+        request = self.fabrica.get('/', {'cursor': '0'})
+        request.user = AnonymousUser()
+        self.assertEqual((await api_catalogo_cambios_async(request)).status_code, 302)
+
+    @override_settings(DEBUG=True)
+    def test_cadena_de_middleware_sigue_async(self):
+        # Django avisa en DEBUG cada middleware sync que tuvo que adaptar bajo ASGI
+        with self.assertNoLogs('django.request', level='DEBUG'):
+            ASGIHandler().load_middleware(is_async=True)
+
+    async def test_estaticos_bajo_asgi(self):
+        respuesta = await self.async_client.get('/static/js/bd.js')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertIn(b'vaciarSalida', b''.join([trozo async for trozo in respuesta]))
+
+
+class MetricasTests(TestCase):
+
+    def setUp(self):
+        metricas.reiniciar_metricas()
+        self.addCleanup(metricas.reiniciar_metricas)
+        self.gerente = User.objects.create_user('gerente', password='clave-segura-123', is_staff=True)
+
+    def linea(self, texto, inicio):
+        return next(linea for linea in texto.splitlines() if linea.startswith(inicio))
+
+    def test_mide_consultas_y_tamano_por_vista(self):
+        self.client.force_login(self.gerente)
+        respuesta = self.client.get(reverse('api_catalogo_cambios'))
+        Producto.objects.create(nombre="Alga", categoria='MP_ALGA_DESHIDRATADA', capacidad_maxima_diaria=1)
+
+        texto = self.client.get(reverse('metricas_prometheus')).content.decode()
+        self.assertIn('django_vista_requests_total{vista="api_catalogo_cambios",codigo="200"} 1', texto)
+        self.assertIn('# TYPE django_vista_duracion_segundos histogram', texto)
+        suma_bytes = self.linea(texto, 'django_vista_respuesta_bytes_sum{vista="api_catalogo_cambios"}')
+        self.assertEqual(float(suma_bytes.split()[-1]), len(respuesta.content))
+        # Sesión + usuario + catálogo: más de una consulta y el bucket +Inf las cuenta todas
+        consultas = self.linea(texto, 'django_vista_consultas_bd_sum{vista="api_catalogo_cambios"}')
+        self.assertGreater(float(consultas.split()[-1]), 1)
+        self.assertIn('django_vista_duracion_recientes_segundos{vista="api_catalogo_cambios",quantile="0.99"}', texto)
+
+    def test_solo_staff_o_token(self):
+        self.assertEqual(self.client.get(reverse('metricas_prometheus')).status_code, 302)
+        self.client.force_login(User.objects.create_user('trabajador', password='clave-segura-123'))
+        self.assertEqual(self.client.get(reverse('metricas_prometheus')).status_code, 403)
+        self.client.logout()
+        with override_settings(METRICAS_TOKEN='secreto'):
+            self.assertEqual(Client().get(reverse('metricas_prometheus'), HTTP_AUTHORIZATION='Bearer secreto').status_code, 200)
+            self.assertEqual(Client().get(reverse('metricas_prometheus'), HTTP_AUTHORIZATION='Bearer otro').status_code, 302)
+
+    def test_exportacion_por_streaming_se_mide_al_terminar_el_cuerpo(self):
+        producto = Producto.objects.create(nombre="Alga", categoria='MP_ALGA_DESHIDRATADA', capacidad_maxima_diaria=1)
+        ReporteProduccion.objects.create(producto=producto, cantidad_producida=5, responsable='Ana')
+        self.client.force_login(self.gerente)
+
+        respuesta = self.client.get(reverse('exportar_algas_csv'))
+        self.assertNotIn('exportar_algas_csv', metricas.texto_prometheus())  # El cuerpo todavía no se generó
+        with override_settings(METRICAS_UMBRAL_LENTO_MS=0), self.assertLogs('core.metricas', 'WARNING') as registro:
+            cuerpo = b''.join(respuesta.streaming_content)
+
+        texto = metricas.texto_prometheus()
+        self.assertIn('django_vista_requests_total{vista="exportar_algas_csv",codigo="200"} 1', texto)
+        suma_bytes = self.linea(texto, 'django_vista_respuesta_bytes_sum{vista="exportar_algas_csv"}')
+        self.assertEqual(float(suma_bytes.split()[-1]), len(cuerpo))
+        # Las filas se leen mientras se genera el cuerpo: esa consulta también cuenta
+        self.assertIn('FROM "core_reporteproduccion"', registro.output[0])
+
+    @override_settings(METRICAS_UMBRAL_LENTO_MS=0)
+    def test_request_lento_registra_su_sql(self):
+        self.client.force_login(self.gerente)
+        with self.assertLogs('core.metricas', 'WARNING') as registro:
+            self.client.get(reverse('api_catalogo_cambios'))
+        self.assertIn('Request lento: GET /api/v1/catalogo/cambios/', registro.output[0])
+        self.assertIn('core_cambiocatalogo', registro.output[0])
+
+
+class DatosSinteticosTests(TestCase):
+
+    def resumen(self):
+        return (
+            list(ReporteDiarioAves.objects.order_by('lote__nombre', 'fecha_reporte')
+                 .values_list('huevos_recolectados', 'alimento_consumido_kg', 'mortalidad')),
+            list(ReporteProduccion.objects.order_by('producto__nombre', 'fecha_registro')
+                 .values_list('fecha_registro', 'cantidad_producida')),
+        )
+
+    def test_misma_semilla_mismos_datos(self):
+        creados = generar_datos_sinteticos(productos=2, lotes=2, dias=30, semilla=7)
+        self.assertEqual(creados['reportes_aves'], 60)
+        primera = self.resumen()
+        self.assertGreater(borrar_datos_sinteticos(), 0)
+        self.assertFalse(ReporteDiarioAves.objects.exists())
+
+        generar_datos_sinteticos(productos=2, lotes=2, dias=30, semilla=7)
+        self.assertEqual(self.resumen(), primera)
+
+    def test_resumenes_y_stock_consistentes(self):
+        generar_datos_sinteticos(productos=2, lotes=4, dias=20)
+        self.assertEqual(set(LoteAves.objects.values_list('tipo_dieta', flat=True)), {'ALGAS', 'CONTROL'})
+        self.assertEqual(ResumenDiarioLote.objects.count(), 4 * 20)
+        for producto in Producto.objects.all():
+            total = sum(ReporteProduccion.objects.filter(producto=producto).values_list('cantidad_producida', flat=True))
+            self.assertEqual(producto.stock_actual, total)
+            self.assertEqual(saldo_en_fecha(producto.id, timezone.now().date()), total)
+
+    def test_comparar_con_linea_base(self):
+        base = {'casos': {'dashboard': {'mediana_ms': 100.0}, 'panel': {'mediana_ms': 10.0}}}
+        actual = {'casos': {'dashboard': {'mediana_ms': 125.0}, 'panel': {'mediana_ms': 9.0}, 'nuevo': {'mediana_ms': 1.0}}}
+        self.assertEqual(comparar(actual, base, tolerancia=10), [
+            ('dashboard', 100.0, 125.0, 25.0, True),
+            ('panel', 10.0, 9.0, -10.0, False),
+        ])
+
+
+class TablasGerenciaTests(TestCase):
+
+    def setUp(self):
+        self.gerente = User.objects.create_user('gerente', password='clave-segura-123', is_staff=True)
+        self.client.force_login(self.gerente)
+        inicio = parse_date('2025-01-01')
+        # Varios con la misma fecha: el id desempata y ninguno se repite ni se salta
+        for i in range(7):
+            LoteAves.objects.create(
+                nombre=f"Nave {i}", tipo_dieta='ALGAS', cantidad_aves_inicial=100,
+                fecha_inicio=inicio + timedelta(days=i // 3), activo=i != 6,
+            )
+
+    def pagina(self, tabla, **params):
+        respuesta = self.client.get(reverse('api_tabla_gerencia', args=[tabla]), params)
+        return respuesta.status_code, respuesta.json()
+
+    def recorrer(self, tabla, **params):
+        nombres, cursor = [], ''
+        while True:
+            codigo, datos = self.pagina(tabla, limite=2, cursor=cursor, **params)
+            self.assertEqual(codigo, 200)
+            nombres += [fila['nombre'] for fila in datos['filas']]
+            cursor = datos['siguiente']
+            if not cursor:
+                return nombres
+
+    def test_panel_no_trae_las_tablas(self):
+        self.client.get(reverse('panel_gerencia'))  # El primero guarda los roles en la sesión
+        with self.assertNumQueries(2):  # Sesión y usuario
+            respuesta = self.client.get(reverse('panel_gerencia'))
+        self.assertNotContains(respuesta, "Nave 0")
+        self.assertContains(respuesta, reverse('api_tabla_gerencia', args=['lotes']))
+
+    def test_paginacion_por_cursor_recorre_todo_en_orden(self):
+        esperado = list(
+            LoteAves.objects.filter(activo=True).order_by('-fecha_inicio', '-id').values_list('nombre', flat=True)
+        )
+        self.assertEqual(self.recorrer('lotes'), esperado)
+        self.assertEqual(self.recorrer('lotes', orden='nombre', estado='todos'), [f"Nave {i}" for i in range(7)])
+        self.assertEqual(self.recorrer('lotes', estado='terminados'), ["Nave 6"])
+
+        # Cursor con fecha y hora (date_joined)
+        for i in range(3):
+            User.objects.create_user(f'trabajador{i}', first_name=f'Trabajador {i}')
+        nombres = self.recorrer('usuarios')
+        self.assertEqual(nombres, ['Trabajador 2', 'Trabajador 1', 'Trabajador 0', ''])
+
+    def test_busqueda_y_una_consulta_por_pagina(self):
+        with self.assertNumQueries(1):
+            pagina = pagina_tabla('lotes', {'q': 'nave 4'})
+        self.assertEqual([fila['nombre'] for fila in pagina['filas']], ["Nave 4"])
+        self.assertIsNone(pagina['siguiente'])
+
+        codigo, datos = self.pagina('usuarios', q='GEREN')
+        self.assertEqual([fila['usuario'] for fila in datos['filas']], ['gerente'])
+        self.assertEqual(datos['filas'][0]['url_borrar'], reverse('eliminar_usuario', args=[self.gerente.id]))
+
+    def test_parametros_invalidos(self):
+        _, datos = self.pagina('lotes', limite=2)
+        self.assertEqual(self.pagina('lotes', orden='nombre', cursor=datos['siguiente'])[0], 400)
+        self.assertEqual(self.pagina('lotes', cursor='basura')[0], 400)
+        self.assertEqual(self.pagina('lotes', orden='id')[0], 400)
+        self.assertEqual(self.pagina('lotes', limite=1000)[0], 400)
+        self.assertEqual(self.pagina('reportes')[0], 404)
+
+        self.client.force_login(User.objects.create_user('trabajador', password='clave-segura-123'))
+        self.assertEqual(self.pagina('usuarios')[0], 403)
+
+
+class RolesTests(TestCase):
+
+    def setUp(self):
+        self.grupo = Group.objects.create(name='Trabajadores')
+        self.usuario = User.objects.create_user('juan', password='clave-segura-123')
+        self.client.force_login(self.usuario)
+
+    def test_grupos_se_leen_una_vez_por_sesion(self):
+        self.client.get(reverse('dashboard'))
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.get(reverse('dashboard'))
+        self.assertFalse([q for q in consultas.captured_queries if 'auth_group' in q['sql']])
+
+    def test_cambio_de_grupos_invalida_la_sesion(self):
+        self.assertEqual(self.client.get(reverse('dashboard')).status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.usuario.groups.add(self.grupo)
+        self.assertRedirects(self.client.get(reverse('dashboard')), reverse('menu_trabajador'))
+        self.assertEqual(self.client.get(reverse('api_curvas_postura')).status_code, 403)
+
+        # Desde el lado del grupo también
+        with self.captureOnCommitCallbacks(execute=True):
+            self.grupo.user_set.remove(self.usuario)
+        self.assertEqual(self.client.get(reverse('dashboard')).status_code, 200)
+
+    def test_editar_y_borrar_solo_gerencia(self):
+        lote = LoteAves.objects.create(
+            nombre="Nave 1", tipo_dieta='ALGAS', cantidad_aves_inicial=100, fecha_inicio=parse_date('2025-01-01'),
+        )
+        respuesta = self.client.get(reverse('eliminar_lote', args=[lote.id]))
+        self.assertRedirects(respuesta, reverse('menu_trabajador'), fetch_redirect_response=False)
+        self.assertTrue(LoteAves.objects.filter(id=lote.id).exists())
+        self.assertEqual(self.client.get(reverse('api_tabla_gerencia', args=['lotes'])).status_code, 403)
+
+        self.client.logout()
+        respuesta = self.client.get(reverse('editar_lote', args=[lote.id]))
+        self.assertEqual(respuesta.status_code, 302)
+        self.assertIn(settings.LOGIN_URL, respuesta['Location'])
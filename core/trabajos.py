@@ -0,0 +1,226 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .exportar import escribir_excel_algas, escribir_excel_granja, filtrar_granja, filtrar_produccion
+from .models import TrabajoExportacion
+
+
+# ==========================================
+# COLA DE EXPORTACIONES (Hilos locales, sin broker externo)
+# ==========================================
+
+EXPORTADORES = {
+    'ALGAS': (filtrar_produccion, escribir_excel_algas, "Reporte_Algas_Completo.xlsx"),
+    'GRANJA': (filtrar_granja, escribir_excel_granja, "Reporte_Granja_Completo.xlsx"),
+}
+
+# Solo estos parámetros de la URL cuentan como filtro (el resto se ignora)
+FILTROS_VALIDOS = ('desde', 'hasta', 'producto', 'lote')
+
+EN_CURSO = ('PENDIENTE', 'PROCESANDO')
+
+_ejecutor = None
+
+
+def _obtener_ejecutor():
+    global _ejecutor
+    if _ejecutor is None:
+        _ejecutor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'EXPORTACIONES_HILOS', 2),
+            thread_name_prefix='exportaciones',
+        )
+    return _ejecutor
+
+
+def ejecutar_en_segundo_plano(funcion, *args):
+    """Manda la función al pool de hilos. Los tests la reemplazan para correr en línea."""
+    return _obtener_ejecutor().submit(funcion, *args)
+
+
+def limpiar_filtros(params):
+    return {nombre: params[nombre] for nombre in FILTROS_VALIDOS if params.get(nombre)}
+
+
+def calcular_clave(tipo, filtros):
+    """
+    Clave del archivo en caché: tipo + filtros + marca de agua de los datos
+    (último created_at y cantidad de filas, para detectar también borrados).
+    Lanza ValueError si los filtros son inválidos.
+    """
+    filtrar = EXPORTADORES[tipo][0]
+    marca = filtrar(filtros).aggregate(ultimo=Max('created_at'), filas=Count('id'))
+    contenido = json.dumps({
+        'tipo': tipo,
+        'filtros': filtros,
+        'ultimo': marca['ultimo'].isoformat() if marca['ultimo'] else None,
+        'filas': marca['filas'],
+    }, sort_keys=True)
+    return hashlib.sha256(contenido.encode('utf-8')).hexdigest()
+
+
+def ruta_archivo(clave):
+    return os.path.join(settings.EXPORTACIONES_DIR, f"{clave}.xlsx")
+
+
+def nombre_descarga(trabajo):
+    return EXPORTADORES[trabajo.tipo][2]
+
+
+def _renovar_archivo(ruta):
+    """
+    Marca el archivo como recién usado: limpiar_exportaciones borra por fecha de
+    modificación y no debe llevarse uno que se acaba de entregar.
+    Devuelve False si el archivo no existe.
+    """
+    try:
+        os.utime(ruta)
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def _limite_en_curso():
+    """Un trabajo PENDIENTE o PROCESANDO creado antes de esto quedó colgado (el proceso se reinició)."""
+    return timezone.now() - timedelta(minutes=getattr(settings, 'EXPORTACIONES_MINUTOS_MAXIMOS', 30))
+
+
+def vencer_trabajos_colgados():
+    """
+    Marca ERROR los trabajos que siguen en curso pasado el límite: el pool de hilos
+    vive en memoria y un reinicio (deploy, worker reciclado) los pierde.
+    Devuelve cuántos se vencieron.
+    """
+    return TrabajoExportacion.objects.filter(estado__in=EN_CURSO, created_at__lt=_limite_en_curso()).update(
+        estado='ERROR', error="La exportación se interrumpió; pídala de nuevo", terminado_at=timezone.now(),
+    )
+
+
+def encolar_exportacion(tipo, params, usuario=None):
+    """
+    Devuelve el TrabajoExportacion para estos filtros.
+    - Si el archivo ya existe en disco se marca LISTO al instante (y se renueva su fecha).
+    - Si el mismo usuario ya tiene un trabajo igual en curso (y no colgado), se reutiliza.
+    - Si no, se crea uno nuevo y se manda al pool de hilos.
+    """
+    filtros = limpiar_filtros(params)
+    clave = calcular_clave(tipo, filtros)
+
+    if _renovar_archivo(ruta_archivo(clave)):
+        return TrabajoExportacion.objects.create(
+            tipo=tipo, filtros=filtros, clave=clave, usuario=usuario,
+            estado='LISTO', terminado_at=timezone.now(),
+        )
+
+    # Solo los del mismo usuario: el trabajo de otro no lo podría consultar ni descargar
+    en_curso = TrabajoExportacion.objects.filter(
+        clave=clave, usuario=usuario, estado__in=EN_CURSO, created_at__gte=_limite_en_curso(),
+    ).first()
+    if en_curso:
+        return en_curso
+
+    trabajo = TrabajoExportacion.objects.create(tipo=tipo, filtros=filtros, clave=clave, usuario=usuario)
+    _mandar_al_pool(trabajo.id)
+    return trabajo
+
+
+def _mandar_al_pool(trabajo_id):
+    # Esperamos al commit para que el hilo ya vea el trabajo en la base de datos
+    transaction.on_commit(lambda: ejecutar_en_segundo_plano(procesar_trabajo, trabajo_id))
+
+
+def reencolar_si_falta_archivo(trabajo):
+    """
+    Un trabajo LISTO cuyo archivo ya borró limpiar_exportaciones vuelve a PENDIENTE
+    y se arma de nuevo (con la clave de los datos actuales). Devuelve el trabajo al día.
+    """
+    if trabajo.estado != 'LISTO' or _renovar_archivo(ruta_archivo(trabajo.clave)):
+        return trabajo
+    # El filtro por estado evita encolarlo dos veces si llegan dos consultas juntas
+    reencolado = TrabajoExportacion.objects.filter(id=trabajo.id, estado='LISTO').update(
+        estado='PENDIENTE', clave=calcular_clave(trabajo.tipo, trabajo.filtros),
+        created_at=timezone.now(), terminado_at=None, error='',
+    )
+    if reencolado:
+        _mandar_al_pool(trabajo.id)
+    trabajo.refresh_from_db()
+    return trabajo
+
+
+def procesar_trabajo(trabajo_id):
+    """Arma el Excel del trabajo y lo deja en EXPORTACIONES_DIR con nombre = clave."""
+    try:
+        trabajo = TrabajoExportacion.objects.get(id=trabajo_id)
+        TrabajoExportacion.objects.filter(id=trabajo_id).update(estado='PROCESANDO')
+
+        filtrar, escribir, _ = EXPORTADORES[trabajo.tipo]
+        destino = ruta_archivo(trabajo.clave)
+
+        if not _renovar_archivo(destino):
+            os.makedirs(settings.EXPORTACIONES_DIR, exist_ok=True)
+            # Escribimos en un temporal del mismo directorio y luego lo movemos:
+            # así nunca se sirve un archivo a medio escribir.
+            fd, temporal = tempfile.mkstemp(suffix='.xlsx.tmp', dir=settings.EXPORTACIONES_DIR)
+            try:
+                with os.fdopen(fd, 'wb') as archivo:
+                    escribir(archivo, filtrar(trabajo.filtros))
+                os.replace(temporal, destino)
+            except Exception:
+                os.remove(temporal)
+                raise
+
+        TrabajoExportacion.objects.filter(id=trabajo_id).update(estado='LISTO', terminado_at=timezone.now())
+    except Exception as e:
+        TrabajoExportacion.objects.filter(id=trabajo_id).update(
+            estado='ERROR', error=str(e), terminado_at=timezone.now(),
+        )
+    finally:
+        try:
+            limpiar_exportaciones()
+        except Exception:
+            pass  # La limpieza es de mantención: nunca debe tumbar el hilo
+        # Cada hilo abre su propia conexión: la cerramos al terminar
+        if not connection.in_atomic_block:
+            connection.close()
+
+
+def limpiar_exportaciones(horas=None):
+    """
+    Borra de EXPORTACIONES_DIR los archivos (y temporales abandonados) con más de
+    'horas' horas, y los trabajos terminados hace más que eso. Cada reporte nuevo
+    cambia la clave de los filtros, así que los Excel viejos no se vuelven a pedir.
+    Vence además los trabajos colgados. Devuelve cuántos archivos se borraron.
+    """
+    if horas is None:
+        horas = getattr(settings, 'EXPORTACIONES_HORAS_ARCHIVO', 24)
+    limite = time.time() - horas * 3600
+    borrados = 0
+    try:
+        nombres = os.listdir(settings.EXPORTACIONES_DIR)
+    except FileNotFoundError:
+        nombres = []
+    for nombre in nombres:
+        if not nombre.endswith(('.xlsx', '.xlsx.tmp')):
+            continue
+        ruta = os.path.join(settings.EXPORTACIONES_DIR, nombre)
+        try:
+            if os.path.getmtime(ruta) < limite:
+                os.remove(ruta)
+                borrados += 1
+        except FileNotFoundError:
+            pass  # Otro hilo lo borró o lo reemplazó recién
+
+    vencer_trabajos_colgados()
+    TrabajoExportacion.objects.filter(
+        terminado_at__lt=timezone.now() - timedelta(hours=horas),
+    ).exclude(estado__in=EN_CURSO).delete()
+    return borrados
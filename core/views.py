@@ -1,17 +1,43 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.db.models import Avg, Sum
+from django.db import transaction
 from django.utils import timezone
-from decimal import Decimal
-from .models import Producto, LoteAves, ReporteDiarioAves, ReporteProduccion
+from .models import Producto, LoteAves, ReporteDiarioAves, ReporteProduccion, TrabajoExportacion, MovimientoStock
+from .inventario import registrar_movimientos, proyeccion_por_tendencia
+from .ingesta import MAX_REPORTES_POR_LOTE
+from .microlotes import (
+    guardar_en_microlote, guardar_en_microlote_async, guardar_paquete_en_microlote,
+    guardar_paquete_en_microlote_async, IngestaOcupada,
+)
+from .agregados import produccion_por_producto, rendimiento_por_dieta
+from .cache_dashboard import obtener_datos_dashboard, estadisticas_cache, marca_datos_dashboard
+from .analitica import curvas_de_postura
+from .estadisticas import analisis_por_parametros
+from .catalogo import cambios_desde, cambios_desde_async
+from .precache import manifiesto_precache
+from .metricas import texto_prometheus
+from .tablas_gerencia import pagina_tabla
+from .roles import es_gerencia, no_es_trabajador, rol_requerido, roles_de
+from .archivos_pwa import RUTA_MANIFEST, RUTA_SERVICE_WORKER, etag_archivo, leer_en_memoria
+import hmac
 import json
-from django.http import JsonResponse
+from django.http import JsonResponse, FileResponse, Http404
+from django.urls import reverse
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition
+from django.utils.cache import patch_cache_control
 from datetime import timedelta
 from django.contrib.auth.decorators import login_required
+from django.contrib.auth.views import redirect_to_login
+from asgiref.sync import sync_to_async
 import csv
 from django.http import HttpResponse
-import openpyxl
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+from .exportar import (
+    respuesta_excel, escribir_excel_algas, escribir_excel_granja,
+    respuesta_csv, filas_csv_produccion, filas_csv_granja, filtrar_produccion, filtrar_granja,
+    CONTENT_TYPE_XLSX,
+)
+from .trabajos import EXPORTADORES, encolar_exportacion, nombre_descarga, reencolar_si_falta_archivo, ruta_archivo
 from .forms import NuevoUsuarioForm, ProductoForm, LoteForm
 from django.contrib.auth.models import User, Group
 from django.contrib import messages
@@ -20,15 +46,19 @@ from django.http import HttpResponse
 import os
 
 
-@login_required
+@rol_requerido(no_es_trabajador, redirigir_a='menu_trabajador')
 def dashboard(request):
-    if request.user.groups.filter(name='Trabajadores').exists():
-        return redirect('menu_trabajador')
-    
     # 1. OBTENER FILTRO DE TIEMPO (Por defecto 30 días)
     dias_param = request.GET.get('dias', '30') # Si no hay parametro, usa 30
     dias = int(dias_param)
-    
+
+    # Los datos se guardan en caché por 'dias' y se invalidan al escribir reportes (ver core/signals.py)
+    context = obtener_datos_dashboard(dias, calcular_datos_dashboard)
+
+    return render(request, 'dashboard.html', context)
+
+def calcular_datos_dashboard(dias):
+    """Arma el contexto del dashboard para los últimos 'dias' días (sin caché)."""
     fecha_inicio = timezone.now().date() - timedelta(days=dias)
     titulo_periodo = f"Últimos {dias} días"
 
@@ -37,62 +67,39 @@ def dashboard(request):
     nombres_prod = []
     stock_prod = []
     proyeccion_prod = []
+    produccion_prod = []
+
+    # Kilos producidos en el periodo: salen de ResumenDiarioProduccion (una fila por producto y día)
+    dias_tendencia = max(dias, 1)
+    producido = produccion_por_producto(timezone.localdate() - timedelta(days=dias_tendencia))
+
+    # ANTES: proyeccion = p.stock_actual + (p.capacidad_maxima_diaria * dias)
+    # AHORA: repetimos la tendencia real (producción - despachos) de los últimos 'dias' días
+    proyecciones = proyeccion_por_tendencia(productos, dias_tendencia, producido)
 
     for p in productos:
-        # ANTES: Estaba fijo en * 7
-        # proyeccion = p.stock_actual + (p.capacidad_maxima_diaria * 7)
-        
-        # AHORA: Usamos la variable 'dias' que viene del botón (7, 30 o 365)
-        proyeccion = p.stock_actual + (p.capacidad_maxima_diaria * dias)
-        
         nombres_prod.append(p.nombre)
         stock_prod.append(float(p.stock_actual)) 
-        proyeccion_prod.append(float(proyeccion))
+        proyeccion_prod.append(float(proyecciones[p.id]))
+        produccion_prod.append(float(producido.get(p.id) or 0))
 
     # --- 3. LÓGICA DE GALLINAS (Rendimiento en el PERIODO seleccionado) ---
-    lotes_algas = LoteAves.objects.filter(tipo_dieta='ALGAS', activo=True)
-    lotes_control = LoteAves.objects.filter(tipo_dieta='CONTROL', activo=True)
-
-    def calcular_rendimiento(lotes, fecha_limite):
-        total_huevos = 0
-        total_aves_inicial = 0
-        hay_datos = False
-
-        for lote in lotes:
-            # AQUI APLICAMOS EL FILTRO DE FECHA __gte (Mayor o igual a fecha_limite)
-            reportes = ReporteDiarioAves.objects.filter(
-                lote=lote, 
-                fecha_reporte__gte=fecha_limite 
-            )
-            
-            if reportes.exists():
-                hay_datos = True
-                # Sumamos huevos
-                total_huevos += reportes.aggregate(Sum('huevos_recolectados'))['huevos_recolectados__sum']
-                # Usamos una simplificación para el promedio:
-                # (Total Huevos / Días Reportados) / Cantidad Aves
-                dias_reportados = reportes.count()
-                total_aves_inicial += (lote.cantidad_aves_inicial * dias_reportados)
-        
-        if total_aves_inicial > 0 and hay_datos:
-            # El cálculo es: Total Huevos del periodo / (Aves * Días)
-            # Esto nos da la "Tasa de Postura Diaria Promedio"
-            tasa = (total_huevos / total_aves_inicial)
-            return round(tasa * 100, 2) # Lo devolvemos en porcentaje (Ej: 85.5%)
-        return 0
-
-    rendimiento_algas = calcular_rendimiento(lotes_algas, fecha_inicio)
-    rendimiento_control = calcular_rendimiento(lotes_control, fecha_inicio)
+    # Una sola consulta agrupada por dieta (antes eran 3 consultas por cada lote)
+    rendimiento = rendimiento_por_dieta(fecha_inicio)
+    rendimiento_algas = rendimiento['ALGAS']['tasa']
+    rendimiento_control = rendimiento['CONTROL']['tasa']
 
-    ultimos_algas = ReporteProduccion.objects.select_related('producto').order_by('-fecha_registro', '-created_at')[:5]
+    # list(): evaluamos ahora para poder guardar el resultado en la caché
+    ultimos_algas = list(ReporteProduccion.objects.select_related('producto').order_by('-fecha_registro', '-created_at')[:5])
     
     # Traemos los últimos 5 reportes de la Granja
-    ultimos_granja = ReporteDiarioAves.objects.select_related('lote').order_by('-fecha_reporte', '-created_at')[:5]
+    ultimos_granja = list(ReporteDiarioAves.objects.select_related('lote').order_by('-fecha_reporte', '-created_at')[:5])
 
-    context = {
+    return {
         'nombres_prod': nombres_prod,
         'stock_prod': stock_prod,
         'proyeccion_prod': proyeccion_prod,
+        'produccion_prod': produccion_prod,
         'rendimiento_algas': rendimiento_algas,
         'rendimiento_control': rendimiento_control,
         'ganador': 'ALGAS' if rendimiento_algas > rendimiento_control else 'CONTROL',
@@ -105,7 +112,104 @@ def dashboard(request):
         'bitacora_granja': ultimos_granja
     }
 
-    return render(request, 'dashboard.html', context)
+def _dias_graficos(request):
+    valor = request.GET.get('dias', '30')
+    return int(valor) if valor.isdigit() else None
+
+def _marca_graficos(request):
+    """ETag y Last-Modified se calculan una sola vez por request (condition pide cada uno aparte)."""
+    if not hasattr(request, '_marca_graficos'):
+        dias = _dias_graficos(request)
+        request._marca_graficos = marca_datos_dashboard(dias) if dias is not None else (None, None)
+    return request._marca_graficos
+
+@rol_requerido(no_es_trabajador)  # Antes del ETag: un trabajador no recibe ni un 304
+@condition(
+    etag_func=lambda request: _marca_graficos(request)[0],
+    last_modified_func=lambda request: _marca_graficos(request)[1],
+)
+def api_graficos_dashboard(request):
+    """
+    Solo los datos de los gráficos del dashboard, en JSON compacto.
+    Con If-None-Match / If-Modified-Since responde 304 si no hubo reportes nuevos.
+    """
+    dias = _dias_graficos(request)
+    if dias is None:
+        return JsonResponse({'status': 'error', 'mensaje': "'dias' debe ser un número"}, status=400)
+
+    datos = obtener_datos_dashboard(dias, calcular_datos_dashboard)
+    response = JsonResponse({
+        'status': 'ok',
+        'dias': dias,
+        'productos': {
+            'nombres': datos['nombres_prod'],
+            'stock': datos['stock_prod'],
+            'proyeccion': datos['proyeccion_prod'],
+            'produccion': datos['produccion_prod'],
+        },
+        'rendimiento': {
+            'ALGAS': datos['rendimiento_algas'],
+            'CONTROL': datos['rendimiento_control'],
+        },
+    })
+    # El navegador la guarda pero siempre revalida (y recibe 304 si no cambió)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+@rol_requerido(es_gerencia)
+def estadisticas_cache_dashboard(request):
+    """Aciertos / fallos de la caché del dashboard (solo gerencia)."""
+    return JsonResponse({'status': 'ok', **estadisticas_cache()})
+
+def metricas_prometheus(request):
+    """
+    Métricas por vista (core/metricas.py) en formato de texto de Prometheus.
+    Solo staff con sesión, o un scraper con el token de settings.METRICAS_TOKEN.
+    """
+    token = settings.METRICAS_TOKEN
+    con_token = token and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+    if not con_token:
+        if not request.user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        if not es_gerencia(roles_de(request)):
+            return JsonResponse({'status': 'error', 'mensaje': 'Solo gerencia'}, status=403)
+    return HttpResponse(texto_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@rol_requerido(no_es_trabajador)
+def api_curvas_postura(request):
+    """
+    Series por lote (tasa de postura, conversión, mortalidad acumulada, rotos)
+    para los gráficos de gerencia. Parámetros en core/analitica.py.
+    """
+    try:
+        datos = curvas_de_postura(request.GET)
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'mensaje': str(e)}, status=400)
+    return JsonResponse({'status': 'ok', **datos})
+
+@rol_requerido(no_es_trabajador)
+def api_estadisticas_ensayo(request):
+    """
+    Ensayo ALGAS vs CONTROL: media, varianza e intervalo de confianza por dieta,
+    prueba t de Welch y promedios móviles (ver core/estadisticas.py).
+    """
+    try:
+        datos = analisis_por_parametros(request.GET)
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'mensaje': str(e)}, status=400)
+    return JsonResponse({'status': 'ok', **datos})
+
+@login_required
+def api_catalogo_cambios(request):
+    """
+    Sincronización incremental del catálogo (v1): ?cursor=N devuelve solo los
+    productos y lotes cambiados después de N y el cursor nuevo (ver core/catalogo.py).
+    """
+    cursor = request.GET.get('cursor', '0')
+    if not cursor.isdigit():
+        return JsonResponse({'status': 'error', 'mensaje': "'cursor' debe ser un número"}, status=400)
+    # Separadores sin espacios: por 2G cada byte cuenta
+    return JsonResponse({'status': 'ok', **cambios_desde(int(cursor))}, json_dumps_params={'separators': (',', ':')})
 
 @login_required
 def ingreso_algas(request):
@@ -119,39 +223,46 @@ def ingreso_algas(request):
     return render(request, 'ingreso_algas.html', {'productos': productos})
 
 
+def _leer_reporte_suelto(request, tipo):
+    data = json.loads(request.body)
+    if not isinstance(data, dict):
+        raise ValueError("Se esperaba un objeto JSON")
+    return dict(data, tipo=tipo)
+
+def _respuesta_ocupado(error):
+    response = JsonResponse({'status': 'error', 'mensaje': str(error)}, status=503)
+    response['Retry-After'] = '5'
+    return response
+
+def _respuesta_reporte_suelto(resultado, mensaje_ok):
+    if resultado['status'] != 'ok':
+        return JsonResponse({'status': 'error', 'mensaje': resultado['mensaje']}, status=400)
+    # Si el celular reenvía un reporte que ya llegó, no lo duplicamos
+    if resultado.get('duplicado'):
+        return JsonResponse({'status': 'ok', 'mensaje': 'Ya estaba guardado', 'duplicado': True})
+    return JsonResponse({'status': 'ok', 'mensaje': mensaje_ok})
+
+def _guardar_reporte_suelto(request, tipo, mensaje_ok):
+    """
+    Un reporte de app.js por request. No se escribe en su propia transacción:
+    entra al micro-lote del proceso y se confirma junto con los que llegan a la
+    vez (ver core/microlotes.py). Con la cola llena responde 503 y app.js lo
+    deja en su cola offline.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'status': 'error', 'mensaje': 'Método no permitido'}, status=405)
+    try:
+        resultado = guardar_en_microlote(_leer_reporte_suelto(request, tipo))
+    except IngestaOcupada as e:
+        return _respuesta_ocupado(e)
+    except Exception as e:
+        return JsonResponse({'status': 'error', 'mensaje': str(e)}, status=500)
+    return _respuesta_reporte_suelto(resultado, mensaje_ok)
+
 @csrf_exempt # Esto permite recibir datos sin el token de seguridad estricto (ideal para prototipos/APIs simples)
 def api_guardar_produccion(request):
-    if request.method == 'POST':
-        try:
-            # 1. Convertimos los datos que vienen de JavaScript a Python
-            data = json.loads(request.body)
-            
-            # 2. Buscamos el producto por su ID
-            producto_id = data.get('producto_id')
-            cantidad = data.get('cantidad')
-            responsable = data.get('responsable')
-            fecha_offline = data.get('fecha_registro') # La fecha real cuando se hizo el trabajo
-            
-            prod_obj = Producto.objects.get(id=producto_id)
-            
-            # 3. Creamos el reporte en la Base de Datos
-            nuevo_reporte = ReporteProduccion.objects.create(
-                producto=prod_obj,
-                cantidad_producida=cantidad,
-                responsable=responsable,
-                fecha_registro=fecha_offline if fecha_offline else timezone.now()
-            )
-            
-            # 4. Actualizamos el stock automáticamente
-            prod_obj.stock_actual += Decimal(str(cantidad))
-            prod_obj.save()
-            
-            return JsonResponse({'status': 'ok', 'mensaje': 'Guardado exitosamente'})
-            
-        except Exception as e:
-            return JsonResponse({'status': 'error', 'mensaje': str(e)}, status=500)
-    
-    return JsonResponse({'status': 'error', 'mensaje': 'Método no permitido'}, status=405)
+    # Reporte, entrada en el libro de stock y resumen diario van en la misma transacción (ver ingesta.py)
+    return _guardar_reporte_suelto(request, 'ALGAS', 'Guardado exitosamente')
 
 @login_required
 def ingreso_aves(request):
@@ -164,166 +275,200 @@ def ingreso_aves(request):
 
 @csrf_exempt
 def api_guardar_aves(request):
-    if request.method == 'POST':
-        try:
-            data = json.loads(request.body)
-            
-            # Datos recibidos del formulario
-            lote_id = data.get('lote_id')
-            huevos = int(data.get('huevos')) # Entero
-            alimento = data.get('alimento')  # Decimal/Float
-            mortalidad = int(data.get('mortalidad', 0)) # Opcional, por defecto 0
-            responsable = data.get('responsable')
-            fecha_offline = data.get('fecha_registro')
-
-            # Buscar el lote
-            lote_obj = LoteAves.objects.get(id=lote_id)
-
-            # Crear reporte
-            ReporteDiarioAves.objects.create(
-                lote=lote_obj,
-                huevos_recolectados=huevos,
-                alimento_consumido_kg=Decimal(str(alimento)), # <-- Usamos el truco del Decimal aquí también
-                mortalidad=mortalidad,
-                # Observaciones automáticas si es offline
-                observaciones=f"Rep. por {responsable} (Offline)" if fecha_offline else f"Rep. por {responsable}",
-                fecha_reporte=fecha_offline if fecha_offline else timezone.now()
-            )
-
-            return JsonResponse({'status': 'ok', 'mensaje': 'Datos de granja guardados'})
-
-        except Exception as e:
-            return JsonResponse({'status': 'error', 'mensaje': str(e)}, status=500)
-            
-    return JsonResponse({'status': 'error'}, status=405)
+    return _guardar_reporte_suelto(request, 'GRANJA', 'Datos de granja guardados')
+
+def _leer_lote(request):
+    """(reportes, None) o (None, respuesta de error) para el cuerpo de /api/guardar-lote/."""
+    if request.method != 'POST':
+        return None, JsonResponse({'status': 'error', 'mensaje': 'Método no permitido'}, status=405)
+
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return None, JsonResponse({'status': 'error', 'mensaje': 'JSON inválido'}, status=400)
+
+    reportes = data.get('reportes') if isinstance(data, dict) else data
+    if not isinstance(reportes, list):
+        return None, JsonResponse({'status': 'error', 'mensaje': "Se esperaba una lista en 'reportes'"}, status=400)
+    if len(reportes) > MAX_REPORTES_POR_LOTE:
+        return None, JsonResponse({'status': 'error', 'mensaje': f"Máximo {MAX_REPORTES_POR_LOTE} reportes por envío"}, status=413)
+    return reportes, None
+
+def _respuesta_lote(resultados):
+    guardados = sum(1 for r in resultados if r['status'] == 'ok')
+    return JsonResponse({
+        'status': 'ok' if guardados == len(resultados) else 'parcial',
+        'guardados': guardados,
+        'resultados': resultados,
+    })
+
+@csrf_exempt
+def api_guardar_lote(request):
+    """
+    Recibe de una sola vez los reportes pendientes de la cola offline de app.js:
+    {"reportes": [{tipo: 'ALGAS', ...}, {tipo: 'GRANJA', ...}, ...]}
+    Responde un resultado por cada reporte (mismo orden) para que el celular
+    borre de su cola solo los que se guardaron. Pasa por el hilo de micro-lotes
+    y su tope: con la cola llena responde 503 y bd.js espera el Retry-After.
+    """
+    reportes, error = _leer_lote(request)
+    if error:
+        return error
+    try:
+        resultados = guardar_paquete_en_microlote(reportes)
+    except IngestaOcupada as e:
+        return _respuesta_ocupado(e)
+    except Exception as e:
+        return JsonResponse({'status': 'error', 'mensaje': str(e)}, status=500)
+    return _respuesta_lote(resultados)
+
+
+# --- VERSIONES ASYNC (bajo ASGI, ver sistema_central/asgi.py y urls.py) ---
+# Un celular con mala señal tarda en subir su reporte: con una vista async esa
+# espera no ocupa un worker ni un hilo, y un proceso atiende miles a la vez.
+# (En Django 4.2 csrf_exempt y login_required envuelven la vista en una función
+#  sync, por eso aquí se marca csrf_exempt a mano y se revisa la sesión dentro.)
+
+async def _guardar_reporte_suelto_async(request, tipo, mensaje_ok):
+    if request.method != 'POST':
+        return JsonResponse({'status': 'error', 'mensaje': 'Método no permitido'}, status=405)
+    try:
+        resultado = await guardar_en_microlote_async(_leer_reporte_suelto(request, tipo))
+    except IngestaOcupada as e:
+        return _respuesta_ocupado(e)
+    except Exception as e:
+        return JsonResponse({'status': 'error', 'mensaje': str(e)}, status=500)
+    return _respuesta_reporte_suelto(resultado, mensaje_ok)
+
+async def api_guardar_produccion_async(request):
+    return await _guardar_reporte_suelto_async(request, 'ALGAS', 'Guardado exitosamente')
+
+async def api_guardar_aves_async(request):
+    return await _guardar_reporte_suelto_async(request, 'GRANJA', 'Datos de granja guardados')
+
+async def api_guardar_lote_async(request):
+    reportes, error = _leer_lote(request)
+    if error:
+        return error
+    try:
+        resultados = await guardar_paquete_en_microlote_async(reportes)
+    except IngestaOcupada as e:
+        return _respuesta_ocupado(e)
+    except Exception as e:
+        return JsonResponse({'status': 'error', 'mensaje': str(e)}, status=500)
+    return _respuesta_lote(resultados)
+
+for _vista in (api_guardar_produccion_async, api_guardar_aves_async, api_guardar_lote_async):
+    _vista.csrf_exempt = True
+
+async def api_catalogo_cambios_async(request):
+    if not await sync_to_async(lambda: request.user.is_authenticated)():
+        return redirect_to_login(request.get_full_path())
+    cursor = request.GET.get('cursor', '0')
+    if not cursor.isdigit():
+        return JsonResponse({'status': 'error', 'mensaje': "'cursor' debe ser un número"}, status=400)
+    datos = await cambios_desde_async(int(cursor))
+    return JsonResponse({'status': 'ok', **datos}, json_dumps_params={'separators': (',', ':')})
 
 @login_required
 def exportar_algas_csv(request):
-    """Genera un Excel (.xlsx) estilizado y completo"""
-    
-    # 1. Crear el libro y la hoja
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Reporte Algas"
-
-    # 2. Definir Estilos (Azul corporativo)
-    header_font = Font(bold=True, color="FFFFFF")
-    header_fill = PatternFill(start_color="1a252f", end_color="1a252f", fill_type="solid")
-    center_align = Alignment(horizontal="center")
-
-    # 3. Escribir Cabecera
-    headers = ['Fecha Registro', 'Fecha Sistema', 'Producto', 'Categoría', 'Cantidad (Kg/L)', 'Responsable']
-    ws.append(headers)
-
-    # Aplicar estilo a la cabecera
-    for cell in ws[1]:
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = center_align
-
-    # 4. Escribir Datos
-    reportes = ReporteProduccion.objects.all().select_related('producto').order_by('-fecha_registro')
-    
-    total_kg = 0
-    for r in reportes:
-        # Sumamos para el total final
-        total_kg += float(r.cantidad_producida)
-        
-        ws.append([
-            r.fecha_registro,
-            r.created_at.strftime("%d/%m/%Y"), # Formato limpio
-            r.producto.nombre,
-            r.producto.get_categoria_display(),
-            float(r.cantidad_producida), # Importante que sea número para que Excel sume
-            r.responsable
-        ])
-
-    # 5. Agregar Fila de Totales al final
-    ultima_fila = ws.max_row + 1
-    ws.cell(row=ultima_fila, column=4, value="TOTAL PRODUCIDO:").font = Font(bold=True)
-    ws.cell(row=ultima_fila, column=5, value=total_kg).font = Font(bold=True, color="008000")
-
-    # 6. Ajustar ancho de columnas automático
-    for col in ws.columns:
-        max_length = 0
-        column = col[0].column_letter # Ej: 'A', 'B'
-        for cell in col:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        adjusted_width = (max_length + 2)
-        ws.column_dimensions[column].width = adjusted_width
-
-    # 7. Preparar respuesta HTTP
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename="Reporte_Algas_Completo.xlsx"'
-    wb.save(response)
-    return response
+    """Genera un Excel (.xlsx) estilizado y completo (modo streaming, ver core/exportar.py)"""
+    try:
+        reportes = filtrar_produccion(request.GET)
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'mensaje': str(e)}, status=400)
+    return respuesta_excel(escribir_excel_algas, "Reporte_Algas_Completo.xlsx", reportes)
 
 @login_required
 def exportar_granja_csv(request):
-    """Genera un Excel (.xlsx) estilizado para Granja"""
-    
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Reporte Granja"
+    """Genera un Excel (.xlsx) estilizado para Granja (modo streaming)"""
+    try:
+        reportes = filtrar_granja(request.GET)
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'mensaje': str(e)}, status=400)
+    return respuesta_excel(escribir_excel_granja, "Reporte_Granja_Completo.xlsx", reportes)
 
-    # Estilos
-    header_font = Font(bold=True, color="FFFFFF")
-    header_fill = PatternFill(start_color="e65100", end_color="e65100", fill_type="solid") # Naranja para granja
+@login_required
+def exportar_algas_csv_plano(request):
+    """
+    CSV plano de producción para el BI, enviado fila por fila.
+    Filtros opcionales: ?desde=&hasta=&producto=  |  ?gzip=1 para comprimir.
+    """
+    try:
+        reportes = filtrar_produccion(request.GET)
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'mensaje': str(e)}, status=400)
+    return respuesta_csv(filas_csv_produccion(reportes), "Reporte_Algas.csv", request.GET.get('gzip') == '1')
 
-    # Cabecera
-    headers = ['Fecha Reporte', 'Lote', 'Dieta', 'Huevos', 'Alimento (Kg)', 'Mortalidad', 'Responsable', 'Obs']
-    ws.append(headers)
+@login_required
+def exportar_granja_csv_plano(request):
+    """
+    CSV plano de la granja. Filtros opcionales: ?desde=&hasta=&lote=  |  ?gzip=1
+    """
+    try:
+        reportes = filtrar_granja(request.GET)
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'mensaje': str(e)}, status=400)
+    return respuesta_csv(filas_csv_granja(reportes), "Reporte_Granja.csv", request.GET.get('gzip') == '1')
 
-    for cell in ws[1]:
-        cell.font = header_font
-        cell.fill = header_fill
 
-    # Datos
-    reportes = ReporteDiarioAves.objects.all().select_related('lote').order_by('-fecha_reporte')
-    
-    total_huevos = 0
-    total_alimento = 0
+# --- EXPORTACIONES EN SEGUNDO PLANO (ver core/trabajos.py) ---
 
-    for r in reportes:
-        total_huevos += r.huevos_recolectados
-        total_alimento += float(r.alimento_consumido_kg)
-        
-        ws.append([
-            r.fecha_reporte,
-            r.lote.nombre,
-            r.lote.get_tipo_dieta_display(),
-            r.huevos_recolectados,
-            float(r.alimento_consumido_kg),
-            r.mortalidad,
-            r.observaciones
-        ])
-
-    # Totales
-    ultima_fila = ws.max_row + 1
-    ws.cell(row=ultima_fila, column=3, value="TOTALES:").font = Font(bold=True)
-    ws.cell(row=ultima_fila, column=4, value=total_huevos).font = Font(bold=True)
-    ws.cell(row=ultima_fila, column=5, value=total_alimento).font = Font(bold=True)
-
-    # Auto-ancho
-    for col in ws.columns:
-        max_length = 0
-        column = col[0].column_letter
-        for cell in col:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        ws.column_dimensions[column].width = (max_length + 2)
-
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename="Reporte_Granja_Completo.xlsx"'
-    wb.save(response)
-    return response
+def _datos_trabajo(trabajo):
+    datos = {
+        'status': 'ok',
+        'trabajo': trabajo.id,
+        'estado': trabajo.estado,
+        'url_estado': reverse('estado_exportacion', args=[trabajo.id]),
+    }
+    if trabajo.estado == 'LISTO':
+        datos['url_descarga'] = reverse('descargar_exportacion', args=[trabajo.id])
+    if trabajo.estado == 'ERROR':
+        datos['mensaje'] = trabajo.error
+    return datos
+
+@login_required
+def exportar_en_segundo_plano(request, tipo):
+    """
+    Encola la exportación Excel (?desde=&hasta=&producto=&lote=) y responde al instante.
+    El cliente consulta 'url_estado' hasta que aparezca 'url_descarga'.
+    """
+    tipo = tipo.upper()
+    if tipo not in EXPORTADORES:
+        return JsonResponse({'status': 'error', 'mensaje': 'Tipo de exportación desconocido'}, status=404)
+    try:
+        trabajo = encolar_exportacion(tipo, request.GET, usuario=request.user)
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'mensaje': str(e)}, status=400)
+    return JsonResponse(_datos_trabajo(trabajo), status=202 if trabajo.estado != 'LISTO' else 200)
+
+def _trabajo_del_usuario(request, id):
+    trabajo = get_object_or_404(TrabajoExportacion, id=id)
+    if trabajo.usuario_id != request.user.id and not es_gerencia(roles_de(request)):
+        raise Http404("Exportación no encontrada")
+    return trabajo
+
+@login_required
+def estado_exportacion(request, id):
+    trabajo = reencolar_si_falta_archivo(_trabajo_del_usuario(request, id))
+    return JsonResponse(_datos_trabajo(trabajo))
+
+@login_required
+def descargar_exportacion(request, id):
+    # Si la limpieza ya borró el archivo, el trabajo vuelve a la cola y se consulta 'url_estado'
+    trabajo = reencolar_si_falta_archivo(_trabajo_del_usuario(request, id))
+    ruta = ruta_archivo(trabajo.clave)
+    if trabajo.estado != 'LISTO' or not os.path.exists(ruta):
+        return JsonResponse({
+            'status': 'error', 'mensaje': 'La exportación todavía no está lista',
+            'url_estado': reverse('estado_exportacion', args=[trabajo.id]),
+        }, status=409)
+    return FileResponse(
+        open(ruta, 'rb'),
+        as_attachment=True,
+        filename=nombre_descarga(trabajo),
+        content_type=CONTENT_TYPE_XLSX,
+    )
 
 
 @login_required
@@ -335,22 +480,28 @@ def menu_trabajador(request):
 
 
 # --- VISTA CENTRAL DE GESTIÓN ---
-@login_required
+@rol_requerido(es_gerencia, redirigir_a='menu_trabajador')  # Solo gerentes pueden entrar
 def panel_gerencia(request):
-    # Solo gerentes pueden entrar
-    if not request.user.is_staff:
-        return redirect('menu_trabajador')
-
-    context = {
-        'usuarios': User.objects.all().order_by('-date_joined'),
-        'productos': Producto.objects.all(),
-        'lotes': LoteAves.objects.all(),
-    }
-    return render(request, 'gestion/panel_gerencia.html', context)
+    # Sin consultas: cada pestaña pide sus filas a api_tabla_gerencia al abrirse
+    return render(request, 'gestion/panel_gerencia.html')
+
+@rol_requerido(es_gerencia)
+def api_tabla_gerencia(request, tabla):
+    """
+    Una página de usuarios, productos o lotes para el panel (ver core/tablas_gerencia.py).
+    ?q=&orden=&cursor=&limite=  (lotes además ?estado=activos|terminados|todos)
+    """
+    try:
+        pagina = pagina_tabla(tabla, request.GET)
+    except KeyError:
+        return JsonResponse({'status': 'error', 'mensaje': 'Tabla desconocida'}, status=404)
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'mensaje': str(e)}, status=400)
+    return JsonResponse({'status': 'ok', **pagina})
 
 # --- VISTAS PARA CREAR (REUTILIZAMOS UN MISMO HTML) ---
 
-@login_required
+@rol_requerido(es_gerencia, redirigir_a='menu_trabajador')
 def crear_usuario(request):
     if request.method == 'POST':
         form = NuevoUsuarioForm(request.POST)
@@ -366,19 +517,28 @@ def crear_usuario(request):
     
     return render(request, 'gestion/crear_generico.html', {'form': form, 'titulo': 'Nuevo Trabajador'})
 
-@login_required
+@rol_requerido(es_gerencia, redirigir_a='menu_trabajador')
 def crear_producto(request):
     if request.method == 'POST':
         form = ProductoForm(request.POST)
         if form.is_valid():
-            form.save()
+            with transaction.atomic():
+                producto = form.save(commit=False)
+                stock_inicial = producto.stock_actual
+                # El stock entra por el libro de movimientos, no escrito a mano
+                producto.stock_actual = 0
+                producto.save()
+                if stock_inicial:
+                    registrar_movimientos([MovimientoStock(
+                        producto=producto, tipo='AJUSTE', cantidad=stock_inicial, nota="Stock inicial",
+                    )])
             messages.success(request, "Producto creado exitosamente.")
             return redirect('panel_gerencia')
     else:
         form = ProductoForm()
     return render(request, 'gestion/crear_generico.html', {'form': form, 'titulo': 'Nuevo Producto Alga'})
 
-@login_required
+@rol_requerido(es_gerencia, redirigir_a='menu_trabajador')
 def crear_lote(request):
     if request.method == 'POST':
         form = LoteForm(request.POST)
@@ -391,35 +551,50 @@ def crear_lote(request):
     return render(request, 'gestion/crear_generico.html', {'form': form, 'titulo': 'Nuevo Lote Aves'})
 
 
+def _precache_service_worker(request):
+    """Lista de precache una sola vez por request (la usan el ETag y el cuerpo)."""
+    if not hasattr(request, '_precache'):
+        request._precache = manifiesto_precache()
+    return request._precache
+
+def _etag_service_worker(request):
+    etag = etag_archivo(RUTA_SERVICE_WORKER)
+    return etag and f"{etag}-{_precache_service_worker(request)['version']}"
+
+@condition(etag_func=_etag_service_worker)
 def service_worker(request):
     """
     Sirve el archivo sw.js directamente desde la raíz para que tenga permisos sobre todo el sitio.
+    Se lee de memoria (el disco solo si cambió) y con If-None-Match responde 304.
     """
-    # Buscamos el archivo en tu carpeta static/js
-    sw_path = os.path.join(settings.BASE_DIR, 'static', 'js', 'sw.js')
-    
     try:
-        with open(sw_path, 'r') as f:
-            content = f.read()
-        return HttpResponse(content, content_type='application/javascript')
+        contenido, _ = leer_en_memoria(RUTA_SERVICE_WORKER)
     except FileNotFoundError:
         return HttpResponse("Service Worker no encontrado", status=404)
 
+    # Lista de precache con las URLs de collectstatic: si cambia un archivo, cambia sw.js
+    # y el navegador instala la versión nueva (que baja solo lo que cambió)
+    precache = json.dumps(_precache_service_worker(request), separators=(',', ':'))
+    response = HttpResponse(f"self.__PRECACHE = {precache};\n".encode('utf-8') + contenido, content_type='application/javascript')
+    # Siempre se revalida: el ETag hace que la revisión cueste un 304 sin cuerpo
+    patch_cache_control(response, no_cache=True)
+    return response
+
+@condition(etag_func=lambda request: etag_archivo(RUTA_MANIFEST))
 def manifest(request):
     """
-    Sirve el manifest.json directamente desde la raíz.
+    Sirve el manifest.json directamente desde la raíz (desde memoria, con ETag).
     """
-    manifest_path = os.path.join(settings.BASE_DIR, 'static', 'manifest.json')
-    
     try:
-        with open(manifest_path, 'r') as f:
-            content = f.read()
-        return HttpResponse(content, content_type='application/json')
+        contenido, _ = leer_en_memoria(RUTA_MANIFEST)
     except FileNotFoundError:
         return HttpResponse("Manifest no encontrado", status=404)
+    response = HttpResponse(contenido, content_type='application/json')
+    patch_cache_control(response, no_cache=True)
+    return response
     
 
-@login_required
+@rol_requerido(es_gerencia, redirigir_a='menu_trabajador')
 def editar_usuario(request, id):
     user_obj = get_object_or_404(User, id=id)
     if request.method == 'POST':
@@ -434,7 +609,7 @@ def editar_usuario(request, id):
     
     return render(request, 'gestion/crear_generico.html', {'form': form, 'titulo': 'Editar Usuario'})
 
-@login_required
+@rol_requerido(es_gerencia, redirigir_a='menu_trabajador')
 def eliminar_usuario(request, id):
     user_obj = get_object_or_404(User, id=id)
     if not user_obj.is_superuser: # Seguridad: No borrar al jefe supremo
@@ -446,20 +621,33 @@ def eliminar_usuario(request, id):
 
 
 # 2. PRODUCTOS (ALGAS)
-@login_required
+@rol_requerido(es_gerencia, redirigir_a='menu_trabajador')
 def editar_producto(request, id):
     prod = get_object_or_404(Producto, id=id)
     if request.method == 'POST':
+        stock_anterior = prod.stock_actual
         form = ProductoForm(request.POST, instance=prod)
         if form.is_valid():
-            form.save()
+            with transaction.atomic():
+                producto = form.save(commit=False)
+                diferencia = producto.stock_actual - stock_anterior
+                # Si cambiaron el stock a mano, queda como AJUSTE en el libro.
+                # stock_actual no se escribe aquí: un save() completo pisaría los
+                # UPDATE con F() de reportes que llegaron mientras se editaba.
+                producto.stock_actual = stock_anterior
+                producto.save(update_fields=[campo for campo in form._meta.fields if campo != 'stock_actual'])
+                if diferencia:
+                    registrar_movimientos([MovimientoStock(
+                        producto=producto, tipo='AJUSTE', cantidad=diferencia,
+                        nota=f"Ajuste manual por {request.user.username}",
+                    )])
             messages.success(request, "Producto actualizado.")
             return redirect('panel_gerencia')
     else:
         form = ProductoForm(instance=prod)
     return render(request, 'gestion/crear_generico.html', {'form': form, 'titulo': 'Editar Producto'})
 
-@login_required
+@rol_requerido(es_gerencia, redirigir_a='menu_trabajador')
 def eliminar_producto(request, id):
     prod = get_object_or_404(Producto, id=id)
     prod.delete()
@@ -468,7 +656,7 @@ def eliminar_producto(request, id):
 
 
 # 3. LOTES (AVES)
-@login_required
+@rol_requerido(es_gerencia, redirigir_a='menu_trabajador')
 def editar_lote(request, id):
     lote = get_object_or_404(LoteAves, id=id)
     if request.method == 'POST':
@@ -481,7 +669,7 @@ def editar_lote(request, id):
         form = LoteForm(instance=lote)
     return render(request, 'gestion/crear_generico.html', {'form': form, 'titulo': 'Editar Lote'})
 
-@login_required
+@rol_requerido(es_gerencia, redirigir_a='menu_trabajador')
 def eliminar_lote(request, id):
     lote = get_object_or_404(LoteAves, id=id)
     lote.delete()
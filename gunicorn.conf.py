@@ -0,0 +1,13 @@
+# Configuración de gunicorn: la lee sola al arrancar desde esta carpeta
+# (gunicorn sistema_central.wsgi). La cantidad de workers sigue saliendo de
+# WEB_CONCURRENCY, como siempre.
+import os
+
+# Workers con hilos (gthread): cada worker atiende varios requests a la vez y los
+# reportes sueltos que llegan juntos comparten micro-lote (ver core/microlotes.py).
+# Con el worker 'sync' cada micro-lote tendría un solo reporte y la ventana de
+# INGESTA_VENTANA_MS solo agregaría espera; si se vuelve a 'sync', poner
+# INGESTA_VENTANA_MS=0. Bajo ASGI el '-k uvicorn.workers.UvicornWorker' de la línea
+# de comandos reemplaza esto.
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', '8'))
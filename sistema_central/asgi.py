@@ -12,5 +12,8 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sistema_central.settings')
+# Ingesta y catálogo con vistas async (ver settings.VISTAS_ASYNC y urls.py). En producción:
+#   gunicorn sistema_central.asgi:application -k uvicorn.workers.UvicornWorker -w 4
+os.environ.setdefault('VISTAS_ASYNC', '1')
 
 application = get_asgi_application()
@@ -2,13 +2,26 @@ from django.contrib import admin
 from django.urls import path, include # <--- Agrega include
 # Importamos tus vistas
 from core.views import (
-    dashboard, ingreso_algas, api_guardar_produccion, ingreso_aves, api_guardar_aves,
-    exportar_algas_csv, exportar_granja_csv, menu_trabajador,
-    panel_gerencia, crear_usuario, crear_producto, crear_lote, service_worker, manifest,
+    dashboard, ingreso_algas, api_guardar_produccion, ingreso_aves, api_guardar_aves, api_guardar_lote,
+    exportar_algas_csv, exportar_granja_csv, exportar_algas_csv_plano, exportar_granja_csv_plano,
+    exportar_en_segundo_plano, estado_exportacion, descargar_exportacion,
+    menu_trabajador,
+    panel_gerencia, estadisticas_cache_dashboard, api_curvas_postura, api_estadisticas_ensayo, api_graficos_dashboard, api_catalogo_cambios, crear_usuario, crear_producto, crear_lote, service_worker, manifest,
     editar_usuario, eliminar_usuario,
     editar_producto, eliminar_producto,
-    editar_lote, eliminar_lote# <--- NUEVOS
+    editar_lote, eliminar_lote,# <--- NUEVOS
+    metricas_prometheus, api_tabla_gerencia,
+    api_guardar_produccion_async, api_guardar_aves_async, api_guardar_lote_async, api_catalogo_cambios_async,
 )
+from django.conf import settings
+
+# Servidos por ASGI: la ingesta y el catálogo de los celulares con las vistas async
+if settings.VISTAS_ASYNC:
+    api_guardar_produccion = api_guardar_produccion_async
+    api_guardar_aves = api_guardar_aves_async
+    api_guardar_lote = api_guardar_lote_async
+    api_catalogo_cambios = api_catalogo_cambios_async
+
 urlpatterns = [
 
     path('sw.js', service_worker, name='service_worker'),
@@ -20,14 +33,27 @@ urlpatterns = [
     
     # TUS RUTAS
     path('', dashboard, name='dashboard'),
+    path('api/dashboard/graficos/', api_graficos_dashboard, name='api_graficos_dashboard'),
     path('produccion/', ingreso_algas, name='ingreso_algas'),
     path('api/guardar-produccion/', api_guardar_produccion, name='api_guardar_prod'),
     path('granja/', ingreso_aves, name='ingreso_aves'),
     path('api/guardar-granja/', api_guardar_aves, name='api_guardar_aves'),
+    path('api/guardar-lote/', api_guardar_lote, name='api_guardar_lote'),
+    path('api/v1/catalogo/cambios/', api_catalogo_cambios, name='api_catalogo_cambios'),
+    path('api/analitica/lotes/', api_curvas_postura, name='api_curvas_postura'),
+    path('api/analitica/ensayo/', api_estadisticas_ensayo, name='api_estadisticas_ensayo'),
     path('exportar/algas/', exportar_algas_csv, name='exportar_algas'),
     path('exportar/granja/', exportar_granja_csv, name='exportar_granja'),
+    path('exportar/algas/csv/', exportar_algas_csv_plano, name='exportar_algas_csv'),
+    path('exportar/granja/csv/', exportar_granja_csv_plano, name='exportar_granja_csv'),
+    path('exportar/<str:tipo>/segundo-plano/', exportar_en_segundo_plano, name='exportar_segundo_plano'),
+    path('exportar/trabajo/<int:id>/', estado_exportacion, name='estado_exportacion'),
+    path('exportar/trabajo/<int:id>/descargar/', descargar_exportacion, name='descargar_exportacion'),
     path('menu-trabajador/', menu_trabajador, name='menu_trabajador'),
     path('gerencia/', panel_gerencia, name='panel_gerencia'),
+    path('api/gerencia/<str:tabla>/', api_tabla_gerencia, name='api_tabla_gerencia'),
+    path('gerencia/cache/', estadisticas_cache_dashboard, name='estadisticas_cache'),
+    path('gerencia/metricas/', metricas_prometheus, name='metricas_prometheus'),
     path('gerencia/nuevo-usuario/', crear_usuario, name='crear_usuario'),
     path('gerencia/nuevo-producto/', crear_producto, name='crear_producto'),
     path('gerencia/nuevo-lote/', crear_lote, name='crear_lote'),
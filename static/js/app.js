@@ -4,12 +4,47 @@ document.addEventListener('DOMContentLoaded', () => {
     const formProduccion = document.getElementById('form-produccion');
     const formGranja = document.getElementById('form-granja');
     const statusBar = document.getElementById('status-bar');
+    const selectProducto = document.getElementById('producto');
+    const selectLote = document.getElementById('lote');
+
+    // La base local (IndexedDB) y la cola de salida están en bd.js (compartido con sw.js)
+    // Catálogo local: productos y lotes para llenar los formularios sin red
+    const VERSION_CATALOGO = 1; // Debe coincidir con VERSION_PROTOCOLO de core/catalogo.py
+
+    // Toast: notificación pequeña en la esquina (Muy elegante)
+    const Toast = Swal.mixin({
+        toast: true, position: 'top-end', showConfirmButton: false, timer: 3000
+    });
 
     // 1. Verificar estado inicial
+    mostrarCatalogoLocal();
     actualizarEstado();
     window.addEventListener('online', actualizarEstado);
     window.addEventListener('offline', actualizarEstado);
 
+    // El Service Worker avisa cómo va la subida de la cola en segundo plano
+    if ('serviceWorker' in navigator) {
+        navigator.serviceWorker.addEventListener('message', (evento) => {
+            if (evento.data && evento.data.tipo === 'progreso-salida') mostrarProgreso(evento.data);
+        });
+    }
+
+    // Identificador fijo de este celular: junto con la hora forma un temp_id único
+    // entre todos los equipos, así el servidor reconoce los reenvíos y no duplica.
+    function idDispositivo() {
+        let id = localStorage.getItem('id_dispositivo');
+        if (!id) {
+            id = (self.crypto && crypto.randomUUID) ? crypto.randomUUID()
+                : Math.random().toString(36).slice(2) + Date.now().toString(36);
+            localStorage.setItem('id_dispositivo', id);
+        }
+        return id;
+    }
+
+    function nuevoTempId() {
+        return `${idDispositivo()}-${Date.now()}`;
+    }
+
     // --- LÓGICA ALGAS ---
     if(formProduccion) {
         formProduccion.addEventListener('submit', async (e) => {
@@ -24,7 +59,7 @@ document.addEventListener('DOMContentLoaded', () => {
                 cantidad: document.getElementById('cantidad').value,
                 responsable: document.getElementById('responsable').value,
                 fecha_registro: new Date().toISOString().split('T')[0],
-                temp_id: Date.now()
+                temp_id: nuevoTempId()
             };
             
             await procesarEnvio(datos, formProduccion, btn);
@@ -46,7 +81,7 @@ document.addEventListener('DOMContentLoaded', () => {
                 mortalidad: document.getElementById('mortalidad').value,
                 responsable: document.getElementById('responsable').value,
                 fecha_registro: new Date().toISOString().split('T')[0],
-                temp_id: Date.now()
+                temp_id: nuevoTempId()
             };
             
             await procesarEnvio(datos, formGranja, btn);
@@ -85,6 +120,15 @@ document.addEventListener('DOMContentLoaded', () => {
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify(datos)
             });
+            if (respuesta.status === 503) {
+                // Servidor saturado (cola de escritura llena): lo guardamos y se reintenta
+                // recién después del Retry-After, no al instante por /api/guardar-lote/
+                await guardarOffline(datos, {
+                    title: 'Servidor ocupado',
+                    text: 'Guardado en el celular. Se subirá en unos segundos.'
+                }, segundosDeEspera(respuesta));
+                return false;
+            }
             const resultado = await respuesta.json();
             
             if (resultado.status === 'ok') {
@@ -108,50 +152,153 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
-    function guardarOffline(datos) {
-        let pendientes = JSON.parse(localStorage.getItem('reportes_pendientes')) || [];
-        pendientes.push(datos);
-        localStorage.setItem('reportes_pendientes', JSON.stringify(pendientes));
+    async function guardarOffline(datos, aviso = {}, esperaSegundos = 0) {
+        await encolarReportes([datos]);
+        if (esperaSegundos > 0) {
+            setTimeout(pedirEnvio, esperaSegundos * 1000);
+        } else {
+            pedirEnvio();
+        }
         
         // ALERTA PRO AMARILLA
         Swal.fire({
             icon: 'warning',
             title: 'Sin Internet',
             text: 'Guardado en el celular. Se subirá cuando tengas señal.',
-            confirmButtonColor: '#f39c12'
+            confirmButtonColor: '#f39c12',
+            ...aviso
         });
     }
 
-    async function intentarSincronizar() {
-        let pendientes = JSON.parse(localStorage.getItem('reportes_pendientes')) || [];
-        if (pendientes.length > 0) {
-            // Toast notificación pequeña en la esquina (Muy elegante)
-            const Toast = Swal.mixin({
-                toast: true, position: 'top-end', showConfirmButton: false, timer: 3000
-            });
-            Toast.fire({ icon: 'info', title: 'Sincronizando datos...' });
+    // Versiones anteriores guardaban la cola en localStorage: la pasamos a IndexedDB una sola vez
+    async function migrarColaVieja() {
+        const vieja = JSON.parse(localStorage.getItem('reportes_pendientes')) || [];
+        if (vieja.length > 0) await encolarReportes(vieja);
+        localStorage.removeItem('reportes_pendientes');
+    }
 
-            for (let i = pendientes.length - 1; i >= 0; i--) {
-                const exito = await enviarAlServidorSilencioso(pendientes[i]); // Versión sin alertas
-                if (exito) pendientes.splice(i, 1);
+    function hayBackgroundSync() {
+        return 'serviceWorker' in navigator && 'SyncManager' in window;
+    }
+
+    // Con Background Sync el navegador despierta al SW cuando haya señal (aunque se cierre la página);
+    // si no está disponible, la página vacía la cola ella misma
+    async function pedirEnvio() {
+        if (hayBackgroundSync()) {
+            try {
+                const registro = await navigator.serviceWorker.ready;
+                await registro.sync.register(ETIQUETA_SYNC);
+                return;
+            } catch (error) {
+                console.error('Background Sync no disponible:', error);
             }
-            localStorage.setItem('reportes_pendientes', JSON.stringify(pendientes));
-            
-            if (pendientes.length === 0) {
-                Toast.fire({ icon: 'success', title: '¡Sincronización Completa!' });
+        }
+        if (navigator.onLine) await vaciarSalida(mostrarProgreso);
+    }
+
+    async function intentarSincronizar() {
+        try {
+            await migrarColaVieja();
+            const pendientes = await contarPendientes();
+            if (pendientes === 0) return;
+            Toast.fire({ icon: 'info', title: `Sincronizando ${pendientes} reportes...` });
+            await pedirEnvio();
+        } catch (error) {
+            console.error('No se pudo leer la cola offline:', error);
+        }
+    }
+
+    function mostrarProgreso({ enviados, pendientes, ocupado }) {
+        if (ocupado || !statusBar) return;
+        if (pendientes === 0) {
+            Toast.fire({ icon: 'success', title: '¡Sincronización Completa!' });
+            return;
+        }
+        statusBar.innerHTML = `<i class="fa-solid fa-cloud-arrow-up"></i> Subidos ${enviados}, quedan ${pendientes}`;
+    }
+
+    // --- CATÁLOGO LOCAL (Sincronización incremental) ---
+
+    async function leerCatalogo(bd) {
+        const tx = bd.transaction(['productos', 'lotes', 'meta'], 'readonly');
+        // Pedimos todo antes de esperar: la transacción se cierra sola si queda sin pedidos
+        const [productos, lotes, cursor, version] = await Promise.all([
+            esperar(tx.objectStore('productos').getAll()),
+            esperar(tx.objectStore('lotes').getAll()),
+            esperar(tx.objectStore('meta').get('cursor')),
+            esperar(tx.objectStore('meta').get('version'))
+        ]);
+        return { productos, lotes, cursor, version };
+    }
+
+    // Aplica la respuesta de /api/v1/catalogo/cambios/ en UNA transacción
+    function guardarCambios(bd, datos) {
+        return new Promise((ok, falla) => {
+            const tx = bd.transaction(['productos', 'lotes', 'meta'], 'readwrite');
+            const productos = tx.objectStore('productos');
+            const lotes = tx.objectStore('lotes');
+            if (datos.completo) {
+                productos.clear();
+                lotes.clear();
             }
+            datos.productos.forEach(p => productos.put(p));
+            datos.lotes.forEach(l => lotes.put(l));
+            datos.borrados.productos.forEach(id => productos.delete(id));
+            datos.borrados.lotes.forEach(id => lotes.delete(id));
+            tx.objectStore('meta').put(datos.cursor, 'cursor');
+            tx.objectStore('meta').put(datos.version, 'version');
+            tx.oncomplete = () => ok();
+            tx.onerror = () => falla(tx.error);
+        });
+    }
+
+    // Rehace las opciones del <select> (deja la primera, "Seleccione...") sin perder lo elegido
+    function pintarOpciones(select, items, etiqueta) {
+        if (!select) return;
+        const elegido = select.value;
+        while (select.options.length > 1) select.remove(1);
+        items.sort((a, b) => a.id - b.id).forEach(item => {
+            select.add(new Option(etiqueta(item), item.id, false, String(item.id) === elegido));
+        });
+    }
+
+    function pintarCatalogo(catalogo) {
+        pintarOpciones(selectProducto, catalogo.productos, p => p.nombre);
+        pintarOpciones(selectLote, catalogo.lotes, l => `${l.nombre} (${l.dieta})`);
+    }
+
+    // Sin red: los formularios se llenan con lo guardado en el celular (si ya sincronizó alguna vez)
+    async function mostrarCatalogoLocal() {
+        if ((!selectProducto && !selectLote) || !window.indexedDB) return;
+        try {
+            const catalogo = await leerCatalogo(await abrirBD());
+            if (catalogo.cursor !== undefined && catalogo.version === VERSION_CATALOGO) pintarCatalogo(catalogo);
+        } catch (error) {
+            console.error('No se pudo leer el catálogo local:', error);
         }
     }
-    
-    // Versión especial para sincronización masiva (sin popups molestos por cada uno)
-    async function enviarAlServidorSilencioso(datos) {
+
+    // Pide solo lo cambiado desde el último cursor (unos pocos bytes si no hubo cambios)
+    async function sincronizarCatalogo() {
+        if ((!selectProducto && !selectLote) || !window.indexedDB) return;
         try {
-            const r = await fetch(datos.url_api, {
-                method: 'POST', headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify(datos)
-            });
-            return (await r.json()).status === 'ok';
-        } catch { return false; }
+            const bd = await abrirBD();
+            const local = await leerCatalogo(bd);
+            // Versión distinta (o primera vez): pedimos todo desde cero
+            const cursor = local.version === VERSION_CATALOGO ? (local.cursor || 0) : 0;
+            const r = await fetch(`/api/v1/catalogo/cambios/?cursor=${cursor}`, { credentials: 'same-origin', cache: 'no-store' });
+            if (!r.ok) return;
+            const datos = await r.json();
+            if (datos.version !== VERSION_CATALOGO) return;
+
+            const hayCambios = datos.completo || datos.productos.length || datos.lotes.length
+                || datos.borrados.productos.length || datos.borrados.lotes.length;
+            await guardarCambios(bd, datos);
+            if (hayCambios) pintarCatalogo(await leerCatalogo(bd));
+        } catch (error) {
+            // Sin sesión (redirige al login) o sin red: seguimos con lo local
+            console.error('No se pudo sincronizar el catálogo:', error);
+        }
     }
 
     function actualizarEstado() {
@@ -160,6 +307,7 @@ document.addEventListener('DOMContentLoaded', () => {
             statusBar.className = "alert alert-success shadow-sm"; // Usamos clases de Bootstrap
             statusBar.style.display = 'block';
             intentarSincronizar();
+            sincronizarCatalogo();
         } else {
             statusBar.innerHTML = '<i class="fa-solid fa-triangle-exclamation"></i> Modo Offline';
             statusBar.className = "alert alert-warning shadow-sm";
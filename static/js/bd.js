@@ -0,0 +1,180 @@
+// ==========================================
+// BASE LOCAL (IndexedDB) Y COLA DE SALIDA DE REPORTES
+// La usan las páginas (<script>) y el Service Worker (importScripts)
+// ==========================================
+
+const BD_NOMBRE = 'algas-erp';
+const BD_VERSION = 2;
+
+// Cuántos reportes viajan juntos en cada envío a /api/guardar-lote/
+const TAMANO_PAQUETE = 50;
+const PAQUETES_EN_PARALELO = 3;
+const REINTENTOS = 3;
+// Segundos a esperar si el servidor responde 503 sin Retry-After
+const ESPERA_OCUPADO = 5;
+
+// Etiqueta de Background Sync y nombre del candado (página y SW no vacían la cola a la vez)
+const ETIQUETA_SYNC = 'enviar-reportes';
+const CANDADO_SALIDA = 'salida-reportes';
+
+function abrirBD() {
+    return new Promise((ok, falla) => {
+        const pedido = indexedDB.open(BD_NOMBRE, BD_VERSION);
+        pedido.onupgradeneeded = (evento) => {
+            const bd = pedido.result;
+            if (evento.oldVersion < 1) {
+                bd.createObjectStore('productos', { keyPath: 'id' });
+                bd.createObjectStore('lotes', { keyPath: 'id' });
+                bd.createObjectStore('meta'); // cursor y versión del catálogo
+            }
+            if (evento.oldVersion < 2) {
+                // Clave autoincremental: los reportes salen en el orden en que se guardaron
+                bd.createObjectStore('salida', { autoIncrement: true });
+            }
+        };
+        pedido.onsuccess = () => ok(pedido.result);
+        pedido.onerror = () => falla(pedido.error);
+    });
+}
+
+function esperar(pedido) {
+    return new Promise((ok, falla) => {
+        pedido.onsuccess = () => ok(pedido.result);
+        pedido.onerror = () => falla(pedido.error);
+    });
+}
+
+function esperarTransaccion(tx) {
+    return new Promise((ok, falla) => {
+        tx.oncomplete = () => ok();
+        tx.onerror = () => falla(tx.error);
+        tx.onabort = () => falla(tx.error);
+    });
+}
+
+// --- COLA DE SALIDA ---
+
+// Agregar es O(1): no se relee ni se reescribe la cola entera
+async function encolarReportes(reportes) {
+    const bd = await abrirBD();
+    const tx = bd.transaction('salida', 'readwrite');
+    reportes.forEach(reporte => tx.objectStore('salida').add(reporte));
+    return esperarTransaccion(tx);
+}
+
+async function contarPendientes() {
+    const bd = await abrirBD();
+    return esperar(bd.transaction('salida', 'readonly').objectStore('salida').count());
+}
+
+// Hasta 'limite' reportes con clave mayor que 'despuesDe' (cursor, sin cargar toda la cola)
+async function leerPendientes(despuesDe, limite) {
+    const bd = await abrirBD();
+    const rango = despuesDe === null ? null : IDBKeyRange.lowerBound(despuesDe, true);
+    const almacen = bd.transaction('salida', 'readonly').objectStore('salida');
+    const [claves, reportes] = await Promise.all([
+        esperar(almacen.getAllKeys(rango, limite)),
+        esperar(almacen.getAll(rango, limite))
+    ]);
+    return claves.map((clave, i) => ({ clave, reporte: reportes[i] }));
+}
+
+async function quitarDeSalida(claves) {
+    if (claves.length === 0) return;
+    const bd = await abrirBD();
+    const tx = bd.transaction('salida', 'readwrite');
+    claves.forEach(clave => tx.objectStore('salida').delete(clave));
+    return esperarTransaccion(tx);
+}
+
+// Segundos que pide el servidor en Retry-After cuando su cola de escritura está llena (503)
+function segundosDeEspera(respuesta) {
+    const segundos = parseInt(respuesta.headers.get('Retry-After'), 10);
+    return segundos > 0 ? segundos : ESPERA_OCUPADO;
+}
+
+function dormir(ms) {
+    return new Promise(ok => setTimeout(ok, ms));
+}
+
+// Envía un paquete de reportes (ALGAS y GRANJA mezclados).
+// Devuelve { resultados } (uno por reporte), { ocupado: segundos } si el servidor pidió esperar, o null sin respuesta
+async function enviarPaquete(paquete) {
+    try {
+        const r = await fetch('/api/guardar-lote/', {
+            method: 'POST', headers: { 'Content-Type': 'application/json' },
+            credentials: 'same-origin',
+            body: JSON.stringify({ reportes: paquete })
+        });
+        if (r.status === 503) return { ocupado: segundosDeEspera(r) };
+        if (!r.ok) return null;
+        return { resultados: (await r.json()).resultados };
+    } catch { return null; }
+}
+
+// Si falla la red reintentamos con espera creciente: 1s, 2s, 4s.
+// Si el servidor está ocupado esperamos su Retry-After (más un azar, para que los celulares no vuelvan todos juntos).
+async function enviarPaqueteConReintentos(paquete) {
+    for (let intento = 0; intento < REINTENTOS; intento++) {
+        const respuesta = await enviarPaquete(paquete);
+        if (respuesta && respuesta.resultados) return respuesta.resultados;
+        await dormir(respuesta ? respuesta.ocupado * 1000 * (1 + Math.random()) : 1000 * 2 ** intento);
+    }
+    return null;
+}
+
+/**
+ * Recorre la cola una vez, de a PAQUETES_EN_PARALELO paquetes de TAMANO_PAQUETE.
+ * Borra los reportes que el servidor aceptó (o ya tenía: temp_id repetido);
+ * los rechazados o sin respuesta se quedan para el próximo intento.
+ * alProgresar({ enviados, fallidos, pendientes }) se llama después de cada grupo.
+ * Devuelve el mismo resumen al terminar.
+ */
+async function vaciarSalida(alProgresar) {
+    const recorrer = async () => {
+        let despuesDe = null;
+        let enviados = 0;
+        let fallidos = 0;
+        let sinRed = false;
+        while (!sinRed) {
+            const lote = await leerPendientes(despuesDe, TAMANO_PAQUETE * PAQUETES_EN_PARALELO);
+            if (lote.length === 0) break;
+            despuesDe = lote[lote.length - 1].clave;
+
+            const paquetes = [];
+            for (let i = 0; i < lote.length; i += TAMANO_PAQUETE) {
+                paquetes.push(lote.slice(i, i + TAMANO_PAQUETE));
+            }
+            const respuestas = await Promise.all(
+                paquetes.map(p => enviarPaqueteConReintentos(p.map(item => item.reporte)))
+            );
+
+            const aceptados = [];
+            paquetes.forEach((paquete, k) => {
+                if (!respuestas[k]) {
+                    // Sin respuesta tras los reintentos: cortamos, la red no está
+                    sinRed = true;
+                    fallidos += paquete.length;
+                    return;
+                }
+                paquete.forEach((item, j) => {
+                    if (respuestas[k][j].status === 'ok') aceptados.push(item.clave);
+                    else fallidos += 1;
+                });
+            });
+            await quitarDeSalida(aceptados);
+            enviados += aceptados.length;
+
+            if (alProgresar) alProgresar({ enviados, fallidos, pendientes: await contarPendientes() });
+        }
+        return { enviados, fallidos, sinRed, pendientes: await contarPendientes() };
+    };
+
+    // Web Locks: si otra pestaña o el SW ya está vaciando la cola, no repetimos el trabajo
+    if (self.navigator && navigator.locks) {
+        return navigator.locks.request(CANDADO_SALIDA, { ifAvailable: true }, candado =>
+            candado ? recorrer() : contarPendientes().then(pendientes => ({ enviados: 0, fallidos: 0, sinRed: false, pendientes, ocupado: true }))
+        );
+    }
+    return recorrer();
+}
@@ -1,9 +1,21 @@
-const CACHE_NAME = 'algas-erp-v5'; // Subimos versión
+// La vista service_worker antepone self.__PRECACHE = { version, inmutables, revisables, bd }
+// con las URLs de collectstatic (ver core/precache.py). Servido tal cual, usamos los nombres originales.
+const PRECACHE = self.__PRECACHE || {
+    version: 'dev',
+    inmutables: [],
+    revisables: ['/static/js/app.js', '/static/js/bd.js'],
+    bd: '/static/js/bd.js'
+};
 
-// ARCHIVOS CRÍTICOS QUE DEBEN ESTAR SIEMPRE
-const STATIC_ASSETS = [
-    '/static/js/app.js',
-    '/static/manifest.json',
+// Los estáticos sobreviven entre versiones: al instalar solo se baja lo que cambió
+const CACHE_ESTATICOS = 'algas-estaticos';
+const CACHE_PAGINAS = `algas-paginas-${PRECACHE.version}`;
+
+// Cola de salida en IndexedDB (la misma que usa app.js)
+importScripts(PRECACHE.bd);
+
+// Librerías de CDN: la versión va en la URL, así que no cambian
+const CDN = [
     'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css',
     'https://fonts.googleapis.com/css2?family=Roboto:wght@300;400;500;700&display=swap',
     'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css',
@@ -15,76 +27,134 @@ const STATIC_ASSETS = [
 const PAGES_TO_CACHE = [
     '/menu-trabajador/',
     '/produccion/',
-    '/granja/'
+    '/granja/',
+    '/manifest.json'
 ];
 
-// 1. INSTALACIÓN: Guardamos todo en la mochila
+const INMUTABLES = new Set([...PRECACHE.inmutables, ...CDN]);
+
+// 1. INSTALACIÓN: bajamos solo lo que no tenemos
 self.addEventListener('install', (event) => {
-    console.log('[Service Worker] Instalando v5...');
-    event.waitUntil(
-        caches.open(CACHE_NAME).then((cache) => {
-            // Guardamos estáticos y páginas
-            return cache.addAll([...STATIC_ASSETS, ...PAGES_TO_CACHE]);
-        })
-    );
+    event.waitUntil((async () => {
+        const estaticos = await caches.open(CACHE_ESTATICOS);
+        const faltan = [];
+        for (const url of INMUTABLES) {
+            // URL con hash ya guardada = mismo contenido, no se vuelve a bajar
+            if (!(await estaticos.match(url))) faltan.push(url);
+        }
+        await estaticos.addAll([...faltan, ...PRECACHE.revisables]);
+
+        const paginas = await caches.open(CACHE_PAGINAS);
+        await paginas.addAll(PAGES_TO_CACHE);
+    })());
     self.skipWaiting();
 });
 
-// 2. ACTIVACIÓN: Limpieza
+// 2. ACTIVACIÓN: borramos cachés de otras versiones y estáticos que ya nadie pide
 self.addEventListener('activate', (event) => {
-    event.waitUntil(
-        caches.keys().then((keyList) => {
-            return Promise.all(keyList.map((key) => {
-                if (key !== CACHE_NAME) {
-                    return caches.delete(key);
-                }
-            }));
-        })
-    );
+    event.waitUntil((async () => {
+        const nombres = await caches.keys();
+        await Promise.all(nombres
+            .filter(nombre => nombre !== CACHE_ESTATICOS && nombre !== CACHE_PAGINAS)
+            .map(nombre => caches.delete(nombre)));
+
+        const vigentes = new Set([...INMUTABLES, ...PRECACHE.revisables].map(url => new URL(url, self.location).href));
+        const estaticos = await caches.open(CACHE_ESTATICOS);
+        for (const pedido of await estaticos.keys()) {
+            if (!vigentes.has(pedido.url)) await estaticos.delete(pedido);
+        }
+    })());
     self.clients.claim();
 });
 
-// 3. INTERCEPTOR (LA MAGIA ESTÁ AQUÍ)
+// --- ESTRATEGIAS ---
+
+function sePuedeGuardar(respuesta) {
+    // Opaca = CDN pedido sin CORS; redirigida = sesión vencida (no guardamos el login en lugar de la página)
+    return respuesta && (respuesta.ok || respuesta.type === 'opaque') && !respuesta.redirected;
+}
+
+function soloRed(pedido) {
+    return fetch(pedido);
+}
+
+async function primeroCache(pedido) {
+    const cache = await caches.open(CACHE_ESTATICOS);
+    const guardada = await cache.match(pedido);
+    if (guardada) return guardada;
+    const respuesta = await fetch(pedido);
+    if (sePuedeGuardar(respuesta)) cache.put(pedido, respuesta.clone());
+    return respuesta;
+}
+
+// Responde al instante con la copia guardada y la renueva por detrás para la próxima vez
+function mientrasRevalida(nombreCache) {
+    return async (pedido, event) => {
+        const cache = await caches.open(nombreCache);
+        const guardada = await cache.match(pedido);
+        const renovada = fetch(pedido).then((respuesta) => {
+            if (sePuedeGuardar(respuesta)) return cache.put(pedido, respuesta.clone()).then(() => respuesta);
+            return respuesta;
+        });
+        if (guardada) {
+            event.waitUntil(renovada.catch(() => null));
+            return guardada;
+        }
+        return renovada;
+    };
+}
+
+// Resto de la navegación: red primero; sin señal, la copia o el Menú de Trabajador
+async function primeroRed(pedido) {
+    try {
+        return await fetch(pedido);
+    } catch (error) {
+        const cache = await caches.open(CACHE_PAGINAS);
+        const guardada = await cache.match(pedido);
+        if (guardada) return guardada;
+        if (pedido.mode === 'navigate') return cache.match('/menu-trabajador/');
+        throw error;
+    }
+}
+
+// 3. TABLA DE RUTAS: la primera que coincide decide cómo se responde
+const RUTAS = [
+    // Datos y descargas siempre frescos (la cola offline vive en IndexedDB, no en la caché)
+    { coincide: url => /^\/(api|exportar|admin|accounts)\//.test(url.pathname), estrategia: soloRed },
+    // Archivos con hash en la URL o de CDN versionado
+    { coincide: url => INMUTABLES.has(url.href) || INMUTABLES.has(url.pathname + url.search), estrategia: primeroCache },
+    // Estáticos sin hash (desarrollo, imágenes sueltas)
+    { coincide: url => url.origin === self.location.origin && url.pathname.startsWith('/static/'), estrategia: mientrasRevalida(CACHE_ESTATICOS) },
+    // Páginas de carga offline
+    { coincide: url => url.origin === self.location.origin && PAGES_TO_CACHE.includes(url.pathname), estrategia: mientrasRevalida(CACHE_PAGINAS) },
+    { coincide: url => url.origin === self.location.origin, estrategia: primeroRed },
+];
+
 self.addEventListener('fetch', (event) => {
-    
     // Solo nos importan las peticiones GET
     if (event.request.method !== 'GET') return;
 
-    event.respondWith(
-        (async () => {
-            const cache = await caches.open(CACHE_NAME);
-
-            // A) INTENTAR RED (Network First)
-            // Tratamos de ir a internet primero para tener datos frescos
-            try {
-                const networkResponse = await fetch(event.request);
-                
-                // Si la respuesta es válida, actualizamos la copia en caché para la próxima
-                if (networkResponse && networkResponse.status === 200 && networkResponse.type === 'basic') {
-                    cache.put(event.request, networkResponse.clone());
-                }
-                
-                return networkResponse;
-
-            } catch (error) {
-                // B) FALLÓ INTERNET (Estamos Offline)
-                console.log('Offline detectado. Buscando en caché:', event.request.url);
-
-                // 1. Buscamos si tenemos el archivo exacto guardado
-                const cachedResponse = await cache.match(event.request);
-                if (cachedResponse) {
-                    return cachedResponse;
-                }
-
-                // 2. ESTRATEGIA FALLBACK (PLAN B)
-                // Si el usuario quería entrar a una página (HTML) y no la tenemos (ej: el Home),
-                // le mostramos el Menú de Trabajador que SÍ tenemos guardado.
-                if (event.request.mode === 'navigate') {
-                    return cache.match('/menu-trabajador/');
-                }
-
-                return null;
-            }
-        })()
-    );
-});
\ No newline at end of file
+    const url = new URL(event.request.url);
+    const ruta = RUTAS.find(r => r.coincide(url));
+    if (!ruta || ruta.estrategia === soloRed) return; // El navegador va directo a la red
+
+    event.respondWith(ruta.estrategia(event.request, event));
+});
+
+// 4. BACKGROUND SYNC: el navegador nos despierta cuando vuelve la señal
+self.addEventListener('sync', (event) => {
+    if (event.tag !== ETIQUETA_SYNC) return;
+    event.waitUntil(enviarColaEnSegundoPlano());
+});
+
+async function avisarProgreso(progreso) {
+    const paginas = await self.clients.matchAll({ includeUncontrolled: true, type: 'window' });
+    paginas.forEach(pagina => pagina.postMessage({ tipo: 'progreso-salida', ...progreso }));
+}
+
+async function enviarColaEnSegundoPlano() {
+    const resumen = await vaciarSalida(avisarProgreso);
+    // Si se cortó la red, fallamos a propósito: el navegador reintenta el sync más tarde
+    // (con su propia espera creciente) sin que nadie tenga que abrir la página.
+    if (resumen.sinRed) throw new Error(`Quedan ${resumen.pendientes} reportes sin señal`);
+}